@@ -1,56 +1,33 @@
 # 檔名: analyzer.py
 
+# google.generativeai 與 dotenv 載入很慢，延後到第一次使用時才匯入
+
+import content_codec
 import database
-import google.generativeai as genai
+import dedup
+import metrics
+import storage
 import textwrap
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import os
-from dotenv import load_dotenv
-import boto3
+import re
 import sys
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-S3_BUCKET_NAME = 'ai-news-podcast-output-andy-1102'
-
-def upload_to_s3(file_path, bucket_name, object_name):
-    s3_client = boto3.client('s3')
-    try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
-        print(f"檔案已成功上傳至 S3: s3://{bucket_name}/{object_name}")
-        return True
-    except Exception as e:
-        print(f"S3 上傳失敗: {e}")
-        return False
-
-def main():
-    load_dotenv()
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("錯誤：找不到 GOOGLE_API_KEY 環境變數。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-        return
-
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-flash-latest')
-    except Exception as e:
-        print(f"AI 設定失敗: {e}")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-        return
-
-    print("AI 分析師已上線，正在調閱所有情報...")
-    articles = database.get_all_articles_for_analysis()
-    if not articles:
-        print("知識庫中沒有新聞可供分析。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-        return
+ANALYSIS_WINDOW_HOURS = 12 # 資料庫會保留歷史文章，分析時只取這段時間內發布的新聞
+MAP_REDUCE_TOKEN_BUDGET = int(os.getenv("MAP_REDUCE_TOKEN_BUDGET", "200000")) # 單一提示可放入的新聞 token 上限，超過就改用分批摘要
+MAP_REDUCE_MAX_WORKERS = int(os.getenv("MAP_REDUCE_MAX_WORKERS", "4")) # 分批摘要時同時呼叫 Gemini 的數量
+USE_ARTICLE_DIGESTS = True # True: 先把每篇文章濃縮成重點摘要 (有快取) 再寫報告；False: 直接送全文
+DIGEST_PROMPT_VERSION = "v1" # 修改 DIGEST_PROMPT_TEMPLATE 時要一併更新，舊的快取才不會被誤用
+REPORT_STREAMING = os.getenv("REPORT_STREAMING", "1") == "1" # 以串流方式接收最終報告，邊產生邊存檔並把完成的段落交給 podcaster
+STREAM_CHECKPOINT_CHARS = 500 # 串流時每累積這麼多新字元就把目前的內容寫回資料庫一次 (段落完成時也會寫入)
+SECTION_HEADING_PATTERN = re.compile(r'^\s*(?:#+\s*|\d+\.\s*\*\*|\*\*\d+\.)') # 報告中每個段落的標題行
 
-    print(f"成功調閱 {len(articles)} 篇新聞，正在整理成報告...")
-    full_text_content = ""
-    for article in articles:
-        full_text_content += f"--- 新聞標題: {article['headline']} ---\n{article['content']}\n\n"
-
-    prompt = f"""
+REPORT_PROMPT_TEMPLATE = """
     你是一位頂尖的台灣股市財經分析師。你的任務是閱讀以下所有從網路爬取來的財經新聞。
 
     ---
@@ -74,33 +51,398 @@ def main():
 
     請確保你的分析完全基於我提供的文本，並以專業、客觀、條理分明的口吻撰寫。
 
+    --- {source_label} ---
+    {full_text_content}
+    """
+
+MAP_PROMPT_TEMPLATE = """
+    你是一位台灣股市財經分析師的助理。以下是一批財經新聞，請整理成條列式重點筆記，供分析師撰寫完整報告使用。
+    請保留所有重要的公司名稱、股票代號、指數點位、漲跌幅、金額、日期與事件，不要加入新聞以外的推論。
+    不需要開場白或結語，直接列出重點。
+
     --- 以下為新聞全文 ---
     {full_text_content}
     """
-    
+
+DIGEST_PROMPT_TEMPLATE = """
+    請把以下這篇台灣財經新聞濃縮成 3 到 5 點的條列式重點，總長度不超過 200 個繁體中文字。
+    請保留公司名稱、股票代號、指數點位、漲跌幅、金額與日期，不要加入新聞以外的推論，也不需要開場白。
+
+    --- 新聞標題: {headline} ---
+    {content}
+    """
+
+def estimate_tokens(text):
+    """粗估 token 數：繁體中文大約一個字一個 token，以字數估計偏保守。"""
+    return len(text)
+
+def format_article(article):
+    return f"--- 新聞標題: {article['headline']} ---\n{article['content']}\n\n"
+
+def build_report_prompt(full_text_content, source_label="以下為新聞全文"):
+    return REPORT_PROMPT_TEMPLATE.format(full_text_content=full_text_content, source_label=source_label)
+
+def chunk_documents(documents, token_budget):
+    """
+    依 token 預算把文件依序分批，每批總量不超過 token_budget。
+    單篇就超過預算的文件會被截斷，避免某一批單獨爆掉。
+    """
+    chunks, current, current_tokens = [], [], 0
+    for document in documents:
+        tokens = estimate_tokens(document)
+        if tokens > token_budget:
+            document = document[:token_budget]
+            tokens = token_budget
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(document)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def generate_text(model, prompt, kind):
+    """呼叫模型一次並回傳文字，同時記錄呼叫次數、耗時與字數 (kind 區分 digest / map / report)。"""
+    metrics.incr("gemini.calls")
+    metrics.incr("gemini.prompt_chars", len(prompt))
+    with metrics.span(f"gemini.{kind}_seconds"):
+        text = model.generate_content(prompt).text
+    metrics.incr("gemini.response_chars", len(text))
+    return text
+
+def summarize_chunks(model, chunks, max_workers=MAP_REDUCE_MAX_WORKERS):
+    """map 階段：以有上限的執行緒池並行摘要每一批新聞，回傳順序與 chunks 一致。"""
+    def summarize(chunk):
+        return generate_text(model, MAP_PROMPT_TEMPLATE.format(full_text_content="".join(chunk)), "map")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(summarize, chunks))
+
+def load_article_index(since):
+    """
+    串流讀取時間窗口內文章的中繼資料 (id、標題、內文雜湊與長度)，不解壓縮內文。
+    去重簽章與摘要快取都以資料庫存的內文雜湊 (content_hash) 為鍵，之前的執行算過的文章直接沿用，
+    只有還沒有簽章的內文才讀出並解壓縮；網址或標題不同但內文相同的文章共用同一份摘要。沒有內文的文章不列入分析。
+    近似重複的文章每群只保留一篇。回傳 (保留的文章中繼資料, 移除的重複篇數)。
+    """
+    cached = database.get_dedup_signatures(since, dedup.SIGNATURE_VERSION)
+    entries, missing = [], {}
+    for row in database.iter_articles(since=since, columns=("id", "headline", "content_hash", database.CONTENT_SIZE_COLUMN)):
+        if not row['content_hash']:
+            continue
+        entries.append({
+            "id": row['id'],
+            "headline": row['headline'],
+            "content_hash": row['content_hash'],
+            "content_length": row[database.CONTENT_SIZE_COLUMN] or 0 # UTF-8 位元組數，只用來比較哪篇較完整
+        })
+        if row['content_hash'] not in cached:
+            missing.setdefault(row['content_hash'], row['id']) # 內文相同的文章只需要讀一篇
+    computed, fresh = {}, {}
+    for row in database.iter_articles_by_ids(missing.values(), columns=("id", "content_hash", "content")):
+        signature = dedup.minhash_signature(row['content'] or '')
+        computed[row['content_hash']] = signature
+        fresh[row['content_hash']] = dedup.signature_to_bytes(signature)
+    if fresh:
+        database.add_dedup_signatures(fresh, dedup.SIGNATURE_VERSION)
+    # 讀取期間被刪除的文章沒有簽章，一起略過
+    entries = [entry for entry in entries if entry['content_hash'] in cached or entry['content_hash'] in computed]
+    signatures = [computed[entry['content_hash']] if entry['content_hash'] in computed else dedup.signature_from_bytes(cached[entry['content_hash']])
+                  for entry in entries]
+    metrics.incr("dedup.signatures_cached", len(entries) - len(computed))
+    metrics.incr("dedup.signatures_computed", len(computed))
+    clusters = dedup.cluster_signatures(signatures)
+    keep = dedup.select_representatives(clusters, [entry['content_length'] for entry in entries])
+    kept = [entry for i, entry in enumerate(entries) if i in keep]
+    return kept, len(entries) - len(kept)
+
+def iter_article_bodies(entries, preloaded=None):
+    """
+    依 entries 的順序取得文章的 id、標題與內文。
+    preloaded 是 {內文雜湊 (content_codec.content_hash): 文章} (例如同一個行程中剛抓到的新文章)，命中的直接使用，其餘才讀資料庫。
+    """
+    preloaded = preloaded or {}
+    missing_ids = [entry['id'] for entry in entries if entry['content_hash'] not in preloaded]
+    from_database = database.iter_articles_by_ids(missing_ids, columns=("id", "headline", "content"))
+    pending = next(from_database, None)
+    for entry in entries:
+        article = preloaded.get(entry['content_hash'])
+        if article is not None:
+            yield {"id": entry['id'], "headline": article['headline'], "content": article['content']}
+        elif pending is not None and pending['id'] == entry['id']:
+            # 讀取期間已被刪除的文章不會出現在資料庫結果中，直接略過
+            yield pending
+            pending = next(from_database, None)
+
+def map_bounded(executor, fn, items, max_in_flight):
+    """
+    類似 executor.map，但同時最多只送出 max_in_flight 個工作：executor.map 會先把 items 全部取出並送出，
+    items 是串流讀取的文章內文時，等於把所有內文同時留在記憶體中。結果依完成順序產出。
+    """
+    pending = set()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(fn, item))
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+def build_article_digests(model, entries, max_workers=MAP_REDUCE_MAX_WORKERS, preloaded=None):
+    """
+    為每篇文章取得重點摘要：已快取的直接使用，其餘才取得內文 (優先用 preloaded，否則讀資料庫)、並行呼叫模型產生後寫回快取。
+    回傳 (依文章順序排列的報告素材, 快取命中數, 快取未命中數)。摘要失敗的文章改用全文。
+    """
+    cached = database.get_cached_digests({entry['content_hash'] for entry in entries}, DIGEST_PROMPT_VERSION)
+    miss_entries = [entry for entry in entries if entry['content_hash'] not in cached]
+    miss_ids = [entry['id'] for entry in miss_entries]
+
+    def digest(article):
+        try:
+            text = generate_text(model, DIGEST_PROMPT_TEMPLATE.format(headline=article['headline'], content=article['content']), "digest")
+            return article['id'], text, None
+        except Exception as e:
+            print(f"  [警告] 文章摘要失敗，改用全文: {article['headline']}, 原因: {e}")
+            metrics.incr("gemini.errors")
+            return article['id'], None, format_article(article)
+
+    fresh, fallbacks = {}, {}
+    if miss_ids:
+        print(f"正在為 {len(miss_ids)} 篇新文章產生重點摘要 (最多 {max_workers} 條執行緒)...")
+        id_to_hash = {entry['id']: entry['content_hash'] for entry in entries}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            articles = iter_article_bodies(miss_entries, preloaded)
+            # 送進執行緒池的內文最多 2 * max_workers 篇 (執行中加上排隊中的)，其餘留在資料庫游標中尚未讀取
+            for article_id, text, fallback in map_bounded(executor, digest, articles, 2 * max_workers):
+                if text:
+                    fresh[id_to_hash[article_id]] = text
+                else:
+                    fallbacks[article_id] = fallback
+        database.add_digests(fresh, DIGEST_PROMPT_VERSION)
+
+    documents = []
+    for entry in entries:
+        text = cached.get(entry['content_hash']) or fresh.get(entry['content_hash'])
+        if text:
+            documents.append(f"--- 新聞標題: {entry['headline']} ---\n{text}\n\n")
+        elif entry['id'] in fallbacks:
+            documents.append(fallbacks[entry['id']])
+    cache_hits = len(entries) - len(miss_ids)
+    metrics.incr("analyzer.digest_cache_hits", cache_hits)
+    metrics.incr("analyzer.digest_cache_misses", len(miss_ids))
+    return documents, cache_hits, len(miss_ids)
+
+class SectionStream:
+    """
+    串流報告的段落佇列：分析端每完成一個段落就 put 進來，另一條執行緒 (podcaster) 以 for 迴圈逐段取出。
+    分析結束時必須呼叫 close(completed)；迭代結束後 completed 表示報告是否完整產生。
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.completed = False
+
+    def put(self, section):
+        self._queue.put(section)
+
+    def close(self, completed):
+        self.completed = completed
+        self._queue.put(None)
+
+    def __iter__(self):
+        return iter(self._queue.get, None)
+
+def stream_text(model, prompt, on_section=None, on_checkpoint=None, checkpoint_chars=STREAM_CHECKPOINT_CHARS):
+    """
+    以串流方式呼叫模型並回傳完整的文字。
+    每遇到新的段落標題，就把上一個已完成的段落交給 on_section；
+    每累積 checkpoint_chars 個新字元或完成一個段落時，把目前為止的全文交給 on_checkpoint。
+    """
+    parts, section_lines, partial_line = [], [], ""
+    length = checkpointed = 0
+
+    def flush_section():
+        if on_section and any(line.strip() for line in section_lines):
+            on_section("\n".join(section_lines))
+        section_lines.clear()
+
+    metrics.incr("gemini.calls")
+    metrics.incr("gemini.prompt_chars", len(prompt))
+    started = time.perf_counter()
+    with metrics.span("gemini.report_seconds"):
+        for chunk in model.generate_content(prompt, stream=True):
+            try:
+                delta = chunk.text
+            except ValueError:
+                continue # 沒有文字內容的區塊 (例如只帶有結束原因)
+            if not parts:
+                metrics.observe("gemini.first_chunk_seconds", time.perf_counter() - started)
+            parts.append(delta)
+            length += len(delta)
+            lines = (partial_line + delta).split("\n")
+            partial_line = lines.pop()
+            section_done = False
+            for line in lines:
+                if SECTION_HEADING_PATTERN.match(line) and any(previous.strip() for previous in section_lines):
+                    flush_section()
+                    section_done = True
+                section_lines.append(line)
+            if on_checkpoint and (section_done or length - checkpointed >= checkpoint_chars):
+                on_checkpoint("".join(parts))
+                checkpointed = length
+
+    text = "".join(parts)
+    metrics.incr("gemini.response_chars", len(text))
+    if not text.strip():
+        raise RuntimeError("模型沒有回傳任何內容。")
+    if partial_line:
+        section_lines.append(partial_line)
+    flush_section()
+    return text
+
+def split_sections(text):
+    """把完整的報告切成與 stream_text 交給 on_section 相同的段落 (接續執行時用來重現串流時的合成單位)。"""
+    sections, section_lines = [], []
+    for line in text.split("\n"):
+        if SECTION_HEADING_PATTERN.match(line) and any(previous.strip() for previous in section_lines):
+            sections.append("\n".join(section_lines))
+            section_lines = []
+        section_lines.append(line)
+    if any(line.strip() for line in section_lines):
+        sections.append("\n".join(section_lines))
+    return sections
+
+def generate_report(model, documents, token_budget=MAP_REDUCE_TOKEN_BUDGET, max_workers=MAP_REDUCE_MAX_WORKERS, source_label="以下為新聞全文",
+                    stream=False, on_section=None, on_checkpoint=None):
+    """
+    產生最終的五段式報告。
+    全部內容在 token_budget 以內時直接送出單一提示；否則先分批並行摘要 (map)，
+    再把各批重點合併成最終報告 (reduce)。重點筆記仍然太長時會再往上摘要一層。
+    stream=True 時最終報告以串流方式接收，完成的段落與 checkpoint 會即時交給 on_section / on_checkpoint。
+    """
+    level = 0
+    while sum(estimate_tokens(document) for document in documents) > token_budget:
+        level += 1
+        chunks = chunk_documents(documents, token_budget)
+        print(f"內容超過 {token_budget} tokens，第 {level} 層分成 {len(chunks)} 批並行摘要 (最多 {max_workers} 條執行緒)...")
+        with metrics.span("analyzer.map_seconds"):
+            partials = summarize_chunks(model, chunks, max_workers=max_workers)
+        documents = [f"--- 第 {i + 1} 批新聞重點 ---\n{partial}\n\n" for i, partial in enumerate(partials)]
+        source_label = "以下為各批新聞的重點筆記"
+        if len(chunks) == 1:
+            break # 只剩一批卻仍超過預算，再摘要下去也不會變小
+    prompt = build_report_prompt("".join(documents), source_label)
+    if stream:
+        return stream_text(model, prompt, on_section=on_section, on_checkpoint=on_checkpoint)
+    return generate_text(model, prompt, "report")
+
+def create_model(api_key):
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-flash-latest')
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(api_key):
+    """同一個 API 金鑰在整個行程中共用一個模型物件 (常駐模式下不必每次重新設定)。"""
+    with _models_lock:
+        if api_key not in _models:
+            _models[api_key] = create_model(api_key)
+        return _models[api_key]
+
+def analyze(new_articles=None, sections=None, run_id=None):
+    """
+    分析時間窗口內的新聞並產生報告，成功時回傳報告內文，失敗時回傳 None。
+    new_articles 是同一個行程中抓取階段剛寫入的文章 (含內文)，產生摘要時直接使用，不必再從資料庫讀出。
+    sections (SectionStream) 會在串流模式下陸續收到完成的報告段落；呼叫端負責在結束後 close。
+    有 run_id 時，完成後把報告 id 與上傳位置記入執行紀錄 (run_manifest)，接續執行時不必再呼叫 Gemini。
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("錯誤：找不到 GOOGLE_API_KEY 環境變數。")
+        return None
+
+    try:
+        model = get_model(api_key)
+    except Exception as e:
+        print(f"AI 設定失敗: {e}")
+        return None
+
+    print("AI 分析師已上線，正在調閱所有情報...")
+    since = datetime.now(timezone.utc) - timedelta(hours=ANALYSIS_WINDOW_HOURS)
+    with metrics.span("analyzer.load_index_seconds"):
+        articles, duplicate_count = load_article_index(since)
+    if not articles:
+        print("知識庫中沒有新聞可供分析。")
+        return None
+
+    if duplicate_count:
+        print(f"已合併 {duplicate_count} 篇近似重複的改寫新聞。")
+
+    metrics.incr("analyzer.articles", len(articles))
+    metrics.incr("analyzer.duplicates_merged", duplicate_count)
+    preloaded = {content_codec.content_hash(article['content']): article for article in new_articles or () if article.get('content')}
+    print(f"成功調閱 {len(articles)} 篇新聞，正在整理成報告...")
     print("報告已發送給 Gemini AI，分析需要一點時間...")
+    summary_id = None
     try:
-        response = model.generate_content(prompt)
-        ai_summary = response.text
+        # 串流模式先建立一筆未完成的報告，產生過程中持續寫入，中途失敗也留得下已產生的內容
+        summary_id = database.start_summary(len(articles)) if REPORT_STREAMING else None
+        report_options = {"stream": REPORT_STREAMING, "on_section": sections.put if sections is not None else None}
+        if summary_id is not None:
+            report_options["on_checkpoint"] = lambda text: database.update_summary(summary_id, text)
+
+        cache_hits = cache_misses = 0
+        if USE_ARTICLE_DIGESTS:
+            with metrics.span("analyzer.digests_seconds"):
+                documents, cache_hits, cache_misses = build_article_digests(model, articles, preloaded=preloaded)
+            ai_summary = generate_report(model, documents, source_label="以下為每篇新聞的重點摘要", **report_options)
+        else:
+            full_articles = iter_article_bodies(articles, preloaded)
+            ai_summary = generate_report(model, [format_article(article) for article in full_articles], **report_options)
         
+        metrics.incr("analyzer.report_chars", len(ai_summary))
+        if sections is not None and not REPORT_STREAMING:
+            sections.put(ai_summary) # 非串流模式下整份報告就是一個段落
         print("\n分析完成，正在將報告存入知識庫...")
-        database.add_summary(summary_text=ai_summary, source_article_count=len(articles))
+        if summary_id is not None:
+            database.update_summary(summary_id, ai_summary, is_complete=True)
+        else:
+            summary_id = database.add_summary(summary_text=ai_summary, source_article_count=len(articles))
         
-        # 產出 .md 檔案並上傳到 S3
+        # 報告直接從記憶體上傳成 .md 檔；報告已存入知識庫，上傳失敗不影響後續的 podcast
         tz_taipei = ZoneInfo("Asia/Taipei")
         file_timestamp = datetime.now(tz_taipei).strftime('%Y%m%d_%H')
-        filename = f"summary_{file_timestamp}.md"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(ai_summary)
-        
-        upload_to_s3(filename, S3_BUCKET_NAME, f"reports/{filename}")
-        os.remove(filename) # 上傳後刪除本地暫存檔
+        report_key = f"reports/summary_{file_timestamp}.md"
+        if not storage.upload_bytes(report_key, ai_summary, content_type="text/markdown; charset=utf-8"):
+            print("[警告] 報告上傳失敗，僅保存在知識庫中。")
+            report_key = None
+        if run_id and summary_id is not None:
+            database.set_stage_status(run_id, "analyzer", "complete", {"summary_id": summary_id, "report_key": report_key})
 
         print("\n\n========== Gemini AI 財經摘要報告 ========== \n")
         print(textwrap.fill(ai_summary.replace('*', ''), width=80))
         print("\n==================== 報告結束 ====================")
+        if USE_ARTICLE_DIGESTS:
+            print(f"文章摘要快取: 命中 {cache_hits} 篇，未命中 {cache_misses} 篇。")
+        return ai_summary
     except Exception as e:
         print(f"AI 分析或存檔過程中發生錯誤: {e}")
+        if summary_id is not None:
+            database.discard_summary(summary_id) # 串流中途失敗時不留下未完成的報告
+        return None
+
+def main():
+    with database.run_session(), metrics.span("analyzer", stage=True):
+        summary = analyze()
+    metrics.write_run_report("analyzer", "failed" if summary is None else "success")
+    if summary is None:
         sys.exit(1) # 使用非 0 的 exit code 代表錯誤
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+# 檔名: bench_analyzer.py
+# 以模擬延遲的假 Gemini 模型量測分批摘要 (map-reduce) 的耗時：
+# 同樣的分批方式，map 階段逐批呼叫 vs 並行呼叫；並確認逐篇摘要時不會一次把所有內文取出。
+# 用法: python bench_analyzer.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import analyzer
+from fakes import FakeGenerativeModel
+
+ARTICLE_COUNT = 400
+ARTICLE_CHARS = 1500
+TOKEN_BUDGET = 60000
+MODEL_LATENCY_SECONDS = 0.5
+
+def build_documents():
+    body = "台股今日在外資買超帶動下走高，半導體族群表現強勢。" * (ARTICLE_CHARS // 25)
+    return [analyzer.format_article({"headline": f"測試新聞 {i}", "content": body}) for i in range(ARTICLE_COUNT)]
+
+def run(documents, max_workers):
+    model = FakeGenerativeModel(latency_seconds=MODEL_LATENCY_SECONDS)
+    started = time.perf_counter()
+    analyzer.generate_report(model, documents, token_budget=TOKEN_BUDGET, max_workers=max_workers)
+    return time.perf_counter() - started, model.call_count, max(len(p) for p in model.prompts)
+
+def check_bounded_submission(item_count=200, max_workers=4):
+    """map_bounded 只在有空位時才從串流取出下一篇，已取出但還沒完成的篇數不會超過 2 * max_workers。"""
+    state = {"drawn": 0, "done": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def items():
+        for i in range(item_count):
+            with lock:
+                state["drawn"] += 1
+                state["peak"] = max(state["peak"], state["drawn"] - state["done"])
+            yield i
+
+    def work(i):
+        time.sleep(0.001)
+        with lock:
+            state["done"] += 1
+        return i
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = sorted(analyzer.map_bounded(executor, work, items(), 2 * max_workers))
+    assert results == list(range(item_count)), "有工作遺漏或重複"
+    assert state["peak"] <= 2 * max_workers + 1, f"同時保留了 {state['peak']} 篇內文"
+    print(f"逐篇摘要的串流送出: {item_count} 篇中最多同時保留 {state['peak']} 篇 (上限 2 x {max_workers} 條執行緒)")
+
+def main():
+    documents = build_documents()
+    total_tokens = sum(analyzer.estimate_tokens(d) for d in documents)
+    print(f"{ARTICLE_COUNT} 篇新聞，約 {total_tokens} tokens，每批上限 {TOKEN_BUDGET}，模型延遲 {MODEL_LATENCY_SECONDS}s")
+    for workers in [1, analyzer.MAP_REDUCE_MAX_WORKERS, 8]:
+        seconds, calls, largest_prompt = run(documents, workers)
+        print(f"  max_workers={workers}: {seconds:.2f}s, 呼叫模型 {calls} 次, 最大提示 {largest_prompt} 字")
+    check_bounded_submission()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# 檔名: bench_chunker.py
+# 比較舊的切段方式 (每句重新編碼整個 current_chunk、多道 regex 清理) 與新的單次掃描切段。
+# 以 5k 到 50k 字的合成 markdown 報告量測，並驗證每個後端的段落都不超過它的輸入上限 (Google 為 5000 bytes)。
+# 用法: python bench_chunker.py
+
+import html
+import re
+import time
+from xml.dom import minidom
+
+import podcaster
+import tts_backends
+
+REPORT_SIZES = [5000, 10000, 20000, 50000]
+REPEAT = 5
+
+def legacy_create_text_chunks(text, byte_limit=podcaster.BYTE_LIMIT):
+    """舊版的 create_text_chunks，保留在這裡作為比較基準。"""
+    chunks, current_chunk = [], ""
+    sentences = text.replace('\n', '。').replace('！', '。').replace('？', '。').split('。')
+    for sentence in sentences:
+        if not sentence: continue
+        sentence_with_period = sentence + "。"
+        if len((current_chunk + sentence_with_period).encode('utf-8')) > byte_limit:
+            if current_chunk: chunks.append(current_chunk)
+            current_chunk = sentence_with_period
+        else:
+            current_chunk += sentence_with_period
+    if current_chunk: chunks.append(current_chunk)
+    return chunks
+
+def legacy_pipeline(markdown):
+    cleaned_text = re.sub(r'#+\s*', '', markdown).replace('**', '').replace('*', '').replace('---', '')
+    return legacy_create_text_chunks(cleaned_text)
+
+def text_pipeline(markdown):
+    return podcaster.create_text_chunks(podcaster.segments_to_text(podcaster.markdown_to_segments(markdown)))
+
+def ssml_pipeline(markdown):
+    return podcaster.create_ssml_chunks(podcaster.markdown_to_segments(markdown), voice_name="zh-TW-YunJheNeural")
+
+def build_report(chars):
+    section = (
+        "## {n}. **第 {n} 段標題**\n"
+        "台股今日在**外資**買超帶動下走高，加權指數上漲 120 點！半導體族群表現強勢，台積電再創新高？\n"
+        "法人指出，美國聯準會降息預期升溫，資金持續回流亞洲市場。\n\n"
+    )
+    parts, length, n = [], 0, 1
+    while length < chars:
+        part = section.format(n=n)
+        parts.append(part)
+        length += len(part)
+        n += 1
+    return "".join(parts)
+
+def best_of(fn, arg):
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, len(result)
+
+def check_backend_limits(markdown):
+    """以每個後端的 max_input_bytes 切段 (SSML 與純文字兩種)，確認沒有段落超過上限，且內容沒有遺漏。"""
+    segments = podcaster.markdown_to_segments(markdown)
+    for backend_class in tts_backends.BACKENDS.values():
+        # 只需要類別上的屬性，不建立雲端 client
+        backend = object.__new__(backend_class)
+        limit = backend.max_input_bytes
+        for use_ssml in (True, False):
+            podcaster.USE_SSML, saved = use_ssml, podcaster.USE_SSML
+            try:
+                chunks, _ = podcaster.build_chunks(segments, backend)
+            finally:
+                podcaster.USE_SSML = saved
+            largest = max(len(chunk.encode('utf-8')) for chunk in chunks)
+            assert largest <= limit, f"{backend.name} 的段落 {largest} bytes 超過上限 {limit}"
+            if not use_ssml:
+                assert "".join(chunks) == "".join(podcaster.segments_to_text(segments).splitlines()), f"{backend.name} 切段後內容不符"
+            print(f"{backend.name:>8} {'SSML' if use_ssml else '純文字':<6} 上限 {limit} bytes: {len(chunks)} 段，最大 {largest} bytes")
+
+def check_oversized_escaping(byte_limit=5000):
+    """沒有標點又超過上限的長句含有 & 與 < 時，切開後每份 SSML 仍是合法的 XML，且沒有切斷實體、沒有遺漏文字。"""
+    text = "A&B<C>台股" * 2000
+    chunks = podcaster.create_ssml_chunks([("paragraph", text)], byte_limit=byte_limit)
+    for chunk in chunks:
+        assert len(chunk.encode('utf-8')) <= byte_limit, "SSML 段落超過上限"
+        minidom.parseString(chunk) # 實體被切成兩半時會丟出例外
+    assert "".join(html.unescape(tts_backends.SSML_TAG_PATTERN.sub('', chunk)) for chunk in chunks) == text, "切段後文字不符"
+    print(f"無標點長句含 & 與 <：{len(chunks)} 份 SSML 都是合法的 XML")
+
+def main():
+    print(f"{'字數':>8}{'舊做法(ms)':>14}{'新純文字(ms)':>16}{'新SSML(ms)':>14}{'段數(舊/新/SSML)':>20}")
+    for size in REPORT_SIZES:
+        report = build_report(size)
+        legacy_seconds, legacy_chunks = best_of(legacy_pipeline, report)
+        text_seconds, text_chunks = best_of(text_pipeline, report)
+        ssml_seconds, ssml_chunks = best_of(ssml_pipeline, report)
+        print(f"{size:>8}{legacy_seconds * 1000:>14.2f}{text_seconds * 1000:>16.2f}{ssml_seconds * 1000:>14.2f}{f'{legacy_chunks}/{text_chunks}/{ssml_chunks}':>20}")
+    print()
+    check_backend_limits(build_report(REPORT_SIZES[-1]))
+    check_oversized_escaping()
+
+if __name__ == "__main__":
+    main()
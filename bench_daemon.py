@@ -0,0 +1,231 @@
+# 檔名: bench_daemon.py
+# 驗證並量測常駐模式 (daemon.py)：
+# 1. 以虛擬時鐘快轉一段很長的排程，確認執行不會重疊、超時時略過錯過的排程、鎖檔被占用時略過 (cron 啟動的 run_all 也會拒絕執行)、執行紀錄的筆數有上限；
+# 2. 以 FakeWebDriver 比較「每次啟動瀏覽器」與 WarmBrowser 的啟動次數、耗時與記憶體 (會逐漸成長的瀏覽器會被定期重開)；
+# 3. 以 bench_pipeline 的離線環境，比較每次重新啟動行程 (cron) 與在常駐行程中連續執行的每次耗時與 RSS。
+# 用法: python bench_daemon.py [文章數] [執行次數]  (預設 200 篇、5 次)
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+DEFAULT_ARTICLE_COUNT = 200
+DEFAULT_RUNS = 5
+SIMULATED_RUNS = 600 # 虛擬時鐘模擬的執行次數
+BROWSER_LAUNCH_SECONDS = 0.3 # FakeWebDriver 的啟動時間
+BROWSER_PAGES_PER_RUN = 10 # 每次執行在瀏覽器中開幾頁
+BROWSER_LEAK_KB_PER_PAGE = 2048 # 每開一頁瀏覽器多占用的記憶體
+BROWSER_RUNS = 60
+# 流程模組在載入時讀取設定 (例如 METRICS_DIR)，子行程必須先準備好離線環境才能載入，因此各處都在函數內 import
+
+# --- 1. 排程 (虛擬時鐘) ---
+
+def simulate_schedule():
+    import daemon
+    clock = daemon.VirtualClock()
+    schedule = daemon.IntervalSchedule(60, anchor=clock.now())
+    state = {"running": False, "overlaps": 0, "calls": 0}
+
+    def job():
+        if state["running"]:
+            state["overlaps"] += 1
+        state["running"] = True
+        state["calls"] += 1
+        # 大部分執行 10 分鐘；每 7 次有一次卡住 150 分鐘 (跨過兩個排程)，每 11 次有一次失敗
+        clock.advance(150 * 60 if state["calls"] % 7 == 0 else 10 * 60)
+        state["running"] = False
+        return state["calls"] % 11 != 0
+
+    history_size = 20
+    runner = daemon.Daemon(job=job, schedule=schedule, clock=clock, history_size=history_size, lock_file=None)
+    started = time.perf_counter()
+    _quietly(lambda: runner.run(max_runs=SIMULATED_RUNS))
+    elapsed = time.perf_counter() - started
+
+    slots = runner.runs + runner.skipped
+    starts = [record["started_at"] for record in runner.history]
+    assert state["overlaps"] == 0, "執行發生重疊"
+    assert len(runner.history) == history_size, "執行紀錄沒有維持上限"
+    assert starts == sorted(starts), "執行紀錄順序錯誤"
+    assert all(record["scheduled_for"] <= record["started_at"] for record in runner.history), "有執行早於排程時間"
+    print(f"虛擬時鐘快轉 {(clock.now() - schedule.anchor) / timedelta(days=1):.1f} 天 (每小時一次): 執行 {runner.runs} 次、"
+          f"略過 {runner.skipped} 個排程 (共 {slots} 個)，重疊 0 次，保留最近 {len(runner.history)} 筆紀錄，實際耗時 {elapsed * 1000:.0f} ms")
+
+    daily = daemon.DailySchedule(["07:00", "19:00"])
+    moments = [daily.next_after(clock.now())]
+    for _ in range(3):
+        moments.append(daily.next_after(moments[-1]))
+    print("每天 07:00, 19:00 的下四次: " + ", ".join(f"{moment.astimezone(daemon.SCHEDULE_TIMEZONE):%m-%d %H:%M}" for moment in moments))
+
+    lock_path = os.path.join(tempfile.mkdtemp(prefix="bench_daemon_"), "pipeline.lock")
+    locked_runner = daemon.Daemon(job=lambda: True, clock=daemon.VirtualClock(), lock_file=lock_path)
+    with daemon.run_lock(lock_path) as acquired:
+        assert acquired
+        _quietly(lambda: locked_runner._run_once(locked_runner.clock.now()))
+        with daemon.run_lock(lock_path) as second:
+            assert not second, "同一個鎖檔被第二個持有者取得"
+    assert locked_runner.runs == 0 and locked_runner.skipped == 1, "鎖檔被占用時沒有略過"
+    print("鎖檔被其他執行占用時略過該次排程: OK")
+    check_run_all_lock(lock_path)
+
+def check_run_all_lock(lock_path):
+    """cron 啟動的 run_all 與常駐模式共用鎖檔：鎖檔被占用時不執行流程，並以非 0 的 exit code 結束。"""
+    import daemon
+    import run_all
+    calls = []
+    saved = run_all.run_pipeline, daemon.DAEMON_LOCK_FILE, sys.argv
+    run_all.run_pipeline = lambda resume_run_id=None: calls.append(resume_run_id) or True
+    daemon.DAEMON_LOCK_FILE, sys.argv = lock_path, ["run_all.py"]
+    try:
+        with daemon.run_lock(lock_path) as acquired:
+            assert acquired
+            try:
+                _quietly(run_all.main)
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code
+        assert exit_code not in (0, None) and not calls, "鎖檔被占用時 run_all 仍然執行"
+        _quietly(run_all.main) # 鎖檔釋放後可以正常執行
+        assert calls == [None], "鎖檔釋放後 run_all 沒有執行"
+    finally:
+        run_all.run_pipeline, daemon.DAEMON_LOCK_FILE, sys.argv = saved
+    print("鎖檔被占用時 cron 啟動的 run_all 拒絕執行 (exit code 非 0): OK")
+
+def _quietly(action):
+    """執行 action 但不印出 Daemon 的進度訊息。"""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        return action()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+# --- 2. 瀏覽器重用 ---
+
+def browse(driver):
+    for page in range(BROWSER_PAGES_PER_RUN):
+        driver.get(f"https://example.invalid/{page}")
+
+def compare_browsers():
+    import listing_sources
+    from fakes import FakeWebDriver
+
+    def factory():
+        return FakeWebDriver(launch_seconds=BROWSER_LAUNCH_SECONDS, leak_kb_per_page=BROWSER_LEAK_KB_PER_PAGE)
+
+    started = time.perf_counter()
+    cold_peak_kb = 0
+    for _ in range(BROWSER_RUNS):
+        driver = factory()
+        browse(driver)
+        cold_peak_kb = max(cold_peak_kb, driver.rss_kb)
+        driver.quit()
+    cold_seconds = time.perf_counter() - started
+
+    browser = listing_sources.WarmBrowser(factory=factory, max_uses=listing_sources.BROWSER_MAX_USES, max_rss_growth_mb=100,
+                                          rss_probe=lambda driver: driver.rss_kb)
+    started = time.perf_counter()
+    warm_peak_kb = 0
+    drivers = set()
+
+    def warm_run():
+        nonlocal warm_peak_kb
+        driver = browser.acquire()
+        drivers.add(driver)
+        try:
+            browse(driver)
+            warm_peak_kb = max(warm_peak_kb, driver.rss_kb)
+        finally:
+            browser.release()
+
+    for _ in range(BROWSER_RUNS):
+        _quietly(warm_run)
+    browser.close()
+    warm_seconds = time.perf_counter() - started
+    assert all(driver.closed for driver in drivers), "有瀏覽器沒有被關閉"
+
+    print(f"{BROWSER_RUNS} 次執行，每次開 {BROWSER_PAGES_PER_RUN} 頁 (每頁記憶體 +{BROWSER_LEAK_KB_PER_PAGE // 1024} MB，啟動 {BROWSER_LAUNCH_SECONDS}s)")
+    print(f"{'方式':<26}{'啟動次數':>8}{'總耗時(s)':>11}{'峰值(MB)':>10}")
+    print(f"{'每次啟動、用完即關':<26}{BROWSER_RUNS:>8}{cold_seconds:>11.2f}{cold_peak_kb / 1024:>10.0f}")
+    print(f"{'WarmBrowser':<26}{browser.launches:>8}{warm_seconds:>11.2f}{warm_peak_kb / 1024:>10.0f}")
+
+# --- 3. 常駐與每次重新啟動的完整流程 ---
+
+def child_cold(article_count, workdir, port):
+    """模擬 cron：一個行程只執行一次流程。"""
+    import bench_pipeline
+    server = bench_pipeline.prepare_offline_run(article_count, workdir, port)
+    import daemon
+    succeeded = daemon.run_pipeline_once()
+    server.shutdown()
+    print(json.dumps({"status": "success" if succeeded else "failed", "rss_kb": daemon.current_rss_kb()}))
+
+def child_warm(article_count, workdir, port, runs):
+    """模擬常駐：同一個行程依排程連續執行 runs 次 (以虛擬時鐘跳過排程之間的等待)。"""
+    import bench_pipeline
+    server = bench_pipeline.prepare_offline_run(article_count, workdir, port)
+    import daemon
+    runner = daemon.Daemon(clock=daemon.VirtualClock(), lock_file=os.path.join(workdir, "pipeline.lock"))
+    runner.run(max_runs=runs)
+    server.shutdown()
+    print(json.dumps(list(runner.history)))
+
+def run_child(*args):
+    proc = subprocess.run([sys.executable, __file__, *map(str, args)], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        print(f"{args[0]} 執行失敗:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+        sys.exit(1)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def compare_pipelines(article_count, runs):
+    port = free_port() # 兩種方式各自的所有執行共用同一個 port，文章網址相同，第二次起只抓新的文章
+    cold = []
+    workdir = tempfile.mkdtemp(prefix="bench_daemon_cold_")
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run_child("--child-cold", article_count, workdir, port)
+        cold.append((time.perf_counter() - started, result["status"], result["rss_kb"]))
+
+    started = time.perf_counter()
+    history = run_child("--child-warm", article_count, tempfile.mkdtemp(prefix="bench_daemon_warm_"), port, runs)
+    warm_process_seconds = time.perf_counter() - started
+    warm_setup_seconds = warm_process_seconds - sum(record["wall_seconds"] for record in history)
+
+    print(f"{article_count} 篇文章，連續執行 {runs} 次 (每次冷啟動的耗時包含直譯器啟動與載入所有模組)")
+    print(f"{'第幾次':<8}{'冷啟動(s)':>11}{'常駐(s)':>10}{'冷啟動RSS(MB)':>15}{'常駐RSS(MB)':>13}")
+    for i, ((cold_seconds, cold_status, cold_rss), record) in enumerate(zip(cold, history), 1):
+        assert cold_status == "success" and record["status"] == "success", f"第 {i} 次執行失敗"
+        warm_seconds = record["wall_seconds"] + (warm_setup_seconds if i == 1 else 0)
+        print(f"{i:<8}{cold_seconds:>11.2f}{warm_seconds:>10.2f}{(cold_rss or 0) / 1024:>15.0f}{(record['rss_kb'] or 0) / 1024:>13.0f}")
+    cold_total = sum(seconds for seconds, _, _ in cold)
+    print(f"{'合計':<8}{cold_total:>11.2f}{warm_process_seconds:>10.2f}    (常駐快 {cold_total / warm_process_seconds:.1f}x)")
+
+def main():
+    article_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ARTICLE_COUNT
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RUNS
+    print("=== 排程 ===")
+    simulate_schedule()
+    print("\n=== 瀏覽器重用 ===")
+    compare_browsers()
+    print("\n=== 完整流程 ===")
+    compare_pipelines(article_count, runs)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 4 and sys.argv[1] == "--child-cold":
+        child_cold(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]))
+    elif len(sys.argv) > 5 and sys.argv[1] == "--child-warm":
+        child_warm(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        main()
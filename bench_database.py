@@ -0,0 +1,46 @@
+# 檔名: bench_database.py
+# 比較「每篇各開連線、各自 commit」與「共用連線 + 單一交易 executemany」的文章寫入速度。
+# 在暫存目錄建立獨立的資料庫，不會動到 news.db。
+# 用法: python bench_database.py
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+
+ARTICLE_COUNTS = [100, 500, 2000]
+
+def build_articles(count, prefix):
+    now = datetime.now(timezone.utc)
+    return [{
+        "headline": f"測試新聞 {i}",
+        "url": f"https://example.com/{prefix}/{i}",
+        "time_str": "N/A",
+        "datetime": now - timedelta(minutes=i),
+        "content": "台股今日在外資買超帶動下走高，半導體族群表現強勢。" * 40
+    } for i in range(count)]
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.setup_database()
+        print(f"{'篇數':>8}{'逐篇 commit(秒)':>18}{'批次交易(秒)':>16}{'加速':>8}")
+        for count in ARTICLE_COUNTS:
+            per_row = build_articles(count, f"row{count}")
+            started = time.perf_counter()
+            for article in per_row:
+                database.add_article(article)
+            per_row_seconds = time.perf_counter() - started
+
+            batched = build_articles(count, f"batch{count}")
+            started = time.perf_counter()
+            with database.run_session():
+                inserted = database.add_articles(batched)
+            batch_seconds = time.perf_counter() - started
+            assert inserted == count
+            print(f"{count:>8}{per_row_seconds:>18.3f}{batch_seconds:>16.3f}{per_row_seconds / batch_seconds:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# 檔名: bench_dedup.py
+# 以數千篇合成的中文財經新聞量測近似重複分群的速度與準確度。
+# 每則「原始新聞」會產生數篇改寫稿 (換掉部分字詞、加上媒體前綴、調整結尾)。
+# 分別量測第一次執行 (每篇都要計算簽章) 與之後的執行 (簽章已依內文雜湊存在資料庫，只需讀回再分群)，
+# 並確認另一個行程算出的簽章完全相同 (存進資料庫的簽章才能沿用)。
+# 用法: python bench_dedup.py
+
+import random
+import subprocess
+import sys
+import time
+
+import dedup
+
+STORY_COUNT = 1000
+REWRITES_PER_STORY = 2 # 每則新聞另外產生幾篇改寫稿
+SENTENCES_PER_STORY = 25
+SEED = 42
+REPEAT = 3 # 每項量測取最快的一次
+
+COMPANIES = ["台積電", "鴻海", "聯發科", "廣達", "緯創", "台達電", "日月光", "大立光", "國泰金", "富邦金", "長榮", "中鋼"]
+SUBJECTS = ["外資", "投信", "自營商", "法人", "分析師", "董事長", "市場人士"]
+ACTIONS = ["大舉買超", "調升目標價至", "公布營收達", "預估明年成長", "看好後市達", "宣布擴產投資", "下修財測至"]
+UNITS = ["億元", "元", "%", "張", "點"]
+PREFIXES = ["（中央社）", "（經濟日報）", "（工商時報）", "【鉅亨網】", ""]
+
+def make_sentence(rng):
+    return f"{rng.choice(SUBJECTS)}指出{rng.choice(COMPANIES)}{rng.choice(ACTIONS)}{rng.randint(1, 9999)}{rng.choice(UNITS)}，{rng.choice(COMPANIES)}股價{rng.choice(['上漲', '下跌', '持平'])}{rng.randint(1, 99)}點{rng.randint(0, 9)}%。"
+
+def rewrite(text, rng):
+    sentences = text.split("。")
+    # 改寫稿：約一成的句子被換掉，並加上不同媒體的前綴與結尾
+    for _ in range(max(1, len(sentences) // 10)):
+        sentences[rng.randrange(len(sentences))] = make_sentence(rng)[:-1]
+    return rng.choice(PREFIXES) + "。".join(sentences) + rng.choice(["", "（編輯：王小明）", "更多新聞請見官網。"])
+
+def build_corpus():
+    rng = random.Random(SEED)
+    articles, truth = [], []
+    for story in range(STORY_COUNT):
+        original = "".join(make_sentence(rng) for _ in range(SENTENCES_PER_STORY))
+        for version in range(REWRITES_PER_STORY + 1):
+            articles.append({"headline": f"新聞 {story}-{version}", "content": original if version == 0 else rewrite(original, rng)})
+            truth.append(story)
+    return articles, truth
+
+def best_of(fn):
+    best, result = float('inf'), None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def check_stable_signature(text):
+    """在另一個行程計算同一篇文章的簽章，Python 內建的 str hash 每個行程不同，固定的雜湊函數則必須相同。"""
+    code = "import sys, dedup; print(dedup.signature_to_bytes(dedup.minhash_signature(sys.stdin.read())).hex())"
+    output = subprocess.run([sys.executable, "-c", code], input=text, capture_output=True, text=True, check=True).stdout.strip()
+    assert output == dedup.signature_to_bytes(dedup.minhash_signature(text)).hex(), "不同行程算出的簽章不同"
+
+def main():
+    articles, truth = build_corpus()
+    texts = [a['content'] for a in articles]
+    average_chars = sum(len(text) for text in texts) // len(texts)
+    print(f"{len(articles)} 篇合成新聞 ({STORY_COUNT} 則原始新聞，每篇平均 {average_chars} 字)")
+
+    sign_seconds, signatures = best_of(lambda: [dedup.minhash_signature(text) for text in texts])
+    stored = [dedup.signature_to_bytes(signature) for signature in signatures]
+    load_seconds, loaded = best_of(lambda: [dedup.signature_from_bytes(data) for data in stored])
+    assert loaded == signatures, "簽章存取後不一致"
+    cluster_seconds, clusters = best_of(lambda: dedup.cluster_signatures(loaded))
+    check_stable_signature(texts[0])
+
+    # 準確度：同一群內是否都來自同一則原始新聞 (precision)，同一則新聞是否被分在同一群 (recall)
+    pure_clusters = sum(1 for c in clusters if len({truth[i] for i in c}) == 1)
+    story_to_clusters = {}
+    for index, cluster in enumerate(clusters):
+        for i in cluster:
+            story_to_clusters.setdefault(truth[i], set()).add(index)
+    merged_stories = sum(1 for s in story_to_clusters.values() if len(s) == 1)
+
+    print(f"計算簽章: {sign_seconds:.3f} 秒，讀回已存的簽章: {load_seconds:.3f} 秒，分群: {cluster_seconds:.3f} 秒")
+    print(f"第一次執行 (全部計算簽章): {sign_seconds + cluster_seconds:.3f} 秒；簽章已存時: {load_seconds + cluster_seconds:.3f} 秒")
+    print(f"分成 {len(clusters)} 群 (理想為 {STORY_COUNT} 群)，不同行程的簽章一致: OK")
+    print(f"純度: {pure_clusters}/{len(clusters)} 群只含同一則新聞")
+    print(f"召回: {merged_stories}/{STORY_COUNT} 則新聞的所有改寫稿都被分在同一群")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# 檔名: bench_fetch.py
+# 比較「逐一抓取」與「並行 + 共用連線池」兩種文章內文抓取方式的耗時。
+# 會在本機啟動一個模擬 Yahoo 文章頁的 HTTP 伺服器，不需要連上網路。
+
+import time
+
+import news_hunter
+from fakes import start_stub_server
+
+ARTICLE_COUNT = 100
+SIMULATED_LATENCY_SECONDS = 0.15 # 模擬真實網路的延遲
+
+ARTICLE_PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>
+<header><nav>Yahoo股市</nav></header>
+<article>
+  <h1>{title}</h1>
+  <div class="caas-attr-meta"><time datetime="2025-10-16T02:30:00.000Z">2025年10月16日 上午10:30</time></div>
+  <div class="caas-body">
+    <p>台股今日開高走高，加權指數終場上漲 {n} 點，成交量放大至新台幣 4000 億元。</p>
+    <p>外資連續第三個交易日買超，半導體族群表現強勢，台積電再創新高。</p>
+    <p>法人指出，美國聯準會降息預期升溫，資金持續回流亞洲市場。</p>
+  </div>
+</article>
+<footer>Copyright Yahoo</footer>
+</body></html>
+"""
+
+def article_page(path):
+    time.sleep(SIMULATED_LATENCY_SECONDS)
+    n = path.rsplit('/', 1)[-1]
+    return "text/html", ARTICLE_PAGE.format(title=f"測試新聞 {n}", n=n)
+
+def main():
+    server, base_url = start_stub_server(article_page)
+    urls = [f"{base_url}/news/{i}" for i in range(ARTICLE_COUNT)]
+    print(f"本機模擬伺服器: {base_url}，共 {ARTICLE_COUNT} 篇文章，每次請求延遲 {SIMULATED_LATENCY_SECONDS} 秒")
+
+    started = time.perf_counter()
+    serial_results = [news_hunter.scrape_article_details(url) for url in urls]
+    serial_seconds = time.perf_counter() - started
+    print(f"逐一抓取: {serial_seconds:.2f} 秒")
+
+    # 本機伺服器不需要禮貌限速，否則量到的只是限速器的間隔
+    started = time.perf_counter()
+    concurrent_results = news_hunter.fetch_articles_concurrently(urls, rate_limiter=news_hunter.HostRateLimiter(min_interval=0))
+    concurrent_seconds = time.perf_counter() - started
+    print(f"並行抓取 ({news_hunter.MAX_FETCH_WORKERS} 執行緒): {concurrent_seconds:.2f} 秒")
+
+    assert serial_results == concurrent_results, "並行抓取的結果或順序與逐一抓取不一致"
+    print(f"加速倍數: {serial_seconds / concurrent_seconds:.1f}x (結果與順序一致)")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
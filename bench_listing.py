@@ -0,0 +1,143 @@
+# 檔名: bench_listing.py
+# 比較 HTTP 列表來源與 Selenium (無頭 Chrome) 列表來源的啟動時間、峰值記憶體與總耗時。
+# 列表頁使用本機伺服器提供的錄製樣本 (模擬 Yahoo 的 #YDC-Stream-Proxy 結構)，不需要連上網路。
+# 另外以超過一頁的列表確認 HTTP 來源會分頁讀到涵蓋整個時間窗口，只有首頁時則回傳 None 交給 Selenium 備援。
+# 用法: python bench_listing.py
+
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+from fakes import start_stub_server
+
+LISTING_ITEM_COUNT = 60
+HOURS_TO_FETCH = 12
+PAGED_ITEM_COUNT = 200 # 分頁列表的總篇數 (每篇相差 5 分鐘，約 16 小時)
+PAGED_PAGE_SIZE = 24 # 首頁只涵蓋約 2 小時
+
+def build_listing_fixture(item_count=LISTING_ITEM_COUNT, first=0, minutes_apart=15):
+    """產生與 Yahoo 列表頁結構相同的 HTML，包含第 first 篇起的 item_count 篇，新聞時間每篇相差 minutes_apart 分鐘。"""
+    items = []
+    for i in range(first, first + item_count):
+        minutes = (i + 1) * minutes_apart
+        time_text = f"{minutes} 分鐘前" if minutes < 60 else f"{minutes // 60} 小時前"
+        items.append(
+            f'<li><div><span>Yahoo股市</span><span>{time_text}</span></div>'
+            f'<h3><a href="/news/{i}.html">測試新聞標題 {i}</a></h3><p>摘要文字 {i}</p></li>'
+        )
+    return f'<html><body><div id="YDC-Stream-Proxy"><ul>{"".join(items)}</ul></div></body></html>'
+
+def paged_listing(path):
+    """首頁與分頁 API (?offset=) 都回傳 PAGED_PAGE_SIZE 篇的 HTML 片段，全部讀完共 PAGED_ITEM_COUNT 篇。"""
+    url = urlparse(path)
+    offset = int(parse_qs(url.query).get("offset", ["0"])[0]) if url.path == "/more" else 0
+    count = max(0, min(PAGED_PAGE_SIZE, PAGED_ITEM_COUNT - offset))
+    return "text/html", build_listing_fixture(count, first=offset, minutes_apart=5)
+
+def check_window_coverage():
+    """
+    列表超過一頁時，HTTP 來源必須分頁讀到比時間窗口更舊的新聞才算成功；
+    沒有分頁樣板而首頁只涵蓋部分窗口時必須回傳 None，讓 Selenium 備援接手，而不是默默少掉大半的新聞。
+    """
+    import listing_sources
+    server, base_url = start_stub_server(paged_listing)
+    now_utc = datetime.now(timezone.utc)
+    time_window = now_utc - timedelta(hours=HOURS_TO_FETCH)
+    try:
+        paged = listing_sources.HttpListingSource(listing_url=f"{base_url}/tw-market", page_url_template=f"{base_url}/more?offset={{offset}}",
+                                                  base_url=base_url)
+        items = paged.fetch(now_utc, time_window)
+        assert items, "分頁列表讀取失敗"
+        assert listing_sources.listing_reaches_window(items, now_utc, time_window), "分頁讀取沒有涵蓋整個時間窗口"
+        in_window = sum(1 for i in range(PAGED_ITEM_COUNT) if (i + 1) * 5 < HOURS_TO_FETCH * 60)
+        assert len(items) >= in_window, f"時間窗口內有 {in_window} 篇，只讀到 {len(items)} 篇"
+        first_page_only = listing_sources.HttpListingSource(listing_url=f"{base_url}/tw-market", page_url_template="", base_url=base_url)
+        assert first_page_only.fetch(now_utc, time_window) is None, "只涵蓋約 2 小時的首頁被當成完整列表"
+    finally:
+        server.shutdown()
+    print(f"分頁列表讀到 {len(items)} 篇並涵蓋 {HOURS_TO_FETCH} 小時窗口；沒有分頁樣板時首頁不足，交給備援: OK\n")
+
+def _tree_rss_kb(root_pid):
+    """加總 root_pid 及其所有子孫行程的 RSS (KB)，Chrome 會開很多子行程，所以要整棵樹一起算。"""
+    children, rss = {}, {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{entry}/statm') as f:
+                pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        pid, ppid = int(entry), int(fields[1])
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+def run_backend_in_child(backend, listing_url):
+    """在獨立行程中執行指定的來源，回傳 (結果 dict, 峰值 RSS KB, 總耗時)。"""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--child", backend, listing_url],
+        stdout=subprocess.PIPE, text=True
+    )
+    peak_kb = 0
+    while proc.poll() is None:
+        peak_kb = max(peak_kb, _tree_rss_kb(proc.pid))
+        time.sleep(0.05)
+    wall_seconds = time.perf_counter() - started
+    output = proc.stdout.read().strip().splitlines()
+    result = json.loads(output[-1]) if output and output[-1].startswith('{') else {"error": "no result"}
+    return result, peak_kb, wall_seconds
+
+def child_main(backend, listing_url):
+    import listing_sources
+    now_utc = datetime.now(timezone.utc)
+    time_window = now_utc - timedelta(hours=HOURS_TO_FETCH)
+    result = {}
+    try:
+        started = time.perf_counter()
+        if backend == "http":
+            source = listing_sources.HttpListingSource(listing_url=listing_url, page_url_template="")
+            import requests
+            requests.get(listing_url, timeout=10).raise_for_status() # 量測「可以開始讀取列表」所需的時間
+        else:
+            source = listing_sources.SeleniumListingSource(listing_url=listing_url)
+            listing_sources.create_chrome_driver().quit()
+        result["startup_seconds"] = time.perf_counter() - started
+        items = source.fetch(now_utc, time_window)
+        result["items"] = len(items) if items else 0
+    except Exception as e:
+        result["error"] = str(e)
+    print(json.dumps(result))
+
+def main():
+    check_window_coverage()
+    fixture = build_listing_fixture()
+    server, base_url = start_stub_server(lambda path: ("text/html", fixture))
+    listing_url = f"{base_url}/tw-market"
+
+    print(f"{'來源':<10}{'啟動(秒)':>10}{'峰值RSS(MB)':>14}{'總耗時(秒)':>12}{'項目數':>8}")
+    for backend in ["http", "selenium"]:
+        result, peak_kb, wall_seconds = run_backend_in_child(backend, listing_url)
+        if "error" in result:
+            print(f"{backend:<10} 執行失敗: {result['error'][:80]}")
+            continue
+        print(f"{backend:<10}{result['startup_seconds']:>10.2f}{peak_kb / 1024:>14.1f}{wall_seconds:>12.2f}{result['items']:>8}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child_main(sys.argv[2], sys.argv[3])
+    else:
+        main()
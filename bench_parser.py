@@ -0,0 +1,116 @@
+# 檔名: bench_parser.py
+# 比較文章頁擷取 (發布時間 + 內文段落) 的三種解析方式：原本的 BeautifulSoup 完整解析、
+# html.parser + SoupStrainer、lxml 直接解析。量測每頁解析時間與解析時的記憶體增量 (各自在獨立行程中量測)。
+# 用法: python bench_parser.py [存放 Yahoo 文章頁 .html 的資料夾]
+#       未指定資料夾時，以結構與大小接近 Yahoo 文章頁的合成頁面代替。
+
+import glob
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+PAGE_COUNT = 200 # 合成頁面的數量
+REPEATS = 3
+MODES = ["html.parser (完整解析)", "html.parser + SoupStrainer", "lxml"]
+
+def synthetic_page(n):
+    """模擬 Yahoo 文章頁：大量 script、導覽列與推薦新聞，真正需要的只有 <time> 與 <article> 內的段落。"""
+    scripts = "".join(f'<script>window.__state{i} = {{"key": "{"v" * 300}", "n": {i}}};</script>' for i in range(40))
+    styles = "".join(f'<link rel="stylesheet" href="/static/s{i}.css">' for i in range(30))
+    nav = "".join(f'<li class="nav-item"><a href="/category/{i}"><span>分類 {i}</span></a></li>' for i in range(250))
+    paragraphs = "".join(
+        f"<p>台股今日開高走高，加權指數終場上漲 {n + i} 點，成交量放大至新台幣 4000 億元，<a href='/quote/2330'>台積電</a>再創新高。</p>"
+        for i in range(25)
+    )
+    related = "".join(f'<div class="related"><h3><a href="/news/{i}">推薦新聞 {i}</a></h3><p>推薦摘要 {i}</p></div>' for i in range(150))
+    return (
+        f'<!DOCTYPE html><html lang="zh-Hant-TW"><head><meta charset="utf-8"><title>測試新聞 {n}</title>{styles}{scripts}</head>'
+        f'<body><header><nav><ul>{nav}</ul></nav></header><main>'
+        f'<article><h1>測試新聞 {n}</h1><div class="caas-attr-meta"><time datetime="2025-10-16T02:30:00.000Z">上午10:30</time></div>'
+        f'<div class="caas-body">{paragraphs}</div></article>'
+        f'<aside>{related}</aside></main><footer>{"<p>版權所有</p>" * 40}</footer></body></html>'
+    )
+
+def load_corpus(directory):
+    if not directory:
+        return [synthetic_page(n) for n in range(PAGE_COUNT)]
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+def build_extractor(mode):
+    """回傳 extract(html) -> (時間屬性, 內文)。"""
+    from bs4 import BeautifulSoup
+    import news_sources
+    if mode == MODES[0]:
+        # 原本 scrape_article_details 的做法
+        def extract(html):
+            soup = BeautifulSoup(html, 'html.parser')
+            time_tag = soup.select_one('time[datetime]')
+            body = soup.select_one('article')
+            content = "\n".join(p.text for p in body.find_all('p')) if body else ""
+            return (time_tag['datetime'] if time_tag else None), content
+        return extract
+    parser = "html.parser" if mode == MODES[1] else "lxml"
+    return news_sources.ArticleExtractor('time[datetime]', 'article', 'p', parser=parser).extract
+
+def run_child(mode, directory):
+    pages = load_corpus(directory)
+    extract = build_extractor(mode)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    per_page = []
+    results = None
+    for _ in range(REPEATS):
+        results = []
+        for html in pages:
+            started = time.perf_counter()
+            results.append(extract(html))
+            per_page.append(time.perf_counter() - started)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    per_page.sort()
+    print(json.dumps({
+        "mean_ms": sum(per_page) / len(per_page) * 1000,
+        "p50_ms": per_page[len(per_page) // 2] * 1000,
+        "p90_ms": per_page[int(len(per_page) * 0.9)] * 1000,
+        "extra_rss_kb": peak_kb - baseline_kb,
+        "results": [[published, hashlib.sha1(content.encode('utf-8')).hexdigest()] for published, content in results],
+    }))
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else ""
+    pages = load_corpus(directory)
+    if not pages:
+        print(f"資料夾 {directory} 中沒有 .html 檔案。")
+        sys.exit(1)
+    average_kb = sum(len(page.encode('utf-8')) for page in pages) / len(pages) / 1024
+    print(f"語料: {len(pages)} 頁 ({'合成頁面' if not directory else directory})，平均 {average_kb:.0f} KB/頁，每頁重複 {REPEATS} 次")
+
+    outputs = {}
+    for mode in MODES:
+        proc = subprocess.run([sys.executable, __file__, "--child", mode, directory], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            print(f"{mode} 執行失敗:\n{proc.stderr[-2000:]}")
+            sys.exit(1)
+        outputs[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    baseline = outputs[MODES[0]]
+    print(f"{'解析方式':<28}{'平均(ms)':>10}{'p50(ms)':>10}{'p90(ms)':>10}{'額外RSS(MB)':>13}{'加速':>8}")
+    for mode in MODES:
+        result = outputs[mode]
+        assert result["results"] == baseline["results"], f"{mode} 的擷取結果與原本的做法不一致"
+        print(f"{mode:<28}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}"
+              f"{result['extra_rss_kb'] / 1024:>13.1f}{baseline['mean_ms'] / result['mean_ms']:>7.1f}x")
+    print("三種方式擷取出的時間與內文完全一致。")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "")
+    else:
+        main()
@@ -0,0 +1,206 @@
+# 檔名: bench_pipeline.py
+# 完全離線地執行整個 run_all 流程，量測各階段在不同資料量下的耗時與吞吐量。
+# 所有外部服務都換成本機替身：本機 HTTP 伺服器提供合成的列表與文章頁 (取代 Yahoo)、
+# FakeGenerativeModel (取代 Gemini，可設定延遲與輸出速度)、LocalTTSBackend (取代雲端語音合成)、
+# LocalObjectStore (取代 S3)。每個規模在獨立行程與暫存資料夾中執行，資料庫與 RSS 互不影響。
+# 用法: python bench_pipeline.py [文章數 ...]  (預設 50 500 5000)
+
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+from fakes import start_stub_server
+
+DEFAULT_SIZES = [50, 500, 5000]
+LISTING_PAGES = 20 # 列表分成幾頁 (首頁 + 分頁 API)，每頁的篇數隨規模調整
+OUT_OF_WINDOW_ITEMS = 5 # 列表尾端超出時間窗口的舊新聞，讓列表來源判斷已涵蓋完整窗口
+MODEL_LATENCY_SECONDS = 0.01 # 模型每次呼叫的固定延遲
+MODEL_TOKENS_PER_SECOND = 10000 # 模型的輸出速度
+REPORT_PARAGRAPH_REPEAT = 40 # 把假報告每段內文重複幾次，放大成接近實際長度 (約 3000 字) 的報告
+TTS_LATENCY_SECONDS = 0.05 # 語音合成每段的延遲
+PAGE_FILLER = "".join(f'<script>window.__state{i} = {{"key": "{"v" * 200}"}};</script>' for i in range(40)) # 模擬文章頁中用不到的部分
+VOCABULARY = ["台積電", "鴻海", "聯發科", "廣達", "緯創", "長榮", "陽明", "中華電", "富邦金", "國泰金", "日月光", "大立光",
+              "外資", "投信", "自營商", "加權指數", "櫃買指數", "成交量", "法說會", "營收", "毛利率", "除息", "AI 伺服器",
+              "半導體", "航運", "金融股", "升息", "降息", "通膨", "聯準會", "美元", "新台幣", "漲停", "跌停", "創新高", "回檔"]
+
+# --- 本機替身: 新聞網站 ---
+
+def article_age_minutes(index, article_count):
+    """第 index 篇距今幾分鐘：前 article_count 篇平均分布在 11 小時內，其後的幾篇超出 12 小時窗口。"""
+    if index < article_count:
+        return 1 + index * 660 // article_count
+    return 13 * 60 + index - article_count
+
+def time_text(minutes):
+    return f"{minutes} 分鐘前" if minutes < 60 else f"{minutes // 60} 小時前"
+
+def article_body(index):
+    """每篇內容都不同的合成內文，避免被近似重複偵測合併。"""
+    rng = random.Random(index)
+    paragraphs = []
+    for _ in range(12):
+        words = [f"{rng.choice(VOCABULARY)}{rng.randint(1, 9999)}" for _ in range(12)]
+        paragraphs.append(f"<p>{'，'.join(words)}。</p>")
+    return "".join(paragraphs)
+
+class FixtureSite:
+    """合成的新聞網站：列表首頁 (HTML)、分頁 API (JSON) 與文章頁，列表依規模平均分成 LISTING_PAGES 頁。"""
+    def __init__(self, article_count):
+        self.article_count = article_count
+        self.page_size = -(-(article_count + OUT_OF_WINDOW_ITEMS) // LISTING_PAGES)
+
+    def _listing_items(self, offset):
+        total = self.article_count + OUT_OF_WINDOW_ITEMS
+        return [{"title": f"合成新聞 {i}", "url": f"/news/{i}.html", "time_text": time_text(article_age_minutes(i, self.article_count))}
+                for i in range(offset, min(offset + self.page_size, total))]
+
+    def route(self, path):
+        url = urlparse(path)
+        if url.path == "/listing":
+            items = "".join(f'<li><div><span>合成來源</span><span>{item["time_text"]}</span></div>'
+                            f'<h3><a href="{item["url"]}">{item["title"]}</a></h3></li>' for item in self._listing_items(0))
+            return "text/html", f'<html><body><div id="YDC-Stream-Proxy"><ul>{items}</ul></div></body></html>'
+        if url.path == "/listing/more":
+            offset = int(parse_qs(url.query)["offset"][0])
+            return "application/json", json.dumps({"items": self._listing_items(offset)}, ensure_ascii=False)
+        if url.path.startswith("/news/"):
+            index = int(url.path.rsplit('/', 1)[1].split('.')[0])
+            published = datetime.now(timezone.utc) - timedelta(minutes=article_age_minutes(index, self.article_count))
+            return "text/html", (f'<html><head>{PAGE_FILLER}</head><body><article><h1>合成新聞 {index}</h1>'
+                                 f'<time datetime="{published.strftime("%Y-%m-%dT%H:%M:%S.000Z")}">時間</time>'
+                                 f'{article_body(index)}</article></body></html>')
+        return None, None
+
+def start_fixture_server(article_count, port=0):
+    return start_stub_server(FixtureSite(article_count).route, port)
+
+# --- 離線執行環境 ---
+
+def prepare_offline_run(article_count, workdir, port=0):
+    """
+    把流程的所有外部服務換成本機替身，資料庫、儲存與執行報告都放在 workdir 中，回傳 fixture 伺服器。
+    各模組在載入時讀取設定，必須在載入流程模組之前呼叫；固定 port 時，不同行程對同一個 workdir 執行會看到相同的文章網址。
+    """
+    os.environ.update({
+        "NEWS_SOURCES": "bench",
+        "GOOGLE_API_KEY": "offline-benchmark",
+        "TTS_BACKEND": "local",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "METRICS_DIR": os.path.join(workdir, "metrics"),
+    })
+    import analyzer
+    import database
+    import news_hunter
+    import news_sources
+    import tts_backends
+    from fakes import FAKE_REPORT_TEXT, FakeGenerativeModel
+
+    server, base_url = start_fixture_server(article_count, port)
+    database.DB_FILE = os.path.join(workdir, "news.db")
+    news_sources.register_source("bench", lambda: news_sources.YahooNewsSource(
+        "bench", f"{base_url}/listing", page_url_template=f"{base_url}/listing/more?offset={{offset}}", base_url=base_url))
+
+    # 本機伺服器不需要禮貌限速
+    fetch_articles = news_hunter.fetch_articles_concurrently
+    news_hunter.fetch_articles_concurrently = lambda urls, **kwargs: fetch_articles(urls, rate_limiter=news_hunter.HostRateLimiter(0), **kwargs)
+
+    report_text = "\n".join(line if line.startswith("#") or "大家好" in line or "本集" in line else line * REPORT_PARAGRAPH_REPEAT
+                            for line in FAKE_REPORT_TEXT.splitlines())
+
+    class BenchModel(FakeGenerativeModel):
+        """摘要提示回傳短的重點，其餘 (分批摘要與最終報告) 回傳完整長度的報告。"""
+        def respond(self, prompt):
+            if "濃縮成 3 到 5 點" in prompt:
+                return "- 台積電法說會釋出樂觀展望\n- 外資連續買超\n- 加權指數收漲 1.2%"
+            return report_text
+
+    analyzer.create_model = lambda api_key: BenchModel(latency_seconds=MODEL_LATENCY_SECONDS, tokens_per_second=MODEL_TOKENS_PER_SECOND)
+    tts_backends.BACKENDS["local"] = lambda: tts_backends.LocalTTSBackend(latency_seconds=TTS_LATENCY_SECONDS)
+    return server
+
+# --- 子行程: 執行一次完整流程 ---
+
+def run_child(article_count):
+    server = prepare_offline_run(article_count, tempfile.mkdtemp(prefix="bench_pipeline_"))
+    import metrics
+    import run_all
+
+    metrics.reset()
+    succeeded = run_all.run_pipeline()
+    server.shutdown()
+    report = metrics.registry().report("bench_pipeline", "success" if succeeded else "failed")
+    report["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report.pop("spans")
+    print(json.dumps(report))
+
+# --- 主程式 ---
+
+def stage_rows(report):
+    """把執行報告整理成 (階段, 牆鐘秒數, 處理量, 單位, 單次延遲 histogram)。"""
+    histograms, counters = report["histograms"], report["counters"]
+
+    def wall(name):
+        return (histograms.get(name) or {}).get("sum") or 0.0
+
+    report_ready = wall("pipeline.report_ready_seconds")
+    streamed = report["stages"].get("analyzer+podcaster", 0.0)
+    return [
+        ("列表讀取", wall("crawl.listing_seconds"), counters.get("listing.items", 0), "篇", histograms.get("listing.page_seconds")),
+        ("內文抓取", wall("crawl.fetch_seconds"), counters.get("fetch.articles", 0), "篇", histograms.get("fetch.request_seconds")),
+        ("寫入資料庫", wall("db.add_articles_seconds"), counters.get("db.articles_inserted", 0), "篇", None),
+        ("去重索引", wall("analyzer.load_index_seconds"), counters.get("analyzer.articles", 0), "篇", None),
+        ("文章摘要", wall("analyzer.digests_seconds"), counters.get("analyzer.digest_cache_misses", 0), "篇", histograms.get("gemini.digest_seconds")),
+        ("分批摘要", wall("analyzer.map_seconds"), (histograms.get("gemini.map_seconds") or {}).get("count", 0), "批", histograms.get("gemini.map_seconds")),
+        ("最終報告", wall("gemini.report_seconds"), counters.get("analyzer.report_chars", 0), "字", histograms.get("gemini.first_chunk_seconds")),
+        ("報告後語音合成", max(0.0, streamed - report_ready), counters.get("tts.chunks", 0), "段", histograms.get("tts.chunk_seconds")),
+        ("上傳", wall("storage.upload_seconds"), counters.get("storage.bytes_uploaded", 0) / 1024, "KB", histograms.get("storage.upload_seconds")),
+    ]
+
+def print_report(article_count, report):
+    counters = report["counters"]
+    print(f"\n=== {article_count} 篇文章 ({report['status']}) ===")
+    print(f"總耗時 {report['duration_seconds']:.2f}s，峰值 RSS {report['peak_rss_kb'] / 1024:.0f} MB，"
+          f"下載 {(counters.get('listing.bytes', 0) + counters.get('fetch.bytes', 0)) / 1024 / 1024:.1f} MB，"
+          f"模型呼叫 {counters.get('gemini.calls', 0)} 次")
+    print(f"{'階段':<14}{'耗時(s)':>9}{'處理量':>10}{'吞吐量(/s)':>12}{'p50(ms)':>10}{'p90(ms)':>10}")
+    for name, seconds, amount, unit, latency in stage_rows(report):
+        throughput = f"{amount / seconds:.0f} {unit}" if seconds > 0 and amount else "-"
+        p50 = f"{latency['p50'] * 1000:.1f}" if latency and latency.get("p50") is not None else "-"
+        p90 = f"{latency['p90'] * 1000:.1f}" if latency and latency.get("p90") is not None else "-"
+        print(f"{name:<14}{seconds:>9.2f}{f'{amount:.0f} {unit}':>10}{throughput:>12}{p50:>10}{p90:>10}")
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"模型延遲 {MODEL_LATENCY_SECONDS}s + {MODEL_TOKENS_PER_SECOND} tokens/s，語音合成每段 {TTS_LATENCY_SECONDS}s，全部服務皆為本機替身")
+    summary = []
+    for article_count in sizes:
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, __file__, "--child", str(article_count)], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            print(f"{article_count} 篇的流程執行失敗:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+            sys.exit(1)
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        if report["status"] != "success":
+            print(f"{article_count} 篇的流程沒有成功完成:\n{proc.stdout[-3000:]}")
+            sys.exit(1)
+        print_report(article_count, report)
+        summary.append((article_count, report["duration_seconds"], time.perf_counter() - started))
+
+    print(f"\n{'規模(篇)':<10}{'流程耗時(s)':>12}{'每篇(ms)':>10}{'含行程啟動(s)':>15}")
+    for article_count, seconds, process_seconds in summary:
+        print(f"{article_count:<10}{seconds:>12.2f}{seconds / article_count * 1000:>10.1f}{process_seconds:>15.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        run_child(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,43 @@
+# 檔名: bench_podcaster.py
+# 以模擬延遲的假語音合成器量測段落「逐一合成」與「並行合成」的耗時，並驗證失敗段落會單獨重試。
+# 用法: python bench_podcaster.py
+
+import time
+
+import podcaster
+import tts_backends
+from fakes import FakeSpeechSynthesizer
+
+REPORT_CHARS = 30000
+SYNTHESIS_LATENCY_SECONDS = 0.5
+
+def build_report():
+    sentence = "台股今日在外資買超帶動下走高，半導體族群表現強勢！"
+    return sentence * (REPORT_CHARS // len(sentence))
+
+def run(chunks, max_workers, fail_first_calls=0):
+    synthesizer = FakeSpeechSynthesizer(latency_seconds=SYNTHESIS_LATENCY_SECONDS, fail_first_calls=fail_first_calls)
+    started = time.perf_counter()
+    audio_parts = podcaster.synthesize_chunks(chunks, synthesizer, max_workers=max_workers, retry_delay=0.1)
+    elapsed = time.perf_counter() - started
+    assert audio_parts is not None
+    assert b"".join(audio_parts) == b"".join(b"FAKEAUDIO" + c.encode('utf-8') for c in chunks), "段落順序錯亂"
+    return elapsed, synthesizer.calls
+
+def main():
+    chunks = podcaster.create_text_chunks(build_report())
+    print(f"{REPORT_CHARS} 字報告切成 {len(chunks)} 段，每段合成延遲 {SYNTHESIS_LATENCY_SECONDS}s")
+    serial_seconds, _ = run(chunks, max_workers=1)
+    parallel_seconds, _ = run(chunks, max_workers=podcaster.TTS_MAX_WORKERS)
+    retry_seconds, calls = run(chunks, max_workers=podcaster.TTS_MAX_WORKERS, fail_first_calls=2)
+    print(f"逐一合成: {serial_seconds:.2f}s")
+    print(f"並行合成 ({podcaster.TTS_MAX_WORKERS} 執行緒): {parallel_seconds:.2f}s")
+    backend = tts_backends.LocalTTSBackend(latency_seconds=SYNTHESIS_LATENCY_SECONDS)
+    started = time.perf_counter()
+    episode = backend.stitch(podcaster.synthesize_chunks(chunks, backend.synthesize))
+    local_seconds = time.perf_counter() - started
+    print(f"本機 WAV 後端 (同樣延遲): {local_seconds:.2f}s，產出 {len(episode) / 1024 / 1024:.1f} MB")
+    print(f"並行合成且前 2 次呼叫失敗: {retry_seconds:.2f}s，共呼叫 {calls} 次 (失敗段落單獨重試)")
+
+if __name__ == "__main__":
+    main()
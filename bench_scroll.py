@@ -0,0 +1,107 @@
+# 檔名: bench_scroll.py
+# 滾動時「每一輪」掃描列表的成本：
+#   舊做法: 把整份 page_source 交給 BeautifulSoup 重新解析，再倒著走訪所有項目
+#   新做法: 一次 execute_script，只取回新增在尾端的項目時間文字
+# 在 50/200/1000 個項目的合成頁面上量測。新做法需要本機有 Chrome，否則只列出舊做法的數據。
+# 另外用一個「捲到底部後延遲追加項目」的靜態測試頁，比較自適應等待與固定 sleep(10) 的滾動總耗時。
+# 用法: python bench_scroll.py
+
+import time
+from urllib.parse import quote
+from datetime import datetime, timedelta, timezone
+from bs4 import BeautifulSoup
+
+import listing_sources
+from bench_listing import build_listing_fixture
+
+PAGE_SIZES = [50, 200, 1000]
+ITEMS_PER_SCROLL = 20 # 每次滾動 Yahoo 大約會多載入的項目數
+REPEAT = 5
+APPEND_DELAY_MS = 800 # 測試頁捲到底部後，多久才追加下一批項目
+INFINITE_PAGE_TOTAL_ITEMS = 100
+
+# 捲到底部時以 setTimeout 延遲追加一批項目，模擬 Yahoo 的無限滾動
+INFINITE_SCROLL_PAGE = """<html><body><div id="YDC-Stream-Proxy"><ul id="stream"></ul></div>
+<script>
+var total = %(total)d, batch = %(batch)d, loaded = 0, pending = false;
+function append() {
+    var ul = document.getElementById('stream');
+    for (var i = 0; i < batch && loaded < total; i++, loaded++) {
+        var minutes = (loaded + 1) * 15;
+        var text = minutes < 60 ? minutes + ' 分鐘前' : Math.floor(minutes / 60) + ' 小時前';
+        var li = document.createElement('li');
+        li.style.height = '120px';
+        li.innerHTML = '<div><span>Yahoo股市</span><span>' + text + '</span></div><h3><a href="/news/' + loaded + '.html">新聞 ' + loaded + '</a></h3>';
+        ul.appendChild(li);
+    }
+    pending = false;
+}
+window.addEventListener('scroll', function () {
+    if (!pending && loaded < total && window.innerHeight + window.scrollY >= document.body.scrollHeight - 10) {
+        pending = true;
+        setTimeout(append, %(delay)d);
+    }
+});
+append();
+</script></body></html>"""
+
+def old_scan(page_source, now_utc):
+    items = listing_sources.extract_listing_items(BeautifulSoup(page_source, 'html.parser'))
+    for item in reversed(items):
+        if item['time_text']:
+            return listing_sources.parse_yahoo_time(item['time_text'], now_utc)
+    return None
+
+def new_scan(driver, seen_count, now_utc):
+    scan = driver.execute_script(listing_sources.TAIL_ITEMS_SCRIPT, listing_sources.LISTING_ITEM_SELECTOR, seen_count, listing_sources.TIME_KEYWORDS)
+    times = [listing_sources.parse_yahoo_time(text, now_utc) for text in scan['times'] if text]
+    return times[-1] if times else None
+
+def best_of(fn):
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    now_utc = datetime.now(timezone.utc)
+    try:
+        driver = listing_sources.create_chrome_driver()
+    except Exception as e:
+        print(f"(無法啟動 Chrome，只量測舊做法: {str(e).splitlines()[0][:60]})")
+        driver = None
+
+    print(f"{'項目數':>8}{'舊做法(ms/輪)':>16}{'新做法(ms/輪)':>16}")
+    try:
+        for size in PAGE_SIZES:
+            page_source = build_listing_fixture(size)
+            old_ms = best_of(lambda: old_scan(page_source, now_utc)) * 1000
+            new_col = "-"
+            if driver:
+                driver.get("data:text/html;charset=utf-8," + quote(page_source))
+                # 模擬頁面長到 size 之後的那一輪：只有最後 ITEMS_PER_SCROLL 個項目是新的
+                new_ms = best_of(lambda: new_scan(driver, size - ITEMS_PER_SCROLL, now_utc)) * 1000
+                new_col = f"{new_ms:.2f}"
+            print(f"{size:>8}{old_ms:>16.2f}{new_col:>16}")
+        if driver:
+            adaptive_wait_benchmark(driver, now_utc)
+    finally:
+        if driver:
+            driver.quit()
+
+def adaptive_wait_benchmark(driver, now_utc):
+    page = INFINITE_SCROLL_PAGE % {"total": INFINITE_PAGE_TOTAL_ITEMS, "batch": ITEMS_PER_SCROLL, "delay": APPEND_DELAY_MS}
+    source = listing_sources.SeleniumListingSource(listing_url="data:text/html;charset=utf-8," + quote(page))
+    started = time.perf_counter()
+    page_source = source._scroll(driver, now_utc, now_utc - timedelta(hours=12))
+    wall_seconds = time.perf_counter() - started
+    stats = listing_sources.summarize_latencies(source.scroll_latencies)
+    fixed_seconds = 3 + 10 * stats["count"] # 舊做法: 開頁 sleep(3) + 每次滾動 sleep(10)
+    print(f"\n自適應等待 (測試頁每批延遲 {APPEND_DELAY_MS}ms): {'成功' if page_source else '失敗'}, 滾動 {stats['count']} 次")
+    print(f"  每次等待 p50 {stats['p50']:.2f}s / p90 {stats['p90']:.2f}s / 最長 {stats['max']:.2f}s")
+    print(f"  總耗時 {wall_seconds:.1f}s，固定 sleep 做法約 {fixed_seconds}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# 檔名: bench_search.py
+# 比較 FTS5 全文索引與 LIKE 全表掃描的關鍵字搜尋速度。
+# 在暫存目錄建立 10 萬篇合成文章的獨立資料庫，不會動到 news.db。
+# 用法: python bench_search.py
+
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+
+ARTICLE_COUNT = 100_000
+INSERT_BATCH_SIZE = 5000
+QUERIES = ["台積電", "聯準會 宣布升息", "輝達財報", "電動車補助"]
+REPEATS = 5
+RARE_EVERY = 2000 # 每 2000 篇才出現一次的關鍵字，LIKE 必須掃過大半個表格才湊得到結果
+WORDS = ["台股", "外資", "半導體", "央行", "通膨", "美元", "晶片", "出口", "利率", "油價",
+         "航運", "消費", "就業", "房市", "選舉", "颱風", "疫苗", "AI", "伺服器", "關稅"]
+RARE_PHRASES = ["台積電", "聯準會宣布升息", "輝達財報優於預期", "電動車補助延長"]
+
+def build_articles(start, count, rng):
+    now = datetime.now(timezone.utc)
+    articles = []
+    for i in range(start, start + count):
+        words = rng.choices(WORDS, k=60)
+        if i % RARE_EVERY == 0:
+            words.insert(rng.randrange(len(words)), rng.choice(RARE_PHRASES))
+        articles.append({
+            "headline": f"{'、'.join(rng.choices(WORDS, k=3))} 新聞 {i}",
+            "url": f"https://example.com/news/{i}",
+            "time_str": "N/A",
+            "datetime": now - timedelta(minutes=i),
+            "content": "，".join(words) + "。",
+        })
+    return articles
+
+def like_search(query, limit):
+    """沒有全文索引時的做法：每個關鍵字都對 headline 與 content 做 LIKE 全表掃描。"""
+    terms = query.split()
+    conditions = " AND ".join("(t.headline LIKE ? OR t.content LIKE ?)" for _ in terms)
+    params = [value for term in terms for value in (f"%{term}%", f"%{term}%")]
+    # 內文壓縮存放，LIKE 只能對 article_texts 檢視表 (逐篇解壓縮) 掃描，需要 database._connect 註冊的解壓縮函數
+    with database._connection() as conn:
+        return conn.execute(f'''
+            SELECT a.id FROM articles a JOIN article_texts t ON t.id = a.id
+            WHERE {conditions} ORDER BY a.publish_datetime DESC LIMIT ?
+        ''', params + [limit]).fetchall()
+
+def timed(search, query):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        results = search(query)
+    return (time.perf_counter() - started) / REPEATS, len(results)
+
+def main():
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.setup_database()
+        started = time.perf_counter()
+        with database.run_session():
+            for start in range(0, ARTICLE_COUNT, INSERT_BATCH_SIZE):
+                database.add_articles(build_articles(start, INSERT_BATCH_SIZE, rng))
+        print(f"寫入 {ARTICLE_COUNT} 篇 (含索引更新) 耗時 {time.perf_counter() - started:.1f} 秒")
+
+        print(f"{'查詢':<12}{'LIKE(ms)':>10}{'FTS5(ms)':>10}{'加速':>8}{'筆數':>6}")
+        with database.run_session():
+            for query in QUERIES:
+                like_seconds, like_count = timed(lambda q: like_search(q, 20), query)
+                fts_seconds, fts_count = timed(lambda q: database.search_articles(q, limit=20), query)
+                print(f"{query:<12}{like_seconds * 1000:>10.1f}{fts_seconds * 1000:>10.1f}{like_seconds / fts_seconds:>7.0f}x{fts_count:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# 檔名: bench_sources.py
+# 以本機模擬的多個新聞來源 (兩個 Yahoo 分類 + 一個結構不同的媒體) 驗證來源外掛，
+# 並比較「逐一讀取列表」與「同時讀取所有來源」的耗時；兩個 Yahoo 分類有部分重複的新聞，用來確認去重。
+# 用法: python bench_sources.py
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import news_hunter
+import news_sources
+from fakes import start_stub_server
+
+ITEMS_PER_SOURCE = 60
+OVERLAP_ITEMS = 20 # 兩個 Yahoo 分類共同出現的新聞數
+LISTING_LATENCY_SECONDS = 1.0 # 模擬列表頁的回應時間
+HOURS_TO_FETCH = 12
+
+def yahoo_listing(first_id):
+    items = []
+    for i in range(ITEMS_PER_SOURCE):
+        minutes = (i + 1) * 15
+        time_text = f"{minutes} 分鐘前" if minutes < 60 else f"{minutes // 60} 小時前"
+        items.append(
+            f'<li><div><span>Yahoo股市</span><span>{time_text}</span></div>'
+            f'<h3><a href="/news/{first_id + i}.html">Yahoo 測試新聞 {first_id + i}</a></h3></li>'
+        )
+    return f'<html><body><div id="YDC-Stream-Proxy"><ul>{"".join(items)}</ul></div></body></html>'
+
+def outlet_listing():
+    items = "".join(
+        f'<li class="story"><a href="/outlet/article/{i}">其他媒體新聞 {i}</a><span class="ago">{i + 1} 小時前</span></li>'
+        for i in range(ITEMS_PER_SOURCE)
+    )
+    return f'<html><body><ul class="news-list">{items}</ul></body></html>'
+
+def published_iso(index):
+    return (datetime.now(timezone.utc) - timedelta(minutes=(index + 1) * 15)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def fixture_page(path):
+    if path == "/yahoo/tw-market":
+        time.sleep(LISTING_LATENCY_SECONDS)
+        return "text/html", yahoo_listing(0)
+    if path == "/yahoo/intl-markets":
+        time.sleep(LISTING_LATENCY_SECONDS)
+        return "text/html", yahoo_listing(ITEMS_PER_SOURCE - OVERLAP_ITEMS)
+    if path == "/outlet/list":
+        time.sleep(LISTING_LATENCY_SECONDS)
+        return "text/html", outlet_listing()
+    if path.startswith("/news/"):
+        index = int(path.rsplit('/', 1)[1].split('.')[0]) % ITEMS_PER_SOURCE
+        return "text/html", (f'<html><body><article><time datetime="{published_iso(index)}">時間</time>'
+                             f'<p>台股新聞內文 {path}</p><p>第二段</p></article></body></html>')
+    if path.startswith("/outlet/article/"):
+        index = int(path.rsplit('/', 1)[1])
+        return "text/html", (f'<html><body><div class="story-body"><span class="pub" datetime="{published_iso(index)}">發布</span>'
+                             f'<p>其他媒體內文 {index}</p></div></body></html>')
+    return None, None
+
+def build_sources(base_url):
+    return [
+        news_sources.YahooNewsSource("yahoo-tw-market", f"{base_url}/yahoo/tw-market", base_url=base_url),
+        news_sources.YahooNewsSource("yahoo-intl-markets", f"{base_url}/yahoo/intl-markets", base_url=base_url),
+        news_sources.HtmlNewsSource("outlet", f"{base_url}/outlet/list", base_url, item_selector="li.story",
+                                    time_text_selector="span.ago", published_selector="span.pub[datetime]",
+                                    body_selector="div.story-body"),
+    ]
+
+def main():
+    server, base_url = start_stub_server(fixture_page)
+    sources = build_sources(base_url)
+    now_utc = datetime.now(timezone.utc)
+    time_window = now_utc - timedelta(hours=HOURS_TO_FETCH)
+
+    started = time.perf_counter()
+    serial_count = sum(len(source.list_articles(now_utc, time_window) or []) for source in sources)
+    serial_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    merged = news_sources.list_all_sources(sources, now_utc, time_window)
+    concurrent_seconds = time.perf_counter() - started
+    expected = len(sources) * ITEMS_PER_SOURCE - OVERLAP_ITEMS
+    assert len(merged) == expected, f"去重後應有 {expected} 篇，實際 {len(merged)} 篇"
+
+    started = time.perf_counter()
+    details = news_hunter.fetch_articles_concurrently([item['url'] for item in merged], sources=[item['source'] for item in merged],
+                                                      rate_limiter=news_hunter.HostRateLimiter(0))
+    fetch_seconds = time.perf_counter() - started
+    assert all(publish_time and content for publish_time, content in details), "有文章的時間或內文擷取失敗"
+    server.shutdown()
+
+    print(f"\n{len(sources)} 個來源，每個列表延遲 {LISTING_LATENCY_SECONDS}s")
+    print(f"逐一讀取列表: {serial_seconds:.2f}s ({serial_count} 篇，含重複)")
+    print(f"同時讀取列表: {concurrent_seconds:.2f}s (去重後 {len(merged)} 篇，加速 {serial_seconds / concurrent_seconds:.1f}x)")
+    print(f"依各來源規則擷取 {len(details)} 篇內文: {fetch_seconds:.2f}s，全部成功")
+
+if __name__ == "__main__":
+    main()
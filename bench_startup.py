@@ -0,0 +1,74 @@
+# 檔名: bench_startup.py
+# 以 python -X importtime 量測每個階段的匯入時間，超過預算或載入了不該在匯入時載入的重量級套件就回傳失敗。
+# 每次都在全新的子行程中量測，取多次中的最小值以降低雜訊。
+# 用法: python bench_startup.py  (慢的機器可設定 STARTUP_BUDGET_SCALE=2 放寬本專案模組的額度)
+
+import os
+import subprocess
+import sys
+
+REPEATS = 5
+TOP_IMPORTS = 5
+BUDGET_SCALE = float(os.getenv("STARTUP_BUDGET_SCALE", "1"))
+# 各階段的匯入時間預算 = 同一台機器上匯入它必需的套件的時間 (基準) + 本專案模組可用的額度 (毫秒)。
+# 基準在每次執行時實際量測，預算會跟著機器快慢與套件版本變動，不必為每台機器重新校正。
+STDLIB_BASELINE = ["sqlite3", "json", "concurrent.futures", "zoneinfo"] # 資料庫與分析/播報共用的標準函式庫
+STAGE_BUDGETS = {
+    "news_hunter": (STDLIB_BASELINE + ["requests", "bs4"], 60), # requests + bs4 是抓取必需的
+    "analyzer": (STDLIB_BASELINE, 30),
+    "podcaster": (STDLIB_BASELINE, 40),
+    "run_all": (STDLIB_BASELINE + ["requests", "bs4"], 80),
+}
+# 只有真正用到時才該載入的套件，出現在匯入階段就是退化
+LAZY_MODULES = ["selenium", "google.generativeai", "boto3", "azure.cognitiveservices.speech", "google.cloud.texttospeech"]
+
+def measure_imports(modules):
+    """在全新的直譯器中匯入 modules，回傳 {模組名稱: 累計匯入時間(微秒)}。"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"匯入 {', '.join(modules)} 失敗:\n{result.stderr[-2000:]}")
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        cumulative = cumulative.strip()
+        if cumulative.isdigit():
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+def best_of(modules):
+    """重複量測 REPEATS 次，回傳 modules 匯入時間總和最短的一次 (timings, 毫秒)；後匯入的模組不重複計入先前已載入的部分。"""
+    runs = [measure_imports(modules) for _ in range(REPEATS)]
+    elapsed = lambda timings: sum(timings.get(module, 0) for module in modules)
+    best = min(runs, key=elapsed)
+    return best, elapsed(best) / 1000
+
+def main():
+    failed = False
+    baselines = {}
+    print(f"{'階段':<14}{'匯入(ms)':>10}{'基準(ms)':>10}{'預算(ms)':>10}  結果")
+    for stage, (required, allowance_ms) in STAGE_BUDGETS.items():
+        key = tuple(required)
+        if key not in baselines:
+            baselines[key] = best_of(required)[1]
+        baseline_ms = baselines[key]
+        budget_ms = baseline_ms + allowance_ms * BUDGET_SCALE
+        best, elapsed_ms = best_of([stage])
+        eager = [name for name in LAZY_MODULES if name in best]
+        ok = elapsed_ms <= budget_ms and not eager
+        failed = failed or not ok
+        print(f"{stage:<14}{elapsed_ms:>10.1f}{baseline_ms:>10.1f}{budget_ms:>10.0f}  {'OK' if ok else '超出預算' if not eager else '退化'}")
+        if eager:
+            print(f"  匯入時就載入了應延後的套件: {', '.join(eager)}")
+        if not ok:
+            heaviest = sorted(((us, name) for name, us in best.items() if name != stage), reverse=True)[:TOP_IMPORTS]
+            for us, name in heaviest:
+                print(f"  {name:<40}{us / 1000:>8.1f} ms")
+    if failed:
+        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+    print("所有階段的匯入時間都在預算內。")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# 檔名: bench_storage.py
+# 比較舊版 (內文直接存在 articles.content / summaries.summary_text) 與壓縮內文儲存 (content_blobs + zlib 共用字典) 的
+# 資料庫大小、讀取吞吐量與峰值 RSS。語料是合成的多個月財經新聞 (含重複轉載)，先建出舊版資料庫，
+# 再分別量測「舊版資料庫升級 (搬移內文)」與「從頭以新版寫入」。每項讀取量測都在獨立行程中執行，RSS 互不影響。
+# 用法: python bench_storage.py [天數] [每天篇數]  (預設 90 天、每天 150 篇)
+
+import json
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_DAYS = 90
+DEFAULT_PER_DAY = 150
+REPUBLISHED_RATIO = 0.08 # 不同網址轉載同一篇內文的比例
+SUMMARIES_PER_DAY = 2
+SEARCH_QUERIES = ["台積電 法說會", "三大法人", "伺服器 供應鏈", "聯準會"] # 每個詞至少 3 個字，兩種版本都走全文索引
+SEARCH_REPEATS = 20
+
+COMPANIES = [("台積電", "2330"), ("鴻海", "2317"), ("聯發科", "2454"), ("廣達", "2382"), ("緯創", "3231"), ("長榮", "2603"),
+             ("陽明", "2609"), ("中華電", "2412"), ("富邦金", "2881"), ("國泰金", "2882"), ("日月光投控", "3711"), ("大立光", "3008"),
+             ("台達電", "2308"), ("聯電", "2303"), ("華碩", "2357"), ("技嘉", "2376"), ("英業達", "2356"), ("世芯-KY", "3661")]
+SOURCES = ["中央社", "經濟日報", "工商時報", "鉅亨網", "MoneyDJ", "自由時報"]
+REPORTERS = ["張建中", "韋枢", "潘智義", "王郁倫", "蘇嘉維", "林婷婷", "曾仁凱", "吳康瑋"]
+THEMES = ["AI 伺服器", "先進封裝", "CoWoS", "高效能運算", "電動車", "低軌衛星", "散熱模組", "矽光子", "車用晶片"]
+LEADS = [
+    "（{source}記者{reporter}台北{month}日電）{company}（{code}）今天公布{month}月營收{revenue}億元，月增{mom}%，年增{yoy}%，{trend}。",
+    "（{source}記者{reporter}綜合報導）台股今天{direction}{points}點，加權指數收在{index}點，成交量{volume}億元，{company}（{code}）{stock_move}。",
+    "（{source}記者{reporter}台北{month}日電）{company}（{code}）今天舉行法說會，預估下一季營收將{guidance}，毛利率約{margin}%。",
+    "（{source}記者{reporter}綜合報導）美股四大指數{us_move}，費城半導體指數{sox_move}{sox}%，台積電 ADR {adr_move}{adr}%。",
+]
+SENTENCES = [
+    "外資今天{bs}超{amount}億元，投信{bs2}超{amount2}億元，自營商{bs3}超{amount3}億元，三大法人合計{bs}超{total}億元。",
+    "{company}指出，受惠於{theme}需求強勁，第{quarter}季毛利率可望維持在{margin}%以上，營業利益率也將同步提升。",
+    "法人表示，{theme}相關供應鏈包括{company}、{company2}等，下半年營運可望優於上半年，全年營收有機會創下歷史新高。",
+    "{company}董事長在法說會上表示，公司將持續擴大{theme}布局，今年資本支出預估為{capex}億美元，與去年相比{capex_move}。",
+    "市場關注美國聯準會的利率決策，以及美國{data}數據公布，短線台股可能維持區間震盪，投資人宜留意資金動向。",
+    "{company}股價今天收{price}元，{stock_move}，成交{shares}張，外資持股比率來到{holding}%。",
+    "分析師認為，{company}在{theme}的市占率持續提升，維持「{rating}」評等，目標價由{old_target}元調升至{target}元。",
+    "櫃買指數{direction}{small_points}點，收在{otc}點，成交金額{otc_volume}億元。",
+    "新台幣兌美元今天收盤{fx}元，{fx_move}{fx_delta}分，台北與元太外匯經紀公司總成交金額{fx_volume}億美元。",
+    "類股方面，半導體類股指數{direction}{sector}%，電子零組件類股{direction2}{sector2}%，航運類股{direction3}{sector3}%，金融保險類股{direction4}{sector4}%。",
+    "{company}表示，{month}月營收成長主要來自{theme}產品出貨增加，以及新台幣匯率{fx_move}的影響，累計前{month}月營收{ytd}億元，年增{ytd_yoy}%。",
+    "投顧業者指出，台股本益比已來到歷史相對高檔，但在 AI 題材帶動下，資金仍持續流入電子權值股，建議投資人逢回分批布局。",
+]
+CLOSINGS = ["（編輯：{reporter}）{date}", "延伸閱讀：{company}法說會重點一次看、外資最新目標價整理",
+            "本文僅供參考，不構成任何投資建議。投資人應審慎評估風險，並自負投資盈虧。"]
+HEADLINES = ["{company}{month}月營收年增{yoy}%，{trend}", "台股{direction}{points}點 {company}{stock_move}",
+             "{company}法說會：{theme}需求強勁 下季營收{guidance}", "外資{bs}超{total}億元 {company}獲青睞", "{theme}題材發酵 {company}、{company2}受矚目"]
+
+# --- 合成語料 ---
+
+def _fields(rng, day):
+    (company, code), (company2, _) = rng.sample(COMPANIES, 2)
+    up = rng.random() < 0.55
+    pick = lambda a, b: a if rng.random() < 0.5 else b
+    return {
+        "source": rng.choice(SOURCES), "reporter": rng.choice(REPORTERS), "month": day.month, "date": day.strftime("%Y%m%d"),
+        "company": company, "code": code, "company2": company2, "theme": rng.choice(THEMES),
+        "revenue": rng.randint(50, 3000), "mom": round(rng.uniform(-15, 25), 2), "yoy": round(rng.uniform(-20, 60), 2),
+        "trend": pick("創同期新高", "優於市場預期"), "direction": "上漲" if up else "下跌", "points": rng.randint(5, 600),
+        "direction2": pick("上漲", "下跌"), "direction3": pick("上漲", "下跌"), "direction4": pick("上漲", "下跌"),
+        "index": rng.randint(20000, 24000), "volume": rng.randint(2500, 6000), "stock_move": pick("漲幅超過 3%", "小跌 1%"),
+        "guidance": pick("季增 5% 至 8%", "持平"), "margin": round(rng.uniform(20, 60), 1), "us_move": pick("全面收紅", "漲跌互見"),
+        "sox_move": pick("上漲", "下跌"), "sox": round(rng.uniform(0, 4), 2), "adr_move": pick("上漲", "下跌"), "adr": round(rng.uniform(0, 5), 2),
+        "bs": "買" if up else "賣", "bs2": pick("買", "賣"), "bs3": pick("買", "賣"), "amount": round(rng.uniform(1, 300), 2),
+        "amount2": round(rng.uniform(1, 50), 2), "amount3": round(rng.uniform(1, 50), 2), "total": round(rng.uniform(1, 400), 2),
+        "quarter": rng.randint(1, 4), "capex": rng.randint(5, 400), "capex_move": pick("大致持平", "明顯增加"),
+        "data": pick("消費者物價指數", "非農就業"), "price": rng.randint(20, 2000), "shares": rng.randint(1000, 90000),
+        "holding": round(rng.uniform(10, 80), 2), "rating": pick("買進", "優於大盤"), "old_target": rng.randint(50, 1500),
+        "target": rng.randint(60, 1800), "small_points": round(rng.uniform(0, 5), 2), "otc": round(rng.uniform(230, 280), 2),
+        "otc_volume": rng.randint(600, 1500), "fx": round(rng.uniform(29, 33), 3), "fx_move": pick("升值", "貶值"),
+        "fx_delta": round(rng.uniform(0, 20), 1), "fx_volume": round(rng.uniform(10, 30), 3), "sector": round(rng.uniform(0, 3), 2),
+        "sector2": round(rng.uniform(0, 3), 2), "sector3": round(rng.uniform(0, 3), 2), "sector4": round(rng.uniform(0, 3), 2),
+        "ytd": rng.randint(500, 20000), "ytd_yoy": round(rng.uniform(-10, 50), 2),
+    }
+
+def synthetic_article(index, day):
+    rng = random.Random(index)
+    fields = _fields(rng, day)
+    sentences = [rng.choice(LEADS)] + [rng.choice(SENTENCES) for _ in range(rng.randint(10, 20))] + [rng.choice(CLOSINGS)]
+    paragraphs = ["".join(sentence.format(**fields) for sentence in sentences[i:i + 3]) for i in range(0, len(sentences), 3)]
+    return rng.choice(HEADLINES).format(**fields), "\n".join(paragraphs)
+
+def synthetic_corpus(days, per_day, end=None):
+    """[{"headline", "url", "time_str", "datetime", "content"}, ...] 依時間由舊到新，部分文章以不同網址轉載同一篇內文。"""
+    end = end or datetime.now(timezone.utc)
+    articles = []
+    rng = random.Random(0)
+    for day_index in range(days):
+        day = end - timedelta(days=days - day_index)
+        for n in range(per_day):
+            index = day_index * per_day + n
+            published = day + timedelta(minutes=n * 1440 // per_day)
+            if articles and rng.random() < REPUBLISHED_RATIO:
+                original = articles[rng.randrange(max(0, len(articles) - per_day), len(articles))]
+                headline, content = f"{original['headline']} (轉載)", original['content']
+            else:
+                headline, content = synthetic_article(index, day)
+            articles.append({"headline": headline, "url": f"https://news.example/{index}", "time_str": "N/A",
+                             "datetime": published, "content": content})
+    return articles
+
+def synthetic_summary(index, day):
+    rng = random.Random(-index - 1)
+    sections = []
+    for title in ["摘要與核心觀點", "市場概覽", "焦點板塊與題材", "關鍵公司動態", "分析與展望"]:
+        fields = _fields(rng, day)
+        body = "".join(rng.choice(SENTENCES).format(**fields) for _ in range(8))
+        sections.append(f"## **{title}**\n{body}")
+    return "大家好，以下為12小時內新聞重點摘要\n" + "\n".join(sections)
+
+# --- 舊版資料庫 (內文直接存在表格中) ---
+
+LEGACY_SCHEMA = [
+    '''CREATE TABLE articles (id INTEGER PRIMARY KEY AUTOINCREMENT, headline TEXT NOT NULL, url TEXT NOT NULL UNIQUE,
+       publish_time_str TEXT, publish_datetime TEXT, content TEXT, scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE summaries (id INTEGER PRIMARY KEY AUTOINCREMENT, summary_text TEXT NOT NULL, source_article_count INTEGER,
+       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, is_complete INTEGER NOT NULL DEFAULT 1)''',
+    "CREATE INDEX idx_articles_publish_datetime ON articles (publish_datetime)",
+    "CREATE INDEX idx_articles_scraped_at ON articles (scraped_at)",
+    "CREATE INDEX idx_summaries_created_at ON summaries (created_at)",
+    "CREATE VIRTUAL TABLE articles_fts USING fts5(headline, content, content='articles', content_rowid='id', tokenize='trigram')",
+    '''CREATE TRIGGER articles_fts_insert AFTER INSERT ON articles BEGIN
+       INSERT INTO articles_fts (rowid, headline, content) VALUES (new.id, new.headline, new.content); END''',
+    '''CREATE TRIGGER articles_fts_delete AFTER DELETE ON articles BEGIN
+       INSERT INTO articles_fts (articles_fts, rowid, headline, content) VALUES ('delete', old.id, old.headline, old.content); END''',
+    '''CREATE TRIGGER articles_fts_update AFTER UPDATE ON articles BEGIN
+       INSERT INTO articles_fts (articles_fts, rowid, headline, content) VALUES ('delete', old.id, old.headline, old.content);
+       INSERT INTO articles_fts (rowid, headline, content) VALUES (new.id, new.headline, new.content); END''',
+]
+LEGACY_COLUMNS = "id, headline, url, publish_time_str, publish_datetime, content, scraped_at"
+LEGACY_METADATA_COLUMNS = "id, headline, url, publish_time_str, publish_datetime, scraped_at"
+LEGACY_SEARCH_SQL = '''
+    SELECT a.id, snippet(articles_fts, 1, '[', ']', '…', 24) AS snippet, bm25(articles_fts, 2.0, 1.0) AS score
+    FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid WHERE articles_fts MATCH ? ORDER BY score LIMIT 20
+'''
+
+def _iso(dt):
+    return dt.astimezone(timezone.utc).isoformat()
+
+def build_legacy(path, days, per_day):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in LEGACY_SCHEMA:
+        conn.execute(statement)
+    articles = synthetic_corpus(days, per_day)
+    conn.executemany("INSERT INTO articles (headline, url, publish_time_str, publish_datetime, content) VALUES (?, ?, ?, ?, ?)",
+                     [(a['headline'], a['url'], a['time_str'], _iso(a['datetime']), a['content']) for a in articles])
+    end = datetime.now(timezone.utc)
+    conn.executemany("INSERT INTO summaries (summary_text, source_article_count) VALUES (?, ?)",
+                     [(synthetic_summary(i, end - timedelta(days=days - i // SUMMARIES_PER_DAY)), per_day // SUMMARIES_PER_DAY)
+                      for i in range(days * SUMMARIES_PER_DAY)])
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return {"articles": len(articles), "raw_bytes": sum(len(a['content'].encode('utf-8')) for a in articles)}
+
+# --- 子行程 ---
+
+def build_new(path, days, per_day):
+    """以新版的 add_articles 依天批次寫入 (與實際每次爬蟲寫入的方式相同)。"""
+    import database
+    database.DB_FILE = path
+    database.setup_database()
+    articles = synthetic_corpus(days, per_day)
+    end = datetime.now(timezone.utc)
+    for day_index in range(days):
+        database.add_articles(articles[day_index * per_day:(day_index + 1) * per_day])
+        for i in range(SUMMARIES_PER_DAY):
+            index = day_index * SUMMARIES_PER_DAY + i
+            database.add_summary(synthetic_summary(index, end - timedelta(days=days - day_index)), per_day // SUMMARIES_PER_DAY)
+
+def migrate(path):
+    import database
+    database.DB_FILE = path
+    database.setup_database()
+
+def checkpoint(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+def run_builder(action, path, days, per_day):
+    started = time.perf_counter()
+    if action == "legacy":
+        build_legacy(path, days, per_day)
+    elif action == "new":
+        build_new(path, days, per_day)
+    else:
+        migrate(path)
+    seconds = time.perf_counter() - started
+    checkpoint(path)
+    print(json.dumps({"seconds": seconds, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+def legacy_reader(variant, path):
+    import database
+    database.DB_FILE = path
+    conn = database._connect() # 與新版相同的連線設定 (頁面快取大小等)，比較才公平
+    conn.row_factory = sqlite3.Row
+    if variant == "metadata":
+        return lambda: [dict(row) for row in conn.execute(f"SELECT {LEGACY_METADATA_COLUMNS} FROM articles ORDER BY publish_datetime DESC")]
+    if variant == "all":
+        return lambda: [dict(row) for row in conn.execute(f"SELECT {LEGACY_COLUMNS} FROM articles ORDER BY publish_datetime DESC")]
+    if variant == "stream":
+        return lambda: sum(len(row["content"]) for row in conn.execute(f"SELECT {LEGACY_COLUMNS} FROM articles ORDER BY publish_datetime DESC"))
+    if variant == "search":
+        return lambda: [conn.execute(LEGACY_SEARCH_SQL, (database._fts_query(query),)).fetchall()
+                        for _ in range(SEARCH_REPEATS) for query in SEARCH_QUERIES]
+    return lambda: conn.execute("SELECT summary_text FROM summaries WHERE is_complete = 1 ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+
+def new_reader(variant, path):
+    import database
+    database.DB_FILE = path
+    if variant == "metadata":
+        return lambda: list(database.iter_articles(columns=database.ARTICLE_METADATA_COLUMNS))
+    if variant == "all":
+        return lambda: database.get_all_articles_for_analysis()
+    if variant == "stream":
+        return lambda: sum(len(row["content"]) for row in database.iter_articles())
+    if variant == "search":
+        return lambda: [database.search_articles(query) for _ in range(SEARCH_REPEATS) for query in SEARCH_QUERIES]
+    return lambda: database.get_latest_summary()
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field))
+
+def run_reader(layout, variant, path):
+    read = (legacy_reader if layout == "legacy" else new_reader)(variant, path)
+    # 載入模組時的峰值會蓋過讀取本身，先把核心記錄的峰值 (VmHWM) 重設為目前的 RSS
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline_kb = _status_kb("VmRSS:")
+    started = time.perf_counter()
+    result = read()
+    seconds = time.perf_counter() - started
+    rows = len(result) if isinstance(result, list) else 1
+    print(json.dumps({"seconds": seconds, "rows": rows, "extra_rss_kb": _status_kb("VmHWM:") - baseline_kb}))
+
+# --- 主程式 ---
+
+def run_child(*args):
+    proc = subprocess.run([sys.executable, __file__, "--child", *map(str, args)], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        print(f"{' '.join(map(str, args))} 執行失敗:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+        sys.exit(1)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def database_size(path):
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+def content_stats(path):
+    conn = sqlite3.connect(path)
+    blobs, raw, stored, with_dict = conn.execute(
+        "SELECT COUNT(*), SUM(raw_size), SUM(length(body)), COUNT(dict_id) FROM content_blobs").fetchone()
+    articles = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    pages = {name: count for name, count in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")} if _has_dbstat(conn) else {}
+    conn.close()
+    return {"blobs": blobs, "articles": articles, "raw": raw, "stored": stored, "with_dict": with_dict, "pages": pages}
+
+def _has_dbstat(conn):
+    try:
+        conn.execute("SELECT 1 FROM dbstat LIMIT 1")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def compression_without_dictionary(path, sample_size=2000):
+    """同樣的內文不用字典、單篇各自壓縮的大小，用來看出字典的效果。"""
+    import content_codec
+    import database
+    database.DB_FILE = path
+    texts = [row["content"] for row in database.iter_articles(columns=("content",))][:sample_size]
+    raw = sum(len(text.encode('utf-8')) for text in texts)
+    return raw, sum(len(content_codec.compress(text)) for text in texts)
+
+def verify_migration(legacy_path, migrated_path):
+    """升級後每篇文章的內文、最新報告與搜尋結果都必須與舊版資料庫完全相同。"""
+    import database
+    legacy = sqlite3.connect(legacy_path)
+    database.DB_FILE = migrated_path
+    expected = dict(legacy.execute("SELECT id, content FROM articles"))
+    actual = {row["id"]: row["content"] for row in database.iter_articles(columns=("id", "content"))}
+    assert actual == expected, "升級後的文章內文與舊版不一致"
+    latest = legacy.execute("SELECT summary_text FROM summaries ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()[0]
+    assert database.get_latest_summary()["summary_text"] == latest, "升級後的最新報告與舊版不一致"
+    for query in SEARCH_QUERIES:
+        old = legacy.execute(LEGACY_SEARCH_SQL, (database._fts_query(query),)).fetchall()
+        new = [(result["id"], result["snippet"]) for result in database.search_articles(query)]
+        assert new == [(article_id, snippet) for article_id, snippet, _ in old], f"升級後「{query}」的搜尋結果與舊版不一致"
+    legacy.close()
+    return len(expected)
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DAYS
+    per_day = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PER_DAY
+    workdir = tempfile.mkdtemp(prefix="bench_storage_")
+    legacy_path, migrated_path, new_path = (os.path.join(workdir, f"{name}.db") for name in ("legacy", "migrated", "new"))
+    try:
+        legacy = run_child("build", "legacy", legacy_path, days, per_day)
+        shutil.copy(legacy_path, migrated_path)
+        migrated = run_child("build", "migrate", migrated_path, days, per_day)
+        new = run_child("build", "new", new_path, days, per_day)
+        verified = verify_migration(legacy_path, migrated_path)
+
+        stats = content_stats(new_path)
+        raw_no_dict, stored_no_dict = compression_without_dictionary(new_path)
+        print(f"語料: {days} 天 × 每天 {per_day} 篇 = {stats['articles']} 篇 (不重複內文 {stats['blobs']} 份)，"
+              f"每天 {SUMMARIES_PER_DAY} 份報告，內文共 {stats['raw'] / 1024 / 1024:.1f} MB")
+        print(f"內文壓縮: 單篇 zlib {raw_no_dict / stored_no_dict:.2f}x，加上共用字典 {stats['raw'] / stats['stored']:.2f}x "
+              f"({stats['with_dict']}/{stats['blobs']} 份使用字典)")
+        if stats["pages"]:
+            top = sorted(stats["pages"].items(), key=lambda item: -item[1])[:5]
+            print("新版各表格占用: " + "，".join(f"{name} {size / 1024 / 1024:.1f} MB" for name, size in top))
+
+        print(f"\n{'資料庫':<22}{'大小(MB)':>10}{'建立/升級(s)':>14}{'峰值RSS(MB)':>13}")
+        for label, path, build in [("舊版", legacy_path, legacy), ("舊版升級後", migrated_path, migrated), ("新版從頭寫入", new_path, new)]:
+            print(f"{label:<22}{database_size(path) / 1024 / 1024:>10.1f}{build['seconds']:>14.2f}{build['peak_rss_kb'] / 1024:>13.0f}")
+
+        variants = [("metadata", "只讀中繼資料 (全部)"), ("all", "get_all_articles_for_analysis"), ("stream", "串流讀取全文"),
+                    ("search", f"全文搜尋 ×{SEARCH_REPEATS * len(SEARCH_QUERIES)}"), ("summary", "最新報告")]
+        print(f"\n{'讀取':<32}{'舊版(ms)':>10}{'新版(ms)':>10}{'舊版RSS+(MB)':>14}{'新版RSS+(MB)':>14}{'新版(篇/s)':>12}")
+        for variant, label in variants:
+            old = run_child("read", "legacy", variant, legacy_path)
+            fresh = run_child("read", "new", variant, migrated_path)
+            rate = f"{fresh['rows'] / fresh['seconds']:.0f}" if fresh['rows'] > 1 else "-"
+            print(f"{label:<32}{old['seconds'] * 1000:>10.1f}{fresh['seconds'] * 1000:>10.1f}"
+                  f"{old['extra_rss_kb'] / 1024:>14.1f}{fresh['extra_rss_kb'] / 1024:>14.1f}{rate:>12}")
+        print(f"升級後 {verified} 篇文章的內文、最新報告與搜尋結果都與舊版相同。")
+        print("(新版的讀取量測使用升級後的資料庫；get_all_articles_for_analysis 在新版只載入中繼資料，內文於使用時才解壓縮)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        if sys.argv[2] == "build":
+            run_builder(sys.argv[3], sys.argv[4], int(sys.argv[5]), int(sys.argv[6]))
+        else:
+            run_reader(sys.argv[3], sys.argv[4], sys.argv[5])
+    else:
+        main()
@@ -0,0 +1,78 @@
+# 檔名: bench_streaming.py
+# 比較「等報告全部產生完才開始語音合成」與「串流接收報告、每完成一個段落就開始合成」的首段音訊時間與總耗時。
+# 以假的串流模型與本機語音合成後端模擬，合成延遲與文字長度成正比 (接近雲端 TTS 的行為)。
+# 用法: python bench_streaming.py
+
+import threading
+import time
+
+import analyzer
+import podcaster
+import tts_backends
+from fakes import FAKE_REPORT_TEXT, FakeGenerativeModel
+
+GENERATION_SECONDS = 4.0 # 模型產生整份報告所需的時間
+TTS_SECONDS_PER_CHAR = 0.001 # 語音合成每個字的延遲
+PARAGRAPH_REPEAT = 40 # 把假報告的每段內文重複幾次，放大成接近實際長度的報告
+
+def build_report():
+    lines = []
+    for line in FAKE_REPORT_TEXT.splitlines():
+        lines.append(line if line.startswith("#") or "大家好" in line or "本集" in line else line * PARAGRAPH_REPEAT)
+    return "\n".join(lines)
+
+class TimedBackend(tts_backends.LocalTTSBackend):
+    """延遲與文字長度成正比的本機後端，並記錄第一段音訊完成的時間。"""
+    def __init__(self):
+        super().__init__()
+        self.first_audio_at = None
+        self._lock = threading.Lock()
+
+    def synthesize(self, text):
+        time.sleep(len(text) * TTS_SECONDS_PER_CHAR)
+        audio = super().synthesize(text)
+        with self._lock:
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+        return audio
+
+def run_sequential(report):
+    model = FakeGenerativeModel(latency_seconds=GENERATION_SECONDS, response_text=report)
+    backend = TimedBackend()
+    started = time.perf_counter()
+    text = analyzer.generate_report(model, ["新聞"])
+    chunks, synthesize = podcaster.build_chunks(podcaster.markdown_to_segments(text), backend)
+    audio_parts = podcaster.synthesize_chunks(chunks, synthesize)
+    assert audio_parts is not None
+    return backend.first_audio_at - started, time.perf_counter() - started
+
+def run_streaming(report):
+    model = FakeGenerativeModel(latency_seconds=GENERATION_SECONDS, response_text=report)
+    backend = TimedBackend()
+    sections = analyzer.SectionStream()
+    checkpoints = []
+    started = time.perf_counter()
+
+    def produce():
+        text = analyzer.generate_report(model, ["新聞"], stream=True, on_section=sections.put, on_checkpoint=checkpoints.append)
+        sections.close(text == report)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    audio_parts = podcaster.synthesize_sections(sections, backend)
+    producer.join()
+    assert sections.completed and audio_parts is not None
+    return backend.first_audio_at - started, time.perf_counter() - started, len(checkpoints)
+
+def main():
+    report = build_report()
+    print(f"報告 {len(report)} 字，模型產生耗時 {GENERATION_SECONDS}s，合成延遲每字 {TTS_SECONDS_PER_CHAR * 1000:.0f}ms")
+    first_sequential, total_sequential = run_sequential(report)
+    first_streaming, total_streaming, checkpoint_count = run_streaming(report)
+    print(f"{'模式':<8}{'首段音訊(秒)':>14}{'全部完成(秒)':>14}")
+    print(f"{'循序':<8}{first_sequential:>14.2f}{total_sequential:>14.2f}")
+    print(f"{'串流':<8}{first_streaming:>14.2f}{total_streaming:>14.2f}")
+    print(f"串流期間寫入 {checkpoint_count} 次 checkpoint；首段音訊提早 {first_sequential - first_streaming:.2f} 秒，總耗時縮短 {total_sequential - total_streaming:.2f} 秒。")
+
+if __name__ == "__main__":
+    main()
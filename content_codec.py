@@ -0,0 +1,64 @@
+# 檔名: content_codec.py
+# 文章內文與報告的壓縮格式：zlib 加上共用的預設字典 (zdict)。
+# 單篇新聞只有幾 KB，單獨壓縮時 zlib 還來不及「學到」常見的字詞就結束了；
+# 先把財經新聞常出現的片語 (公司名稱、「加權指數」、「外資買超」、媒體的固定開頭與結尾等) 放進字典，每篇都能直接引用。
+# 只用標準函式庫 (zstd 的字典訓練需要額外套件)；字典由 train_dictionary() 從實際的內文樣本挑選片語產生。
+
+import hashlib
+import zlib
+from collections import Counter
+
+DICTIONARY_SIZE = 32 * 1024 # zlib 的視窗只有 32KB，字典再大也用不到
+COMPRESSION_LEVEL = 9 # 單篇很短，最高壓縮等級的額外耗時可以忽略
+NGRAM_LENGTHS = (2, 3, 4, 6, 8, 12) # 候選片語的字數
+MAX_CANDIDATES = 20000 # 依分數排序後最多考慮的片語數
+MIN_DOCUMENT_FREQUENCY = 2 # 只出現在一篇文章中的片語對其他文章沒有幫助
+
+def content_hash(text):
+    """內文的 sha256，作為 content_blobs 的鍵；內容相同的文章共用同一份壓縮內文。"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def dictionary_id(zdict):
+    """字典本身的雜湊，不同資料庫產生的字典也不會混淆。"""
+    return hashlib.sha256(zdict).hexdigest()[:16]
+
+def compress(text, zdict=None):
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=zdict) if zdict else zlib.compressobj(COMPRESSION_LEVEL)
+    return compressor.compress(text.encode('utf-8')) + compressor.flush()
+
+def decompress(body, zdict=None):
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return (decompressor.decompress(body) + decompressor.flush()).decode('utf-8')
+
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    """
+    從內文樣本挑出常見片語組成 zlib 字典，回傳 bytes (樣本太少或沒有共同片語時可能很短)。
+    片語以「出現在幾篇文章 × 引用時可省下的位元組」評分，分數高且不是已選片語一部分的優先；
+    zlib 引用越近的位置編碼越短，所以分數最高的片語放在字典尾端。
+    """
+    frequencies = Counter()
+    for text in samples:
+        grams = set()
+        for n in NGRAM_LENGTHS:
+            grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+        frequencies.update(grams)
+
+    scored = []
+    for gram, count in frequencies.items():
+        if count >= MIN_DOCUMENT_FREQUENCY and not gram.isspace():
+            saving = len(gram.encode('utf-8')) - 3 # 一次引用至少要花約 3 個位元組
+            if saving > 0:
+                scored.append((count * saving, gram))
+    scored.sort(reverse=True)
+
+    chosen, chosen_text, total = [], "", 0
+    for _, gram in scored[:MAX_CANDIDATES]:
+        if gram in chosen_text:
+            continue
+        gram_size = len(gram.encode('utf-8'))
+        if total + gram_size > size:
+            break
+        chosen.append(gram)
+        chosen_text += gram + "\n"
+        total += gram_size
+    return "".join(reversed(chosen)).encode('utf-8')
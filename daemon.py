@@ -0,0 +1,225 @@
+# 檔名: daemon.py
+# 常駐模式：在同一個行程中依排程反覆執行整個流程，省下每次由 cron 重新啟動的成本
+# (直譯器與 SDK 載入、啟動 Chrome、建立 Gemini / TTS / S3 client 與 HTTP 連線)。
+# 瀏覽器由 listing_sources.WarmBrowser 管理，用滿次數或記憶體成長過多時自動重開；其餘 client 由各模組的共用 getter 保留。
+# 上一次還沒跑完時不會重疊執行 (錯過的排程直接略過，另一個行程持有鎖檔時也會略過)；執行紀錄只保留最近 DAEMON_HISTORY_SIZE 筆。
+# 時鐘可以替換，驗證時以 VirtualClock 快轉，不必真的等待。
+# 用法: python daemon.py [--interval-minutes 180 | --at 07:00,19:00] [--max-runs N] [--no-run-now]
+
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import listing_sources
+import metrics
+import news_hunter
+
+DAEMON_INTERVAL_MINUTES = int(os.getenv("DAEMON_INTERVAL_MINUTES", "180"))
+DAEMON_HISTORY_SIZE = 50 # 記憶體中保留的執行紀錄筆數
+DAEMON_LOCK_FILE = os.getenv("DAEMON_LOCK_FILE", "pipeline.lock") # 跨行程的重疊保護 (例如 cron 與常駐同時執行)
+SCHEDULE_TIMEZONE = ZoneInfo("Asia/Taipei") # --at 指定的時間以台北時間解讀
+
+class RealClock:
+    """真實時間；sleep 可被 wake() 提早喚醒 (收到停止訊號時)。"""
+    def __init__(self):
+        self._wakeup = threading.Event()
+
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    def sleep(self, seconds):
+        self._wakeup.wait(max(0, seconds))
+
+    def wake(self):
+        self._wakeup.set()
+
+class VirtualClock:
+    """驗證用的虛擬時鐘：sleep 立即返回並把時間往前推；工作可以用 advance() 模擬執行所花的時間。"""
+    def __init__(self, start=None):
+        self._now = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self._lock = threading.Lock()
+
+    def now(self):
+        with self._lock:
+            return self._now
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += timedelta(seconds=seconds)
+
+    def sleep(self, seconds):
+        self.advance(max(0, seconds))
+
+    def wake(self):
+        pass
+
+class IntervalSchedule:
+    """從 anchor 開始每隔 minutes 分鐘執行一次。"""
+    def __init__(self, minutes, anchor=None):
+        self.interval = timedelta(minutes=minutes)
+        self.anchor = anchor
+
+    def next_after(self, moment):
+        anchor = self.anchor or moment
+        if moment < anchor:
+            return anchor
+        return anchor + self.interval * ((moment - anchor) // self.interval + 1)
+
+    def describe(self):
+        return f"每 {self.interval.total_seconds() / 60:.0f} 分鐘"
+
+class DailySchedule:
+    """每天在固定的時間 (例如 ["07:00", "19:00"]，以 tz 解讀) 執行。"""
+    def __init__(self, times, tz=SCHEDULE_TIMEZONE):
+        self.times = sorted(datetime.strptime(value.strip(), "%H:%M").time() for value in times)
+        self.tz = tz
+
+    def next_after(self, moment):
+        local = moment.astimezone(self.tz)
+        for day in range(2):
+            date = (local + timedelta(days=day)).date()
+            for at in self.times:
+                candidate = datetime.combine(date, at, tzinfo=self.tz)
+                if candidate > local:
+                    return candidate.astimezone(timezone.utc)
+        raise ValueError("DailySchedule 至少需要一個時間")
+
+    def describe(self):
+        return f"每天 {', '.join(at.strftime('%H:%M') for at in self.times)} ({self.tz.key})"
+
+def current_rss_kb():
+    """本行程 (含 Chrome 等子行程) 目前的記憶體用量，讀不到時回傳 None。"""
+    return listing_sources.process_tree_rss_kb(os.getpid())
+
+@contextmanager
+def run_lock(path):
+    """以 flock 取得非阻塞的檔案鎖，yield 是否取得；不支援 fcntl 的平台一律視為取得。"""
+    if not path:
+        yield True
+        return
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def run_pipeline_once():
+    """常駐模式預設的工作：每次執行各自一份指標 (不會跨次累積)，再跑一次完整流程。"""
+    import run_all # 延後載入，讓 --help 與虛擬時鐘的驗證不必載入整個流程
+    metrics.reset()
+    return run_all.run_pipeline()
+
+class Daemon:
+    """
+    依 schedule 反覆執行 job (回傳真值代表成功)。執行一律在同一條執行緒上依序進行，不會重疊；
+    某次執行超過下一個排程時間時，錯過的排程直接略過 (記入 skipped)，不會在結束後連續補跑。
+    history 只保留最近 history_size 筆 {"scheduled_for", "started_at", "duration_seconds", "wall_seconds", "status", "rss_kb"}。
+    """
+    def __init__(self, job=run_pipeline_once, schedule=None, clock=None, history_size=DAEMON_HISTORY_SIZE,
+                 lock_file=DAEMON_LOCK_FILE, run_now=True):
+        self.job = job
+        self.clock = clock or RealClock()
+        self.schedule = schedule or IntervalSchedule(DAEMON_INTERVAL_MINUTES, anchor=self.clock.now())
+        self.history = deque(maxlen=history_size)
+        self.lock_file = lock_file
+        self.run_now = run_now
+        self.runs = 0
+        self.skipped = 0
+        self._stopping = False
+
+    def stop(self):
+        """在目前這次執行結束後停止 (可從 signal handler 呼叫)。"""
+        self._stopping = True
+        self.clock.wake()
+
+    def run(self, max_runs=None):
+        due = self.clock.now() if self.run_now else self.schedule.next_after(self.clock.now())
+        print(f"常駐模式啟動，排程: {self.schedule.describe()}，下一次執行: {due.astimezone(SCHEDULE_TIMEZONE):%Y-%m-%d %H:%M}")
+        while not self._stopping and (max_runs is None or self.runs < max_runs):
+            wait_seconds = (due - self.clock.now()).total_seconds()
+            if wait_seconds > 0:
+                self.clock.sleep(wait_seconds)
+                continue # 可能被提早喚醒，重新檢查
+            self._run_once(due)
+            due = self._next_due(due)
+        print(f"常駐模式結束：共執行 {self.runs} 次，略過 {self.skipped} 次排程。")
+
+    def _next_due(self, previous_due):
+        due = self.schedule.next_after(previous_due)
+        now = self.clock.now()
+        while due <= now:
+            print(f"上一次執行超過排程時間，略過 {due.astimezone(SCHEDULE_TIMEZONE):%Y-%m-%d %H:%M} 的排程。")
+            self.skipped += 1
+            due = self.schedule.next_after(due)
+        return due
+
+    def _run_once(self, due):
+        with run_lock(self.lock_file) as acquired:
+            if not acquired:
+                print(f"另一個行程正在執行流程 (鎖檔 {self.lock_file})，略過這次排程。")
+                self.skipped += 1
+                return
+            self.runs += 1
+            started_at = self.clock.now()
+            started = time.perf_counter()
+            try:
+                succeeded = bool(self.job())
+            except Exception as e:
+                print(f"第 {self.runs} 次執行發生未預期的錯誤: {e}")
+                succeeded = False
+            record = {
+                "scheduled_for": due.isoformat(),
+                "started_at": started_at.isoformat(),
+                "duration_seconds": (self.clock.now() - started_at).total_seconds(),
+                "wall_seconds": time.perf_counter() - started,
+                "status": "success" if succeeded else "failed",
+                "rss_kb": current_rss_kb(),
+            }
+            self.history.append(record)
+            rss = f"{record['rss_kb'] / 1024:.0f} MB" if record['rss_kb'] else "未知"
+            print(f"第 {self.runs} 次執行{'成功' if succeeded else '失敗'}，耗時 {record['duration_seconds']:.1f} 秒，目前記憶體 {rss}。")
+
+def main():
+    parser = argparse.ArgumentParser(description="以常駐模式依排程執行每日財經 Podcast 流程")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--interval-minutes", type=int, default=DAEMON_INTERVAL_MINUTES, help="每隔幾分鐘執行一次")
+    group.add_argument("--at", help="每天固定的執行時間 (台北時間)，以逗號分隔，例如 07:00,19:00")
+    parser.add_argument("--max-runs", type=int, help="執行這麼多次後結束 (預設不限)")
+    parser.add_argument("--no-run-now", action="store_true", help="啟動時不立即執行，等到第一個排程時間")
+    args = parser.parse_args()
+
+    clock = RealClock()
+    schedule = DailySchedule(args.at.split(",")) if args.at else IntervalSchedule(args.interval_minutes, anchor=clock.now())
+    daemon = Daemon(schedule=schedule, clock=clock, run_now=not args.no_run_now)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: daemon.stop())
+
+    browser = listing_sources.WarmBrowser()
+    listing_sources.use_warm_browser(browser)
+    try:
+        daemon.run(max_runs=args.max_runs)
+    finally:
+        browser.close()
+        news_hunter.close_http_session()
+    if daemon.history and daemon.history[-1]["status"] != "success":
+        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,935 @@
+import json
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import content_codec
+import metrics
 
 DB_FILE = "news.db"
+SQLITE_MAX_VARIABLES = 900 # SQLite 單一語句可用的參數數量有上限，批次查詢時分段送出
+ITER_BATCH_SIZE = 200 # 串流讀取時每次從 cursor 取回的筆數
+FTS_MIN_TERM_LENGTH = 3 # trigram 斷詞的關鍵字最少要 3 個字
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_SNIPPET_TOKENS = 24
+ARTICLE_COLUMNS = ("id", "headline", "url", "publish_time_str", "publish_datetime", "content", "content_hash", "scraped_at")
+ARTICLE_METADATA_COLUMNS = tuple(column for column in ARTICLE_COLUMNS if column != "content") # 不需要解壓縮內文的欄位
+CONTENT_SIZE_COLUMN = "content_size" # 可額外指定的欄位：content_blobs 記錄的內文 UTF-8 位元組數，不必解壓縮
+CONTENT_DICT_MIN_SAMPLES = 200 # 累積這麼多篇內文後才訓練壓縮字典，樣本太少訓練出的字典沒有代表性
+CONTENT_DICT_SAMPLE_SIZE = 1000 # 訓練字典時取最近的幾篇內文
+MIGRATION_BATCH_SIZE = 500 # 舊資料庫搬移內文時每批處理的筆數
+# 每條連線開啟時套用的設定：WAL 讓讀寫可以同時進行，synchronous=NORMAL 在 WAL 下仍然安全且快很多
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000", # 負值代表 KB，約 20MB 的頁面快取
+    "PRAGMA busy_timeout=5000",
+)
+
+_shared_connection = None
+_shared_lock = threading.RLock()
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    # article_texts 檢視表 (全文索引的內容來源) 以這個函數解壓縮內文，因此必須透過 _connect 開啟資料庫
+    conn.create_function("content_text", 2, _content_text, deterministic=True)
+    return conn
+
+def _content_text(body, zdict):
+    return content_codec.decompress(body, zdict) if body is not None else None
+
+@contextmanager
+def run_session():
+    """
+    讓一次執行中的所有資料庫操作共用同一條連線，結束時自動關閉。
+    巢狀使用時沿用外層的連線。
+        with database.run_session():
+            ...
+    """
+    global _shared_connection
+    if _shared_connection is not None:
+        yield _shared_connection
+        return
+    _shared_connection = _connect()
+    try:
+        yield _shared_connection
+    finally:
+        with _shared_lock:
+            _shared_connection.close()
+            _shared_connection = None
+
+@contextmanager
+def _connection():
+    """有共用連線就借用 (以鎖保護跨執行緒存取)，否則開一條用完即關的連線。"""
+    # 在鎖內讀取共用連線，避免另一條執行緒的 run_session 剛好在檢查與使用之間把它關閉
+    with _shared_lock:
+        shared = _shared_connection
+        if shared is not None:
+            yield shared
+            return
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
 
 def setup_database():
-    """建立資料庫和 articles、summaries 表格 (如果不存在的話)。"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # 建立 articles 表格的完整指令
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS articles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            headline TEXT NOT NULL,
-            url TEXT NOT NULL UNIQUE,
-            publish_time_str TEXT,
-            publish_datetime TEXT,
-            content TEXT,
-            scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # 建立 summaries 表格的完整指令
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS summaries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            summary_text TEXT NOT NULL,
-            source_article_count INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """建立資料庫和所有表格 (如果不存在的話)。"""
+    with _connection() as conn:
+        cursor = conn.cursor()
+
+        # 建立 articles 表格的完整指令
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                headline TEXT NOT NULL,
+                url TEXT NOT NULL UNIQUE,
+                publish_time_str TEXT,
+                publish_datetime TEXT,
+                content_hash TEXT,
+                scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 舊版資料庫的內文直接存在 articles.content，之後由 _migrate_inline_content 搬到 content_blobs
+        article_columns = {row[1] for row in cursor.execute("PRAGMA table_info(articles)")}
+        if "content_hash" not in article_columns:
+            cursor.execute("ALTER TABLE articles ADD COLUMN content_hash TEXT")
+
+        # 建立 summaries 表格的完整指令
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                summary_text TEXT NOT NULL,
+                source_article_count INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_complete INTEGER NOT NULL DEFAULT 1,
+                content_hash TEXT
+            )
+        ''')
+        # 舊版資料庫的 summaries 沒有 is_complete 欄位 (當時只會存入完整的報告)
+        summary_columns = {row[1] for row in cursor.execute("PRAGMA table_info(summaries)")}
+        if "is_complete" not in summary_columns:
+            cursor.execute("ALTER TABLE summaries ADD COLUMN is_complete INTEGER NOT NULL DEFAULT 1")
+        # 完整的報告內文存在 content_blobs (content_hash)，summary_text 只用來暫存串流中的報告
+        if "content_hash" not in summary_columns:
+            cursor.execute("ALTER TABLE summaries ADD COLUMN content_hash TEXT")
+
+        # 文章內文與完整報告以內容雜湊為鍵壓縮存放，相同的內文只存一份；dict_id 為壓縮時使用的字典 (NULL 代表沒有字典)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_blobs (
+                hash TEXT PRIMARY KEY,
+                dict_id TEXT,
+                raw_size INTEGER NOT NULL, -- 未壓縮的 UTF-8 位元組數
+                body BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_dicts (
+                id TEXT PRIMARY KEY,
+                zdict BLOB NOT NULL,
+                sample_count INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 解壓縮後的文章內文，全文索引與 LIKE 搜尋都從這裡讀取
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS article_texts AS
+            SELECT a.id, a.headline, content_text(b.body, d.zdict) AS content
+            FROM articles a
+            LEFT JOIN content_blobs b ON b.hash = a.content_hash
+            LEFT JOIN content_dicts d ON d.id = b.dict_id
+        ''')
+
+        # 每篇文章的 AI 重點摘要快取，以「內文雜湊 + 提示版本」為鍵，內容沒變就不必重新摘要
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS article_digests (
+                content_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (content_hash, prompt_version)
+            )
+        ''')
+
+        # 抓過內文但發布時間早於抓取窗口、沒有存成文章的網址；增量抓取時同樣略過，過了保留期限才清除
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url TEXT PRIMARY KEY,
+                publish_datetime TEXT,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # 近似重複偵測的 MinHash 簽章，以「內文雜湊 + 簽章版本」為鍵，每篇內文只需要計算一次
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dedup_signatures (
+                content_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (content_hash, version)
+            )
+        ''')
+
+        # 每次執行 (run_id) 各階段的完成狀態與產出，run_all --resume 依此從第一個未完成的階段接續
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS run_manifest (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (run_id, stage)
+            )
+        ''')
+
+        # 已合成完成的 podcast 段落音訊，podcaster 中途失敗時重跑可以從最後完成的段落接續
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS podcast_chunks (
+                run_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                audio BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (run_id, chunk_index)
+            )
+        ''')
+
+        # 保留歷史資料後，時間範圍查詢與「最新一份報告」都需要索引，否則每次都是全表掃描
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_publish_datetime ON articles (publish_datetime)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_scraped_at ON articles (scraped_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_seen_urls_publish_datetime ON seen_urls (publish_datetime)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_summaries_created_at ON summaries (created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_run_manifest_updated_at ON run_manifest (updated_at)")
+        # 清除文章後要找出沒有被引用的內文
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_content_hash ON articles (content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_summaries_content_hash ON summaries (content_hash)")
+        conn.commit()
+        _drop_legacy_fulltext_index(conn)
+        migrated = _migrate_inline_content(conn)
+        _setup_fulltext_index(conn)
+        if migrated:
+            # 搬走的內文留下大量空頁，重整一次才會真的縮小檔案
+            print("正在重整資料庫以釋放空間...")
+            conn.execute("VACUUM")
     print(f"資料庫 '{DB_FILE}' 已準備就緒。")
 
-def add_article(article_data):
-    # ... (此函數維持不變) ...
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def _drop_legacy_fulltext_index(conn):
+    """舊版的全文索引直接引用 articles.content，搬移內文之前先移除，之後改以 article_texts 重建。"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'articles_fts'").fetchone()
+    if not row or "content='articles'" not in row[0]:
+        return
+    for trigger in ("articles_fts_insert", "articles_fts_delete", "articles_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE articles_fts")
+    conn.commit()
+
+def _migrate_inline_content(conn):
+    """
+    把舊版資料庫直接存在 articles.content 與 summaries.summary_text 的內文搬到 content_blobs，回傳是否有搬移任何資料。
+    文章夠多時先以這些內文訓練壓縮字典，搬移時就直接用字典壓縮。articles.content 欄位保留但清成 NULL。
+    """
+    article_columns = {row[1] for row in conn.execute("PRAGMA table_info(articles)")}
+    pending = conn.execute("SELECT COUNT(*) FROM articles WHERE content IS NOT NULL").fetchone()[0] if "content" in article_columns else 0
+    pending_summaries = conn.execute(
+        "SELECT COUNT(*) FROM summaries WHERE content_hash IS NULL AND is_complete = 1 AND summary_text != ''"
+    ).fetchone()[0]
+    if not pending and not pending_summaries:
+        return False
+
+    print(f"正在把 {pending} 篇文章與 {pending_summaries} 份報告的內文搬到壓縮儲存...")
     try:
-        cursor.execute('''
-            INSERT OR IGNORE INTO articles (headline, url, publish_time_str, publish_datetime, content)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            article_data['headline'],
-            article_data['url'],
-            article_data.get('time_str', 'N/A'),
-            article_data.get('datetime').isoformat() if article_data.get('datetime') else None,
-            article_data.get('content')
-        ))
-        inserted = cursor.rowcount > 0
+        if pending >= CONTENT_DICT_MIN_SAMPLES and _current_dictionary(conn)[0] is None:
+            samples = [row[0] for row in conn.execute(
+                "SELECT content FROM articles WHERE content IS NOT NULL ORDER BY id DESC LIMIT ?", (CONTENT_DICT_SAMPLE_SIZE,))]
+            _save_dictionary(conn, content_codec.train_dictionary(samples), len(samples))
+        while True:
+            rows = conn.execute("SELECT id, content FROM articles WHERE content IS NOT NULL LIMIT ?", (MIGRATION_BATCH_SIZE,)).fetchall()
+            if not rows:
+                break
+            hashes = _store_contents(conn, [content for _, content in rows])
+            conn.executemany("UPDATE articles SET content_hash = ?, content = NULL WHERE id = ?",
+                             [(content_hash, article_id) for (article_id, _), content_hash in zip(rows, hashes)])
+        rows = conn.execute(
+            "SELECT id, summary_text FROM summaries WHERE content_hash IS NULL AND is_complete = 1 AND summary_text != ''"
+        ).fetchall()
+        hashes = _store_contents(conn, [text for _, text in rows])
+        conn.executemany("UPDATE summaries SET content_hash = ?, summary_text = '' WHERE id = ?",
+                         [(content_hash, summary_id) for (summary_id, _), content_hash in zip(rows, hashes)])
         conn.commit()
     except sqlite3.Error as e:
-        print(f"資料庫錯誤: {e}")
-        inserted = False
-    finally:
-        conn.close()
-    return inserted
+        conn.rollback()
+        print(f"搬移內文時發生資料庫錯誤: {e}")
+        return False
+    return True
+
+# --- 壓縮內文 (content_blobs) ---
+
+_dictionaries = {} # {dict_id: zdict}；dict_id 是字典內容的雜湊，不同資料庫之間共用快取也不會混淆
+_dictionaries_lock = threading.Lock()
+
+def _dictionary(conn, dict_id):
+    if dict_id is None:
+        return None
+    with _dictionaries_lock:
+        zdict = _dictionaries.get(dict_id)
+    if zdict is None:
+        row = conn.execute("SELECT zdict FROM content_dicts WHERE id = ?", (dict_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"找不到壓縮字典 {dict_id}")
+        zdict = bytes(row[0])
+        with _dictionaries_lock:
+            _dictionaries[dict_id] = zdict
+    return zdict
 
-def get_all_articles_for_analysis():
+def _current_dictionary(conn):
+    """新寫入的內文使用最新的字典，回傳 (dict_id, zdict)，還沒有字典時為 (None, None)。"""
+    row = conn.execute("SELECT id FROM content_dicts ORDER BY created_at DESC, rowid DESC LIMIT 1").fetchone()
+    if row is None:
+        return None, None
+    return row[0], _dictionary(conn, row[0])
+
+def _save_dictionary(conn, zdict, sample_count):
+    dict_id = content_codec.dictionary_id(zdict)
+    conn.execute("INSERT OR IGNORE INTO content_dicts (id, zdict, sample_count) VALUES (?, ?, ?)", (dict_id, zdict, sample_count))
+    print(f"已從 {sample_count} 篇內文訓練出 {len(zdict) // 1024} KB 的壓縮字典。")
+    return dict_id
+
+def _store_contents(conn, texts):
+    """壓縮並寫入 content_blobs (已存在的內容不重複寫入)，回傳每段文字的 content_hash (None 的文字對應 None)。不會 commit。"""
+    dict_id, zdict = _current_dictionary(conn)
+    hashes, rows = [], {}
+    for text in texts:
+        if text is None:
+            hashes.append(None)
+            continue
+        content_hash = content_codec.content_hash(text)
+        hashes.append(content_hash)
+        if content_hash not in rows:
+            rows[content_hash] = (content_hash, dict_id, len(text.encode('utf-8')), content_codec.compress(text, zdict))
+    if rows:
+        existing = set()
+        keys = list(rows)
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            existing.update(row[0] for row in conn.execute(f"SELECT hash FROM content_blobs WHERE hash IN ({placeholders})", batch))
+        fresh = [row for content_hash, row in rows.items() if content_hash not in existing]
+        conn.executemany("INSERT OR IGNORE INTO content_blobs (hash, dict_id, raw_size, body) VALUES (?, ?, ?, ?)", fresh)
+        metrics.incr("db.content_raw_bytes", sum(row[2] for row in fresh))
+        metrics.incr("db.content_stored_bytes", sum(len(row[3]) for row in fresh))
+    return hashes
+
+def _decode_blob(conn, dict_id, body):
+    return content_codec.decompress(bytes(body), _dictionary(conn, dict_id)) if body is not None else None
+
+def _load_contents(conn, content_hashes):
+    contents = {}
+    content_hashes = [content_hash for content_hash in set(content_hashes) if content_hash]
+    for start in range(0, len(content_hashes), SQLITE_MAX_VARIABLES):
+        batch = content_hashes[start:start + SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(batch))
+        for content_hash, dict_id, body in conn.execute(f"SELECT hash, dict_id, body FROM content_blobs WHERE hash IN ({placeholders})", batch):
+            contents[content_hash] = _decode_blob(conn, dict_id, body)
+    return contents
+
+def get_contents(content_hashes):
+    """批次讀取並解壓縮內文，回傳 {content_hash: 文字}，不存在的雜湊不會出現在結果中。"""
+    with _connection() as conn:
+        return _load_contents(conn, content_hashes)
+
+def train_content_dictionary(min_samples=CONTENT_DICT_MIN_SAMPLES):
     """
-    從資料庫讀取「所有」文章以供分析。
-    不再進行時間篩選。
+    還沒有壓縮字典且已累積 min_samples 篇內文時，以最近的內文訓練字典，並把先前沒有字典的內文重新壓縮。
+    回傳新字典的 id (不需要訓練時為 None)。之後再次訓練也安全：每筆內文都記錄自己使用的字典。
     """
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    # 移除了 WHERE 語句，直接選取所有文章
-    cursor.execute("SELECT * FROM articles ORDER BY publish_datetime DESC")
-    articles = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return articles
+    with _connection() as conn:
+        if _current_dictionary(conn)[0] is not None:
+            return None
+        if conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0] < min_samples:
+            return None
+        try:
+            rows = conn.execute("SELECT dict_id, body FROM content_blobs ORDER BY rowid DESC LIMIT ?", (CONTENT_DICT_SAMPLE_SIZE,)).fetchall()
+            samples = [_decode_blob(conn, dict_id, body) for dict_id, body in rows]
+            dict_id = _save_dictionary(conn, content_codec.train_dictionary(samples), len(samples))
+            zdict = _dictionary(conn, dict_id)
+            plain = conn.execute("SELECT hash, body FROM content_blobs WHERE dict_id IS NULL").fetchall()
+            conn.executemany("UPDATE content_blobs SET dict_id = ?, body = ? WHERE hash = ?",
+                             [(dict_id, content_codec.compress(content_codec.decompress(bytes(body)), zdict), content_hash)
+                              for content_hash, body in plain])
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"訓練壓縮字典時發生資料庫錯誤: {e}")
+            return None
+    return dict_id
 
-def add_summary(summary_text, source_article_count):
-    """將一份新的 AI 分析報告存入資料庫"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def _prune_orphan_contents(conn):
+    """刪除沒有任何文章或報告引用的內文 (連同它們的去重簽章)，回傳刪除的內文筆數 (不會 commit)。"""
+    cursor = conn.execute('''
+        DELETE FROM content_blobs
+        WHERE NOT EXISTS (SELECT 1 FROM articles WHERE articles.content_hash = content_blobs.hash)
+          AND NOT EXISTS (SELECT 1 FROM summaries WHERE summaries.content_hash = content_blobs.hash)
+    ''')
+    conn.execute("DELETE FROM dedup_signatures WHERE content_hash NOT IN (SELECT hash FROM content_blobs)")
+    return cursor.rowcount
+
+def _setup_fulltext_index(conn):
+    """
+    建立 articles 的 FTS5 全文索引 (trigram 斷詞，中文不需要分詞就能做子字串搜尋)，並以 trigger 與 articles 保持同步。
+    索引內容引用 article_texts 檢視表 (external content)，內文只以壓縮的形式存放一份，產生 snippet 時才解壓縮。
+    SQLite 版本太舊 (trigram 需要 3.34 以上) 或沒有 FTS5 時，搜尋會自動退回 LIKE 掃描。
+    """
     try:
-        cursor.execute(
-            "INSERT INTO summaries (summary_text, source_article_count) VALUES (?, ?)",
-            (summary_text, source_article_count)
-        )
+        existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'").fetchone()
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                headline, content, content='article_texts', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        # 文章寫入前內文已先存進 content_blobs，刪除或更新前 article_texts 也還讀得到舊的內文
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, headline, content) SELECT id, headline, content FROM article_texts WHERE id = new.id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_delete BEFORE DELETE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, headline, content)
+                SELECT 'delete', id, headline, content FROM article_texts WHERE id = old.id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_update_before BEFORE UPDATE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, headline, content)
+                SELECT 'delete', id, headline, content FROM article_texts WHERE id = old.id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS articles_fts_update_after AFTER UPDATE ON articles BEGIN
+                INSERT INTO articles_fts (rowid, headline, content) SELECT id, headline, content FROM article_texts WHERE id = new.id;
+            END
+        ''')
+        if not existed:
+            # 既有的資料庫第一次建立索引時，把已經存在的文章補進索引
+            conn.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
         conn.commit()
-        print("一份新的 AI 分析報告已成功存入知識庫！")
-    except sqlite3.Error as e:
-        print(f"儲存分析報告時發生資料庫錯誤: {e}")
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        print(f"無法建立全文索引，搜尋將改用 LIKE 掃描: {e}")
+
+def _article_row(article_data, content_hash):
+    return (
+        article_data['headline'],
+        article_data['url'],
+        article_data.get('time_str', 'N/A'),
+        _to_utc_iso(article_data.get('datetime')),
+        content_hash
+    )
+
+INSERT_ARTICLE_SQL = '''
+    INSERT OR IGNORE INTO articles (headline, url, publish_time_str, publish_datetime, content_hash)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+def _insert_articles(conn, articles):
+    """先把內文壓縮存進 content_blobs，再寫入文章 (全文索引的 trigger 需要讀到內文)，回傳 executemany 的 cursor。不會 commit。"""
+    hashes = _store_contents(conn, [article.get('content') for article in articles])
+    return conn.executemany(INSERT_ARTICLE_SQL, [_article_row(article, content_hash) for article, content_hash in zip(articles, hashes)])
+
+def add_article(article_data):
+    """新增單篇文章 (每次呼叫各自 commit)，大量寫入請改用 add_articles。"""
+    with _connection() as conn:
+        try:
+            cursor = _insert_articles(conn, [article_data])
+            inserted = cursor.rowcount > 0
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"資料庫錯誤: {e}")
+            inserted = False
+    return inserted
+
+def add_articles(articles):
+    """在單一交易中以 executemany 批次新增多篇文章，回傳實際新增的篇數 (重複網址會被略過)。"""
+    articles = list(articles)
+    with _connection() as conn, metrics.span("db.add_articles_seconds"):
+        try:
+            # executemany 的 rowcount 是各筆實際新增的總和，不含全文索引 trigger 造成的變更 (total_changes 會含)
+            cursor = _insert_articles(conn, articles)
+            conn.commit()
+            inserted = max(cursor.rowcount, 0)
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"批次寫入文章時發生資料庫錯誤: {e}")
+            metrics.incr("db.errors")
+            inserted = 0
+    metrics.incr("db.articles_inserted", inserted)
+    if inserted:
+        train_content_dictionary()
+    return inserted
+
+def _to_utc_iso(dt):
+    """統一以 UTC 的 ISO 字串儲存時間，讓字串比較等同於時間比較。"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
+
+def get_existing_urls(urls):
+    """
+    一次性批次查詢：回傳 urls 之中已經抓過的網址集合，
+    包含已存在於 articles 表格的文章，以及抓過但不在時間窗口內、記在 seen_urls 的網址。
+    """
+    urls = list(urls)
+    existing = set()
+    with _connection() as conn:
+        for start in range(0, len(urls), SQLITE_MAX_VARIABLES):
+            batch = urls[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            cursor = conn.execute(
+                f"SELECT url FROM articles WHERE url IN ({placeholders}) UNION SELECT url FROM seen_urls WHERE url IN ({placeholders})",
+                batch + batch
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+def add_seen_urls(seen):
+    """記錄抓過但沒有存成文章的網址 [(url, publish_datetime), ...]，下次增量抓取時不必再下載。"""
+    with _connection() as conn:
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO seen_urls (url, publish_datetime) VALUES (?, ?)",
+                [(url, _to_utc_iso(publish_time)) for url, publish_time in seen]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"記錄已抓過的網址時發生資料庫錯誤: {e}")
+
+def _select_columns(columns):
+    """
+    articles 的欄位轉成 SELECT 子句；content 改為從 content_blobs 取出壓縮內文，讀取後由 _article_dict 解壓縮，
+    content_size 直接取 content_blobs 的 raw_size。
+    """
+    unknown = set(columns) - set(ARTICLE_COLUMNS) - {CONTENT_SIZE_COLUMN}
+    if unknown:
+        raise ValueError(f"未知的欄位: {', '.join(sorted(unknown))}")
+    if "content" not in columns and CONTENT_SIZE_COLUMN not in columns:
+        return f"{', '.join(f'a.{column}' for column in columns)} FROM articles a"
+    expressions = {"content": "b.dict_id AS content_dict_id, b.body AS content_body", CONTENT_SIZE_COLUMN: f"b.raw_size AS {CONTENT_SIZE_COLUMN}"}
+    selected = ", ".join(expressions.get(column, f"a.{column}") for column in columns)
+    return f"{selected} FROM articles a LEFT JOIN content_blobs b ON b.hash = a.content_hash"
+
+def _article_dict(conn, row, columns):
+    if "content" not in columns:
+        return dict(row)
+    return {column: _decode_blob(conn, row["content_dict_id"], row["content_body"]) if column == "content" else row[column]
+            for column in columns}
+
+class LazyArticle(dict):
+    """
+    只含中繼資料的文章；第一次讀取 article['content'] (或 .get('content')) 時才讀取並解壓縮內文，之後保留在 dict 中。
+    只用到標題與時間的呼叫端完全不會碰到內文。
+    """
+    def __missing__(self, key):
+        if key != "content":
+            raise KeyError(key)
+        content_hash = super().get("content_hash")
+        content = get_contents([content_hash]).get(content_hash) if content_hash else None
+        self["content"] = content
+        return content
+
+    def get(self, key, default=None):
+        if key == "content":
+            return self["content"]
+        return super().get(key, default)
+
+def _window_clause(since, until):
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("publish_datetime >= ?")
+        params.append(_to_utc_iso(since))
+    if until is not None:
+        conditions.append("publish_datetime < ?")
+        params.append(_to_utc_iso(until))
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+def iter_articles(since=None, until=None, columns=ARTICLE_COLUMNS, batch_size=ITER_BATCH_SIZE, lazy_content=False):
+    """
+    依 publish_datetime 由新到舊串流讀取 [since, until) 之間的文章，每次只從 cursor 取回 batch_size 筆。
+    使用獨立的唯讀連線 (WAL 模式下不會擋住寫入)，呼叫端邊讀邊處理，不會一次把整個語料載入記憶體。
+    只需要標題或時間時，可用 columns 指定欄位 (例如 ARTICLE_METADATA_COLUMNS，另可加上 content_size)，完全不會讀取內文；
+    lazy_content=True 時回傳 LazyArticle，內文等到實際用到時才解壓縮。
+    """
+    if lazy_content:
+        columns = tuple(column for column in columns if column != "content")
+        columns += () if "content_hash" in columns else ("content_hash",)
+    where, params = _window_clause(since, until)
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(f"SELECT {_select_columns(columns)} {where} ORDER BY a.publish_datetime DESC", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield LazyArticle(row) if lazy_content else _article_dict(conn, row, columns)
     finally:
         conn.close()
 
-def get_latest_summary():
-    """從資料庫讀取最新的一份分析報告"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM summaries ORDER BY created_at DESC LIMIT 1")
-    latest_summary = cursor.fetchone()
-    conn.close()
-    if latest_summary:
-        return dict(latest_summary)
-    return None
-
-def clear_all_data():
-    """清空 articles 和 summaries 表格中的所有資料，為下一次運行做準備。"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+def iter_articles_by_ids(ids, columns=ARTICLE_COLUMNS):
+    """依 ids 的順序串流讀取指定的文章，每次只查詢一批 (SQLITE_MAX_VARIABLES 筆)，同樣使用獨立的唯讀連線。"""
+    ids = list(ids)
+    columns = tuple(columns) if "id" in columns else ("id",) + tuple(columns)
+    conn = _connect()
     try:
-        # 使用 DELETE FROM 會清空表格內容，但保留表格結構
-        cursor.execute("DELETE FROM articles")
-        cursor.execute("DELETE FROM summaries")
-        conn.commit()
-        print(f"資料庫 '{DB_FILE}' 已清空，準備接收新情報。")
-    except sqlite3.Error as e:
-        print(f"清空資料庫時發生錯誤: {e}")
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            batch = ids[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f"SELECT {_select_columns(columns)} WHERE a.id IN ({placeholders})", batch)
+            rows = {row["id"]: _article_dict(conn, row, columns) for row in cursor.fetchall()}
+            for article_id in batch:
+                if article_id in rows:
+                    yield rows[article_id]
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def _fts_query(query):
+    """把使用者輸入的關鍵字轉成 FTS5 語法：每個詞都當成片語 (以雙引號包住)，詞與詞之間為 AND。"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def _like_pattern(term):
+    """把關鍵字轉成「包含」的 LIKE 樣式；關鍵字中的 %、_ 與反斜線都以反斜線跳脫 (搭配 ESCAPE)，只比對字面。"""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _has_fulltext_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'articles_fts'").fetchone() is not None
+
+def search_articles(query, since=None, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    全文搜尋文章，回傳依相關度排序的 [{"id", "headline", "url", "publish_datetime", "snippet", "score"}, ...]。
+    標題的權重高於內文；since 可限制只搜尋該時間之後發布的文章。
+    trigram 索引需要每個關鍵字至少 3 個字，較短的關鍵字 (例如「鴻海」) 會改用 LIKE 掃描。
+    """
+    terms = query.split()
+    if not terms:
+        return []
+    since_iso = _to_utc_iso(since)
+    with _connection() as conn, metrics.span("db.search_seconds"):
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        if _has_fulltext_index(conn) and min(len(term) for term in terms) >= FTS_MIN_TERM_LENGTH:
+            # 先只排序取出前 limit 筆，再為這幾筆產生 snippet；snippet 需要解壓縮內文，不能對每一筆符合的文章都做
+            cursor.execute('''
+                SELECT a.id, a.headline, a.url, a.publish_datetime, bm25(articles_fts, 2.0, 1.0) AS score
+                FROM articles_fts
+                JOIN articles a ON a.id = articles_fts.rowid
+                WHERE articles_fts MATCH ? AND (? IS NULL OR a.publish_datetime >= ?)
+                ORDER BY score
+                LIMIT ?
+            ''', (_fts_query(query), since_iso, since_iso, limit))
+            results = [dict(row) for row in cursor.fetchall()]
+            if results:
+                placeholders = ",".join("?" * len(results))
+                snippets = dict(conn.execute(f'''
+                    SELECT rowid, snippet(articles_fts, 1, '[', ']', '…', {SEARCH_SNIPPET_TOKENS})
+                    FROM articles_fts WHERE articles_fts MATCH ? AND rowid IN ({placeholders})
+                ''', [_fts_query(query)] + [result["id"] for result in results]).fetchall())
+                for result in results:
+                    result["snippet"] = snippets.get(result["id"])
+            return [{key: result.get(key) for key in ("id", "headline", "url", "publish_datetime", "snippet", "score")} for result in results]
+        else:
+            # 由新到舊沿著 publish_datetime 索引掃描，找到 limit 筆就停止；標題符合的文章不必解壓縮內文
+            conditions = " AND ".join("(a.headline LIKE ? ESCAPE '\\' OR content_text(b.body, d.zdict) LIKE ? ESCAPE '\\')" for _ in terms)
+            params = [pattern for term in terms for pattern in (_like_pattern(term), _like_pattern(term))]
+            cursor.execute(f'''
+                SELECT a.id, a.headline, a.url, a.publish_datetime, substr(content_text(b.body, d.zdict), 1, 80) AS snippet, 0.0 AS score
+                FROM articles a
+                LEFT JOIN content_blobs b ON b.hash = a.content_hash
+                LEFT JOIN content_dicts d ON d.id = b.dict_id
+                WHERE (? IS NULL OR a.publish_datetime >= ?) AND {conditions}
+                ORDER BY a.publish_datetime DESC
+                LIMIT ?
+            ''', [since_iso, since_iso] + params + [limit])
+        return [dict(row) for row in cursor.fetchall()]
+
+def count_articles(since=None, until=None):
+    """計算 [since, until) 之間的文章數 (走 publish_datetime 索引，不讀取內文)。"""
+    where, params = _window_clause(since, until)
+    with _connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM articles {where}", params).fetchone()[0]
+
+def get_all_articles_for_analysis(since=None):
+    """
+    從資料庫讀取文章以供分析。
+    since 為 None 時讀取「所有」文章；否則只讀取 publish_datetime >= since 的文章。
+    內文不會一次全部載入，每篇在第一次讀取 article['content'] 時才解壓縮 (見 LazyArticle)；
+    需要處理大量文章時請改用 iter_articles 串流讀取。
+    """
+    return list(iter_articles(since=since, lazy_content=True))
+
+def prune_articles(retention_days):
+    """保留政策：刪除 publish_datetime 早於 retention_days 天前的文章 (與 seen_urls 中同樣過期的網址)，回傳刪除的文章筆數。"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    with _connection() as conn:
+        try:
+            conn.execute("DELETE FROM seen_urls WHERE publish_datetime < ?", (_to_utc_iso(cutoff),))
+            cursor = conn.execute("DELETE FROM articles WHERE publish_datetime < ?", (_to_utc_iso(cutoff),))
+            deleted = cursor.rowcount
+            if deleted:
+                _prune_orphan_contents(conn)
+            conn.commit()
+            if deleted:
+                print(f"已清除 {deleted} 篇超過 {retention_days} 天的舊文章。")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"清除舊文章時發生資料庫錯誤: {e}")
+            deleted = 0
+    return deleted
+
+def get_cached_digests(content_hashes, prompt_version):
+    """批次查詢快取：回傳 {content_hash: digest}，只包含已快取的項目。"""
+    content_hashes = list(content_hashes)
+    digests = {}
+    with _connection() as conn:
+        for start in range(0, len(content_hashes), SQLITE_MAX_VARIABLES):
+            batch = content_hashes[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            cursor = conn.execute(
+                f"SELECT content_hash, digest FROM article_digests WHERE prompt_version = ? AND content_hash IN ({placeholders})",
+                [prompt_version] + batch
+            )
+            digests.update(cursor.fetchall())
+    return digests
+
+def add_digests(digests, prompt_version):
+    """將 {content_hash: digest} 一次寫入快取。"""
+    metrics.incr("db.digests_written", len(digests))
+    with _connection() as conn:
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO article_digests (content_hash, prompt_version, digest) VALUES (?, ?, ?)",
+                [(content_hash, prompt_version, digest) for content_hash, digest in digests.items()]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"儲存文章摘要快取時發生資料庫錯誤: {e}")
+
+def get_dedup_signatures(since, version):
+    """回傳 publish_datetime >= since 的文章已存的去重簽章 {content_hash: bytes}，簽章版本不同的不算。"""
+    where, params = _window_clause(since, None)
+    with _connection() as conn:
+        cursor = conn.execute(
+            f"SELECT s.content_hash, s.signature FROM dedup_signatures s "
+            f"WHERE s.version = ? AND s.content_hash IN (SELECT content_hash FROM articles {where})",
+            [version] + params
+        )
+        return {content_hash: bytes(signature) for content_hash, signature in cursor.fetchall()}
+
+def add_dedup_signatures(signatures, version):
+    """將 {content_hash: bytes} 一次寫入簽章快取。"""
+    with _connection() as conn:
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO dedup_signatures (content_hash, version, signature) VALUES (?, ?, ?)",
+                [(content_hash, version, signature) for content_hash, signature in signatures.items()]
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"儲存去重簽章時發生資料庫錯誤: {e}")
+
+def prune_digests(retention_days):
+    """刪除超過 retention_days 天的摘要快取，對應的文章也早已被清除。"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    with _connection() as conn:
+        try:
+            # created_at 由 CURRENT_TIMESTAMP 產生，格式為 UTC 的 'YYYY-MM-DD HH:MM:SS'
+            conn.execute("DELETE FROM article_digests WHERE created_at < ?", (cutoff.strftime('%Y-%m-%d %H:%M:%S'),))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"清除摘要快取時發生資料庫錯誤: {e}")
+
+SUMMARY_METADATA_COLUMNS = ("id", "source_article_count", "created_at", "is_complete", "content_hash")
+
+def add_summary(summary_text, source_article_count):
+    """將一份新的 AI 分析報告 (內文壓縮存入 content_blobs) 存入資料庫，回傳報告的 id (失敗時為 None)"""
+    with _connection() as conn:
+        try:
+            content_hash = _store_contents(conn, [summary_text])[0]
+            cursor = conn.execute(
+                "INSERT INTO summaries (summary_text, source_article_count, content_hash) VALUES ('', ?, ?)",
+                (source_article_count, content_hash)
+            )
+            conn.commit()
+            print("一份新的 AI 分析報告已成功存入知識庫！")
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"儲存分析報告時發生資料庫錯誤: {e}")
+            return None
+
+def start_summary(source_article_count):
+    """
+    串流產生報告時先建立一筆尚未完成的報告 (is_complete = 0)，回傳其 id，之後以 update_summary 逐步寫入。
+    未完成的報告不會被 get_latest_summary 讀到；產生失敗時由呼叫端以 discard_summary 刪除。
+    """
+    with _connection() as conn:
+        try:
+            cursor = conn.execute(
+                "INSERT INTO summaries (summary_text, source_article_count, is_complete) VALUES ('', ?, 0)",
+                (source_article_count,)
+            )
+            conn.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"建立分析報告時發生資料庫錯誤: {e}")
+            return None
+
+def update_summary(summary_id, summary_text, is_complete=False):
+    """
+    更新串流中的報告內容 (checkpoint)；is_complete=True 代表報告已完整產生。
+    checkpoint 會被頻繁覆寫，直接存在 summary_text；完成時才壓縮存入 content_blobs。
+    """
+    with _connection() as conn, metrics.span("db.summary_write_seconds"):
+        try:
+            if is_complete:
+                content_hash = _store_contents(conn, [summary_text])[0]
+                conn.execute("UPDATE summaries SET summary_text = '', content_hash = ?, is_complete = 1 WHERE id = ?", (content_hash, summary_id))
+            else:
+                conn.execute("UPDATE summaries SET summary_text = ?, is_complete = 0 WHERE id = ?", (summary_text, summary_id))
+            conn.commit()
+            if is_complete:
+                print("一份新的 AI 分析報告已成功存入知識庫！")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"更新分析報告時發生資料庫錯誤: {e}")
+
+def discard_summary(summary_id):
+    """刪除產生失敗、尚未完成的報告 (已完成的報告不受影響)。"""
+    with _connection() as conn:
+        try:
+            conn.execute("DELETE FROM summaries WHERE id = ? AND is_complete = 0", (summary_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"刪除未完成的分析報告時發生資料庫錯誤: {e}")
+
+def _read_summary(where, params, include_text):
+    columns = ", ".join(SUMMARY_METADATA_COLUMNS + (("summary_text",) if include_text else ()))
+    with _connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(f"SELECT {columns} FROM summaries {where}", params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        summary = dict(row)
+        if include_text and summary["content_hash"]:
+            summary["summary_text"] = _load_contents(conn, [summary["content_hash"]]).get(summary["content_hash"], "")
+    return summary
+
+def get_latest_summary(include_text=True):
+    """
+    從資料庫讀取最新的一份完整分析報告 (略過串流中或中途失敗的報告)。
+    include_text=False 時只回傳中繼資料 (id、篇數、時間)，不讀取報告內文。
+    """
+    return _read_summary("WHERE is_complete = 1 ORDER BY created_at DESC, id DESC LIMIT 1", (), include_text)
+
+def get_summary(summary_id, include_text=True):
+    """依 id 讀取一份分析報告，不存在時回傳 None。"""
+    return _read_summary("WHERE id = ?", (summary_id,), include_text)
+
+def set_stage_status(run_id, stage, status, output=None):
+    """記錄某次執行中一個階段的狀態 ("running" / "complete" / "failed") 與產出 (可轉成 JSON 的 dict)。"""
+    with _connection() as conn:
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO run_manifest (run_id, stage, status, output, updated_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (run_id, stage, status, json.dumps(output, ensure_ascii=False) if output is not None else None)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"記錄執行進度時發生資料庫錯誤: {e}")
+
+def get_run_manifest(run_id):
+    """回傳 {stage: {"status", "output"}}，沒有紀錄時為空 dict。"""
+    with _connection() as conn:
+        rows = conn.execute("SELECT stage, status, output FROM run_manifest WHERE run_id = ?", (run_id,)).fetchall()
+    return {stage: {"status": status, "output": json.loads(output) if output else None} for stage, status, output in rows}
+
+def get_latest_run_id():
+    """最近一次有紀錄的執行 id，沒有任何紀錄時回傳 None。"""
+    with _connection() as conn:
+        row = conn.execute("SELECT run_id FROM run_manifest ORDER BY updated_at DESC, rowid DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+def add_podcast_chunk(run_id, chunk_index, chunk_hash, audio):
+    """保存一段合成完成的音訊 (可從多條執行緒呼叫)。"""
+    with _connection() as conn:
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO podcast_chunks (run_id, chunk_index, chunk_hash, audio) VALUES (?, ?, ?, ?)",
+                (run_id, chunk_index, chunk_hash, audio)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"保存合成段落時發生資料庫錯誤: {e}")
+
+def get_podcast_chunks(run_id):
+    """回傳此次執行已合成的段落 {chunk_hash: audio}。"""
+    with _connection() as conn:
+        rows = conn.execute("SELECT chunk_hash, audio FROM podcast_chunks WHERE run_id = ?", (run_id,)).fetchall()
+    return {chunk_hash: bytes(audio) for chunk_hash, audio in rows}
+
+def delete_podcast_chunks(run_id):
+    """整集上傳成功後，暫存的段落音訊就不再需要。"""
+    with _connection() as conn:
+        try:
+            conn.execute("DELETE FROM podcast_chunks WHERE run_id = ?", (run_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"清除合成段落時發生資料庫錯誤: {e}")
+
+def prune_runs(retention_days):
+    """刪除超過 retention_days 天的執行紀錄與其暫存的段落音訊。"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    with _connection() as conn:
+        try:
+            conn.execute("DELETE FROM podcast_chunks WHERE created_at < ?", (cutoff,))
+            conn.execute("DELETE FROM run_manifest WHERE updated_at < ?", (cutoff,))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"清除執行紀錄時發生資料庫錯誤: {e}")
+
+def clear_all_data():
+    """清空 articles 和 summaries 表格 (與它們的內文) 中的所有資料，為下一次運行做準備；壓縮字典保留下來繼續使用。"""
+    with _connection() as conn:
+        try:
+            # 使用 DELETE FROM 會清空表格內容，但保留表格結構
+            conn.execute("DELETE FROM articles")
+            conn.execute("DELETE FROM summaries")
+            conn.execute("DELETE FROM content_blobs")
+            conn.execute("DELETE FROM seen_urls")
+            conn.commit()
+            print(f"資料庫 '{DB_FILE}' 已清空，準備接收新情報。")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"清空資料庫時發生錯誤: {e}")
@@ -0,0 +1,118 @@
+# 檔名: dedup.py
+# 近似重複新聞偵測：同一則新聞常被不同媒體改寫後以不同網址出現在列表中。
+# 以中文字元 shingle 做 MinHash (one-permutation hashing)，再用 LSH 分段索引找出候選配對，
+# 最後以估計的 Jaccard 相似度確認後分群，每群只保留一篇代表文章。
+# 簽章使用固定的雜湊函數 (zlib.crc32)，不同行程算出的簽章相同，可以依內文雜湊存進資料庫重複使用。
+
+import re
+import zlib
+from array import array
+from itertools import repeat
+from operator import eq
+
+SHINGLE_SIZE = 4 # 中文沒有空白斷詞，直接以連續 4 個字元為一個 shingle
+NUM_BINS = 64 # MinHash 簽章長度
+ROWS_PER_BAND = 4 # LSH 每段的列數，NUM_BINS / ROWS_PER_BAND = 段數
+SIMILARITY_THRESHOLD = 0.6 # 估計的 Jaccard 相似度達到此值才視為同一則新聞
+EMPTY_BIN = None # 沒有任何 shingle 落入的 bin
+HASH_SEED = 0x5bd1e995 # crc32 的起始值；起始值為 0 時 crc32 的線性結構讓不相關的文章容易落入同一個 LSH bucket
+SIGNATURE_VERSION = f"crc32-{HASH_SEED:x}-{SHINGLE_SIZE}-{NUM_BINS}" # 簽章參數改變時一併改變，資料庫中舊的簽章就不會被沿用
+_STORED_EMPTY_BIN = -1 # 存進資料庫時 EMPTY_BIN 的表示方式 (crc32 不會產生負數)
+
+_IGNORED_CHARS = re.compile(r'[\s　，。、！？；：「」『』（）()《》〈〉,.!?;:"\'\-—…]+')
+
+def normalize_text(text):
+    """去掉空白與標點，改寫稿常常只差在斷句方式。"""
+    return _IGNORED_CHARS.sub('', text or '')
+
+def minhash_signature(text, shingle_size=SHINGLE_SIZE, num_bins=NUM_BINS):
+    """
+    One-permutation MinHash：每個 shingle 只雜湊一次，依雜湊值分到 num_bins 個 bin，每個 bin 取最小值。
+    文字先編碼成 UTF-32 (每個字固定 4 bytes)，shingle 直接是 bytes 切片，以 zlib.crc32 雜湊；
+    由大到小排序後建 dict，同一個 bin 後寫入的 (較小的) 值會覆蓋前面的，整個過程都在 C 層完成。
+    重複的 shingle 不影響每個 bin 的最小值，因此不必先去重。
+    """
+    encoded = normalize_text(text).encode('utf-32-le')
+    width = 4 * shingle_size
+    if len(encoded) < width:
+        hashes = [zlib.crc32(encoded, HASH_SEED)] if encoded else []
+    else:
+        shingles = [encoded[i:i + width] for i in range(0, len(encoded) - width + 4, 4)]
+        hashes = sorted(map(zlib.crc32, shingles, repeat(HASH_SEED)), reverse=True)
+    bins = dict(zip(map(num_bins.__rmod__, hashes), hashes))
+    return tuple(map(bins.get, range(num_bins), repeat(EMPTY_BIN)))
+
+def signature_to_bytes(signature):
+    """把簽章轉成可以存進資料庫的 bytes。"""
+    return array('q', (_STORED_EMPTY_BIN if value is EMPTY_BIN else value for value in signature)).tobytes()
+
+def signature_from_bytes(data):
+    """signature_to_bytes 的反向轉換。"""
+    values = array('q')
+    values.frombytes(data)
+    return tuple(EMPTY_BIN if value == _STORED_EMPTY_BIN else value for value in values)
+
+def estimate_similarity(sig_a, sig_b):
+    """以相同 bin 的比例估計 Jaccard 相似度，兩邊都是空 bin 的不列入計算。"""
+    if EMPTY_BIN not in sig_a and EMPTY_BIN not in sig_b:
+        return sum(map(eq, sig_a, sig_b)) / len(sig_a)
+    matched = compared = 0
+    for a, b in zip(sig_a, sig_b):
+        if a is EMPTY_BIN and b is EMPTY_BIN:
+            continue
+        compared += 1
+        if a == b:
+            matched += 1
+    return matched / compared if compared else 0.0
+
+def cluster_near_duplicates(texts, threshold=SIMILARITY_THRESHOLD, rows_per_band=ROWS_PER_BAND):
+    """將文字分群，回傳 [[index, ...], ...]，每群內的文章彼此近似重複。"""
+    return cluster_signatures([minhash_signature(text) for text in texts], threshold, rows_per_band)
+
+def cluster_signatures(signatures, threshold=SIMILARITY_THRESHOLD, rows_per_band=ROWS_PER_BAND):
+    """
+    依預先算好的簽章分群，呼叫端可以邊串流讀取文章邊計算簽章，不必保留內文。
+    LSH: 簽章切成多段，任一段完全相同的文章才會成為候選配對，避免兩兩比較。
+    """
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for i, signature in enumerate(signatures):
+        # 同一對文章常常在好幾段都落在同一個 bucket，先收集成集合，每對只比較一次
+        candidates = set()
+        for start in range(0, len(signature), rows_per_band):
+            band = signature[start:start + rows_per_band]
+            if band.count(EMPTY_BIN) == len(band):
+                continue
+            bucket = buckets.setdefault((start, band), [])
+            candidates.update(bucket)
+            bucket.append(i)
+        for j in candidates:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j and estimate_similarity(signature, signatures[j]) >= threshold:
+                parent[root_i] = root_j
+
+    clusters = {}
+    for i in range(len(signatures)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+def deduplicate_articles(articles, threshold=SIMILARITY_THRESHOLD):
+    """
+    每群近似重複的文章只保留內文最長的一篇 (通常資訊最完整)，其餘丟棄。
+    回傳 (保留的文章, 移除的篇數)，保留的文章維持原本的順序。
+    """
+    clusters = cluster_near_duplicates([article.get('content') for article in articles], threshold)
+    keep = select_representatives(clusters, [len(article.get('content') or '') for article in articles])
+    kept = [article for i, article in enumerate(articles) if i in keep]
+    return kept, len(articles) - len(kept)
+
+def select_representatives(clusters, lengths):
+    """每群挑出內文最長的一篇，回傳保留的索引集合。"""
+    return {max(cluster, key=lambda i: lengths[i]) for cluster in clusters}
@@ -0,0 +1,146 @@
+# 檔名: fakes.py
+# 外部服務的本機替身，用於效能量測與離線驗證，不會連上任何網路服務。
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_REPORT_TEXT = """大家好，以下為12小時內新聞重點摘要
+## 1. **摘要與核心觀點**
+台股在外資回補下震盪走高。
+## 2. **市場概覽**
+加權指數收漲，成交量放大。
+## 3. **焦點板塊與題材**
+半導體與 AI 伺服器族群領漲。
+## 4. **關鍵公司動態**
+台積電、鴻海與聯發科皆有重要消息。
+## 5. **分析與展望**
+短線留意美國通膨數據與外資動向。
+本集內容由 AI 自動生成，資訊來源為 Yahoo 股市及各大財經媒體，不構成任何投資建議，僅供參考，謝謝收聽"""
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeGenerativeModel:
+    """
+    模擬 google.generativeai.GenerativeModel 的 generate_content()。
+    每次呼叫固定延遲 latency_seconds 秒後回傳 respond(prompt) (預設為 response_text)，並記錄呼叫次數與收到的提示長度。
+    設定 tokens_per_second 時，另外依回應長度加上產生時間 (中文約一字一 token)，模擬模型的輸出速度。
+    stream=True 時改為逐塊回傳 (每塊 stream_chunk_chars 個字)，產生時間平均分攤在每一塊之前，
+    模擬模型邊產生邊送出的速度；fail_after_chars 可讓串流在送出這麼多字之後中斷。
+    """
+    def __init__(self, latency_seconds=0.5, response_text=FAKE_REPORT_TEXT, stream_chunk_chars=20, fail_after_chars=None,
+                 tokens_per_second=None):
+        self.latency_seconds = latency_seconds
+        self.tokens_per_second = tokens_per_second
+        self.response_text = response_text
+        self.stream_chunk_chars = stream_chunk_chars
+        self.fail_after_chars = fail_after_chars
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            self.prompts.append(prompt)
+        text = self.respond(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.generation_seconds(text))
+        return FakeResponse(text)
+
+    def respond(self, prompt):
+        """決定要回傳的內容；子類別可依提示種類回傳不同的文字。"""
+        return self.response_text
+
+    def generation_seconds(self, text):
+        if not self.tokens_per_second:
+            return self.latency_seconds
+        return self.latency_seconds + len(text) / self.tokens_per_second
+
+    def _stream(self, text):
+        pieces = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)]
+        delay = self.generation_seconds(text) / max(1, len(pieces))
+        sent = 0
+        for piece in pieces:
+            time.sleep(delay)
+            if self.fail_after_chars is not None and sent >= self.fail_after_chars:
+                raise RuntimeError("模擬的串流中斷")
+            sent += len(piece)
+            yield FakeResponse(piece)
+
+    @property
+    def call_count(self):
+        return len(self.prompts)
+
+class FakeSpeechSynthesizer:
+    """
+    模擬語音合成：synthesize(text) 等待 latency_seconds 秒後回傳假的音訊 bytes。
+    fail_first_calls 可讓前幾次呼叫丟出例外，用來驗證單段重試。
+    """
+    def __init__(self, latency_seconds=0.5, fail_first_calls=0):
+        self.latency_seconds = latency_seconds
+        self.fail_first_calls = fail_first_calls
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+            should_fail = self.calls <= self.fail_first_calls
+        time.sleep(self.latency_seconds)
+        if should_fail:
+            raise RuntimeError("模擬的語音合成錯誤")
+        return b"FAKEAUDIO" + text.encode('utf-8')
+
+class FakeWebDriver:
+    """
+    模擬 Selenium 的 WebDriver：建立時等待 launch_seconds 秒 (模擬啟動 Chrome)，每次 get() 讓 rss_kb 增加 leak_kb_per_page，
+    模擬長時間使用的瀏覽器記憶體逐漸成長；quit() 後 closed 為 True。
+    """
+    def __init__(self, launch_seconds=1.0, baseline_rss_kb=300 * 1024, leak_kb_per_page=0):
+        time.sleep(launch_seconds)
+        self.rss_kb = baseline_rss_kb
+        self.leak_kb_per_page = leak_kb_per_page
+        self.pages = 0
+        self.closed = False
+
+    def get(self, url):
+        if self.closed:
+            raise RuntimeError("瀏覽器已關閉")
+        self.pages += 1
+        self.rss_kb += self.leak_kb_per_page
+
+    def quit(self):
+        self.closed = True
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """本機替身網站的請求處理：依 route(path) 回傳 (content_type, 內文)，內文為 None 時回應 404。不輸出存取紀錄。"""
+    protocol_version = "HTTP/1.1" # 讓 keep-alive 連線可以被重用
+    disable_nagle_algorithm = True # 標頭與內文分兩次送出，不關掉 Nagle 每個請求會多等約 40ms 的 delayed ACK
+
+    def route(self, path):
+        return None, None
+
+    def do_GET(self):
+        content_type, page = self.route(self.path)
+        body = page if isinstance(page, bytes) else (page or "not found").encode('utf-8')
+        self.send_response(200 if page is not None else 404)
+        self.send_header("Content-Type", f"{content_type or 'text/plain'}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(route, port=0):
+    """
+    在背景執行緒啟動本機 HTTP 伺服器，回傳 (server, base_url)；用完以 server.shutdown() 關閉。
+    route(path) 回傳 (content_type, 內文字串或 bytes)，需要模擬延遲時在 route 中自行等待。
+    port=0 代表由系統挑選可用的 port。
+    """
+    handler = type("StubHandler", (StubRequestHandler,), {"route": staticmethod(route)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
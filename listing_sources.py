@@ -0,0 +1,460 @@
+# 檔名: listing_sources.py
+# 新聞列表來源：負責取得「要抓哪些文章」的清單 (標題 + 網址)。
+# 預設先用輕量的 HTTP 來源直接分頁讀取列表，不夠用時才退回 Selenium 無頭瀏覽器滾動。
+# selenium 只在真的需要啟動瀏覽器時才載入，HTTP 來源成功時完全不需要付出它的載入時間。
+# 常駐模式 (daemon.py) 會以 use_warm_browser() 設定一個持續使用的 WarmBrowser，不必每次執行都重新啟動 Chrome。
+
+import time
+from bs4 import BeautifulSoup
+from datetime import timedelta
+import os
+import re
+import threading
+import requests
+
+import metrics
+
+YAHOO_BASE_URL = "https://tw.stock.yahoo.com"
+YAHOO_LISTING_URL = "https://tw.stock.yahoo.com/tw-market"
+# 串流分頁 API 的網址樣板，{offset} 會被替換成已取得的項目數；留空則只讀取列表首頁
+YAHOO_LISTING_PAGE_URL = os.getenv("YAHOO_LISTING_PAGE_URL", "")
+LISTING_ITEM_SELECTOR = '#YDC-Stream-Proxy li'
+TIME_KEYWORDS = ['前', '小時', '分鐘', '昨天']
+MAX_LISTING_PAGES = 30
+MIN_ARTICLE_COUNT = 20 # 列表未涵蓋完整時間窗口時，至少要有這麼多篇才算成功
+SCROLL_WAIT_MAX_SECONDS = float(os.getenv("SCROLL_WAIT_MAX_SECONDS", "10")) # 每次滾動後等待新項目載入的上限
+SCROLL_POLL_INITIAL_SECONDS = 0.25 # 第一次檢查頁面是否長大的間隔，之後依倍數拉長
+SCROLL_POLL_BACKOFF = 1.5
+SCROLL_POLL_MAX_INTERVAL_SECONDS = 2
+INITIAL_LOAD_MAX_SECONDS = 3 # 打開列表頁後，等待第一批項目出現的上限
+SCROLLING_MAX_RETRIES = 3 # 滾動失敗時，最多重試幾次
+RETRY_DELAY_SECONDS = 10
+REQUEST_TIMEOUT_SECONDS = 15
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "20")) # 常駐的瀏覽器使用這麼多次後重新啟動
+BROWSER_MAX_RSS_GROWTH_MB = int(os.getenv("BROWSER_MAX_RSS_GROWTH_MB", "300")) # 瀏覽器的記憶體比剛啟動時多出這麼多就重新啟動
+REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
+
+def parse_yahoo_time(time_str, time_now):
+    """
+    解析 Yahoo 的相對時間字串。
+    此函數現在只在「智慧滾動」時用來做快速、概略的時間判斷。
+    """
+    if '前' in time_str:
+        match = re.search(r'\d+', time_str)
+        if not match:
+            return time_now
+        num = int(match.group(0))
+        if '天' in time_str:
+            return time_now - timedelta(days=num)
+        if '小時' in time_str:
+            return time_now - timedelta(hours=num)
+        if '分鐘' in time_str:
+            return time_now - timedelta(minutes=num)
+    if '昨天' in time_str:
+        return time_now - timedelta(days=1)
+    return None
+
+# 在瀏覽器內執行：只回傳第 start 個之後的列表項目的時間文字，以及目前的項目總數
+TAIL_ITEMS_SCRIPT = """
+var items = document.querySelectorAll(arguments[0]);
+var keywords = arguments[2];
+var times = [];
+for (var i = arguments[1]; i < items.length; i++) {
+    var text = null;
+    var link = items[i].querySelector('h3 a');
+    var div = link ? link.closest('h3').previousElementSibling : null;
+    while (div && div.tagName !== 'DIV') { div = div.previousElementSibling; }
+    if (div) {
+        var spans = div.querySelectorAll('span');
+        for (var j = 0; j < spans.length && text === null; j++) {
+            var candidate = spans[j].textContent.trim();
+            for (var k = 0; k < keywords.length; k++) {
+                if (candidate.indexOf(keywords[k]) !== -1) { text = candidate; break; }
+            }
+        }
+    }
+    times.push(text);
+}
+return {count: items.length, times: times};
+"""
+
+PAGE_STATE_SCRIPT = "return [document.body.scrollHeight, document.querySelectorAll(arguments[0]).length];"
+
+def wait_for_listing_growth(driver, last_height, last_count, max_wait=SCROLL_WAIT_MAX_SECONDS):
+    """
+    取代固定的 time.sleep：輪詢頁面高度與項目數，一有變化就立即返回。
+    輪詢間隔從 SCROLL_POLL_INITIAL_SECONDS 開始依 SCROLL_POLL_BACKOFF 拉長，最多等 max_wait 秒。
+    回傳 (目前高度, 目前項目數, 等待秒數)。
+    """
+    started = time.monotonic()
+    interval = SCROLL_POLL_INITIAL_SECONDS
+    while True:
+        height, count = driver.execute_script(PAGE_STATE_SCRIPT, LISTING_ITEM_SELECTOR)
+        elapsed = time.monotonic() - started
+        if height != last_height or count != last_count or elapsed >= max_wait:
+            return height, count, elapsed
+        time.sleep(min(interval, max_wait - elapsed))
+        interval = min(interval * SCROLL_POLL_BACKOFF, SCROLL_POLL_MAX_INTERVAL_SECONDS)
+
+def summarize_latencies(latencies):
+    """整理每次滾動的等待時間統計，方便調整 SCROLL_WAIT_MAX_SECONDS 等參數。"""
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max": ordered[-1],
+        "total": sum(ordered)
+    }
+
+def _absolute_url(url, base_url=YAHOO_BASE_URL):
+    if not url.startswith('http'):
+        url = base_url + url
+    return url
+
+def extract_listing_items(soup, base_url=YAHOO_BASE_URL):
+    """
+    從列表頁 HTML 中取出所有新聞項目。
+    回傳 [{"headline", "url", "time_text"}, ...]，time_text 可能為 None。
+    """
+    items = []
+    for item in soup.select(LISTING_ITEM_SELECTOR):
+        headline_tag = item.select_one('h3 a')
+        if not headline_tag or not headline_tag.get('href'):
+            continue
+        time_text = None
+        time_div = headline_tag.find_parent('h3').find_previous_sibling('div')
+        if time_div:
+            for span in time_div.find_all('span'):
+                text = span.text.strip()
+                if any(kw in text for kw in TIME_KEYWORDS):
+                    time_text = text
+                    break
+        items.append({
+            "headline": headline_tag.text.strip(),
+            "url": _absolute_url(headline_tag.get('href'), base_url),
+            "time_text": time_text
+        })
+    return items
+
+def listing_covers_window(items, now_utc, time_window):
+    """
+    判斷列表是否足夠：最舊的新聞已超出時間窗口即為成功；
+    否則文章數少於 MIN_ARTICLE_COUNT 且時間跨度小於窗口的一半，才視為失敗。
+    """
+    times = [parse_yahoo_time(item['time_text'], now_utc) for item in items if item.get('time_text')]
+    times = [t for t in times if t]
+    if not times:
+        return False
+    return times_cover_window(len(items), max(times), min(times), now_utc, time_window)
+
+def listing_reaches_window(items, now_utc, time_window):
+    """列表中最舊的新聞是否已早於時間窗口的起點 (代表整個窗口都在列表中)。"""
+    times = [parse_yahoo_time(item['time_text'], now_utc) for item in items if item.get('time_text')]
+    times = [t for t in times if t]
+    return bool(times) and min(times) < time_window
+
+def times_cover_window(item_count, newest_time, oldest_time, now_utc, time_window):
+    """listing_covers_window 的核心判斷，只需要項目數與最新、最舊時間。"""
+    if not newest_time or not oldest_time:
+        return False
+    if oldest_time < time_window:
+        return True
+    window_hours = (now_utc - time_window).total_seconds() / 3600
+    time_span_hours = (newest_time - oldest_time).total_seconds() // 3600
+    return not (item_count < MIN_ARTICLE_COUNT and time_span_hours < (window_hours // 2))
+
+def _items_from_json(payload, base_url):
+    """解析分頁 API 回傳的 JSON，接受項目陣列或 {"items": [...]} 兩種格式。"""
+    if isinstance(payload, dict):
+        payload = payload.get('items') or payload.get('data') or []
+    items = []
+    for entry in payload:
+        url = entry.get('url') or entry.get('link')
+        headline = entry.get('title') or entry.get('headline')
+        if not url or not headline:
+            continue
+        items.append({
+            "headline": headline.strip(),
+            "url": _absolute_url(url, base_url),
+            "time_text": entry.get('time_text') or entry.get('pubtime_text')
+        })
+    return items
+
+class ListingSource:
+    """列表來源的共同介面：fetch() 回傳 [{"headline", "url"}, ...]，失敗時回傳 None。"""
+    name = "base"
+
+    def fetch(self, now_utc, time_window):
+        raise NotImplementedError
+
+class HttpListingSource(ListingSource):
+    """
+    以純 HTTP 讀取列表：先解析列表首頁已伺服器端渲染的項目，
+    若有設定分頁 API 樣板，再依 offset 逐頁讀取 (JSON 或 HTML 片段皆可)，直到涵蓋時間窗口。
+    """
+    name = "http"
+
+    def __init__(self, listing_url=YAHOO_LISTING_URL, page_url_template=YAHOO_LISTING_PAGE_URL,
+                 base_url=YAHOO_BASE_URL, session=None, max_pages=MAX_LISTING_PAGES):
+        self.listing_url = listing_url
+        self.page_url_template = page_url_template
+        self.base_url = base_url
+        self.session = session
+        self.max_pages = max_pages
+
+    def _get(self, session, url):
+        with metrics.span("listing.page_seconds"):
+            response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        metrics.incr("listing.pages")
+        metrics.incr("listing.bytes", len(response.content))
+        return response
+
+    def _parse_page(self, response):
+        if 'json' in response.headers.get('Content-Type', ''):
+            return _items_from_json(response.json(), self.base_url)
+        return extract_listing_items(BeautifulSoup(response.text, 'html.parser'), self.base_url)
+
+    def fetch(self, now_utc, time_window):
+        session = self.session or requests.Session()
+        session.headers.update(REQUEST_HEADERS)
+        try:
+            items = self._parse_page(self._get(session, self.listing_url))
+            seen_urls = {item['url'] for item in items}
+            page = 1
+            exhausted = False # 分頁 API 已經沒有更多項目 (列表真的到底了)
+            while self.page_url_template and page < self.max_pages:
+                oldest = parse_yahoo_time(items[-1]['time_text'], now_utc) if items and items[-1].get('time_text') else None
+                if oldest and oldest < time_window:
+                    break
+                page_items = self._parse_page(self._get(session, self.page_url_template.format(offset=len(items))))
+                page_items = [item for item in page_items if item['url'] not in seen_urls]
+                if not page_items:
+                    exhausted = True
+                    break
+                items.extend(page_items)
+                seen_urls.update(item['url'] for item in page_items)
+                page += 1
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"HTTP 列表讀取失敗: {e}")
+            return None
+        finally:
+            if self.session is None:
+                session.close()
+
+        # 篇數與時間跨度的寬鬆判斷只適用於列表已經到底的情況；只讀了首頁 (沒有分頁樣板) 或讀滿頁數上限時，
+        # 最舊的新聞必須已超出時間窗口，否則交給備援來源，不能把只涵蓋部分窗口的首頁當成完整列表
+        covered = listing_covers_window(items, now_utc, time_window) if exhausted else listing_reaches_window(items, now_utc, time_window)
+        if not covered:
+            print(f"HTTP 列表只取得 {len(items)} 篇 ({page} 頁)，未涵蓋時間窗口。")
+            return None
+        print(f"HTTP 列表讀取完成，共 {len(items)} 篇 ({page} 頁)。")
+        return items
+
+def create_chrome_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    chrome_options = Options()
+    # "--headless=new" 是 Selenium 4 之後啟動無頭模式的標準寫法
+    chrome_options.add_argument("--headless=new")
+    # 以下參數是為了在 Docker/Linux 環境中增加穩定性，避免權限問題
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu") # 在無頭環境下，通常建議關閉 GPU 加速
+    return webdriver.Chrome(options=chrome_options)
+
+def process_tree_rss_kb(pid):
+    """回傳 pid 及其所有子行程目前的 RSS 總和 (KB)，讀不到 /proc (非 Linux) 時回傳 None。"""
+    total, pending, found = 0, [pid], False
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+            found = True
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue # 行程可能剛好結束
+    return total if found else None
+
+def _driver_rss_kb(driver):
+    """chromedriver 與其底下所有 Chrome 行程的 RSS 總和。"""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return process_tree_rss_kb(process.pid) if process is not None else None
+
+class WarmBrowser:
+    """
+    常駐模式下重複使用的無頭 Chrome：第一次 acquire() 時啟動，之後沿用同一個瀏覽器。
+    使用滿 max_uses 次、記憶體比剛啟動時多出 max_rss_growth_mb，或使用時發生錯誤，就在 release() 時關閉，下次再重開。
+    同一時間只借給一個使用者。factory 與 rss_probe 可替換，方便以假的瀏覽器驗證。
+    """
+    def __init__(self, factory=None, max_uses=BROWSER_MAX_USES, max_rss_growth_mb=BROWSER_MAX_RSS_GROWTH_MB, rss_probe=_driver_rss_kb):
+        self.factory = factory or create_chrome_driver
+        self.max_uses = max_uses
+        self.max_rss_growth_kb = max_rss_growth_mb * 1024
+        self.rss_probe = rss_probe
+        self.driver = None
+        self.uses = 0
+        self.launches = 0
+        self.baseline_rss_kb = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        self._lock.acquire()
+        try:
+            if self.driver is None:
+                self.driver = self.factory()
+                self.launches += 1
+                self.uses = 0
+                self.baseline_rss_kb = self.rss_probe(self.driver)
+            self.uses += 1
+            return self.driver
+        except Exception:
+            self._lock.release()
+            raise
+
+    def release(self, healthy=True):
+        try:
+            reason = None
+            if not healthy:
+                reason = "使用時發生錯誤"
+            elif self.uses >= self.max_uses:
+                reason = f"已使用 {self.uses} 次"
+            else:
+                rss_kb = self.rss_probe(self.driver)
+                if rss_kb and self.baseline_rss_kb and rss_kb - self.baseline_rss_kb > self.max_rss_growth_kb:
+                    reason = f"記憶體從 {self.baseline_rss_kb // 1024} MB 成長到 {rss_kb // 1024} MB"
+            if reason:
+                print(f"關閉常駐的瀏覽器 ({reason})，下次使用時重新啟動。")
+                self._quit()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            self._quit()
+
+    def _quit(self):
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"關閉瀏覽器時發生錯誤: {e}")
+        self.driver = None
+
+_warm_browser = None
+
+def use_warm_browser(browser):
+    """設定之後所有 Selenium 列表來源共用的 WarmBrowser (傳入 None 則恢復每次啟動、用完即關)。"""
+    global _warm_browser
+    _warm_browser = browser
+
+class SeleniumListingSource(ListingSource):
+    """以無頭 Chrome 進行「智慧滾動」，直到列表涵蓋時間窗口或到達頁面底部。"""
+    name = "selenium"
+
+    def __init__(self, listing_url=YAHOO_LISTING_URL, base_url=YAHOO_BASE_URL, scroll_wait_max=SCROLL_WAIT_MAX_SECONDS, browser=None):
+        self.listing_url = listing_url
+        self.base_url = base_url
+        self.scroll_wait_max = scroll_wait_max
+        self.browser = browser # WarmBrowser；未指定時使用 use_warm_browser() 設定的，兩者皆無則每次啟動新的 Chrome
+        self.scroll_latencies = [] # 每次滾動後等到新項目出現所花的秒數
+
+    def _scroll(self, driver, now_utc, time_window):
+        """滾動到足夠的深度，成功時回傳最終的 HTML 原始碼，失敗時回傳 None。"""
+        driver.get(self.listing_url)
+        last_height, last_count = driver.execute_script(PAGE_STATE_SCRIPT, LISTING_ITEM_SELECTOR)
+        if last_count == 0:
+            last_height, last_count, _ = wait_for_listing_growth(driver, last_height, 0, max_wait=INITIAL_LOAD_MAX_SECONDS)
+
+        print("開始智慧滾動...")
+        seen_count, newest_time, oldest_time = 0, None, None
+        while True:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            new_height, last_count, waited = wait_for_listing_growth(driver, last_height, last_count, max_wait=self.scroll_wait_max)
+            self.scroll_latencies.append(waited)
+            metrics.observe("listing.scroll_wait_seconds", waited)
+
+            # 只取回上次之後新增的項目時間文字，掃描成本不會隨頁面變長而增加
+            scan = driver.execute_script(TAIL_ITEMS_SCRIPT, LISTING_ITEM_SELECTOR, seen_count, TIME_KEYWORDS)
+            tail_times = [parse_yahoo_time(text, now_utc) if text else None for text in scan['times']]
+            tail_times = [t for t in tail_times if t]
+            if tail_times:
+                if newest_time is None:
+                    newest_time = tail_times[0]
+                oldest_time = tail_times[-1]
+            seen_count = scan['count']
+
+            if oldest_time and oldest_time < time_window:
+                print("偵測到最舊新聞已超出時間範圍，停止滾動。")
+                return driver.page_source
+
+            if new_height == last_height:
+                print("已達頁面底部，進行最終條件檢查...")
+                if times_cover_window(seen_count, newest_time, oldest_time, now_utc, time_window):
+                    print(f"滾動成功：雖未涵蓋完整時間窗口，但文章數({seen_count})及時間跨度滿足最低要求，視為正常。")
+                    return driver.page_source
+                print(f"滾動失敗：已達頁面底部，但條件不滿足 (文章數: {seen_count}/{MIN_ARTICLE_COUNT})。")
+                return None
+            last_height = new_height
+
+    def fetch(self, now_utc, time_window):
+        page_source = None
+        for attempt in range(SCROLLING_MAX_RETRIES):
+            print(f"\n--- 開始第 {attempt + 1}/{SCROLLING_MAX_RETRIES} 次滾動嘗試 ---")
+            browser = self.browser or _warm_browser
+            try:
+                driver = browser.acquire() if browser else create_chrome_driver()
+            except Exception as e:
+                print(f"啟動 Selenium 失敗: {e}")
+                return None
+
+            healthy = True
+            try:
+                page_source = self._scroll(driver, now_utc, time_window)
+                if page_source:
+                    print("\n滾動完畢，擷取最終 HTML 原始碼！")
+                    break # 成功，跳出重試迴圈
+            except Exception as e:
+                healthy = False
+                print(f"滾動時發生嚴重錯誤: {e}")
+            finally:
+                if browser:
+                    browser.release(healthy)
+                else:
+                    driver.quit()
+                stats = summarize_latencies(self.scroll_latencies)
+                if stats["count"]:
+                    print(f"滾動等待統計 (累計): {stats['count']} 次, 平均 {stats['mean']:.2f}s, p50 {stats['p50']:.2f}s, p90 {stats['p90']:.2f}s, 最長 {stats['max']:.2f}s")
+
+            if attempt < SCROLLING_MAX_RETRIES - 1:
+                print(f"將在 {RETRY_DELAY_SECONDS} 秒後重試滾動...")
+                time.sleep(RETRY_DELAY_SECONDS)
+
+        if not page_source:
+            return None
+        return extract_listing_items(BeautifulSoup(page_source, 'html.parser'), self.base_url)
+
+def default_listing_sources():
+    """預設的來源順序：先試輕量的 HTTP，失敗或不足時退回 Selenium。"""
+    return [HttpListingSource(), SeleniumListingSource()]
+
+def fetch_listing(now_utc, time_window, sources=None):
+    """依序嘗試每個列表來源，回傳第一個成功的結果；全部失敗時回傳 None。"""
+    for source in sources or default_listing_sources():
+        print(f"嘗試列表來源: {source.name}")
+        with metrics.span(f"listing.{source.name}_seconds"):
+            items = source.fetch(now_utc, time_window)
+        if items:
+            metrics.incr("listing.items", len(items))
+            return items
+        metrics.incr(f"listing.{source.name}_failures")
+        print(f"列表來源 {source.name} 失敗，改用下一個來源。")
+    return None
@@ -0,0 +1,237 @@
+# 檔名: metrics.py
+# 輕量的執行指標：計時區段 (span)、計數器 (counter) 與分佈 (histogram)，全部只用標準函式庫、可跨執行緒使用。
+# 每次執行結束時寫出一份 JSON 執行報告 (METRICS_DIR/run_<run_id>.json)，方便比較不同次執行哪個階段變慢；
+# 設定 PROMETHEUS_TEXTFILE 時另外寫出 Prometheus textfile (給 node_exporter 的 textfile collector 讀取)。
+# 用法: python metrics.py [報告A.json 報告B.json]  (未指定時比較最近兩次的報告)
+
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", "") # 留空則不輸出
+PROMETHEUS_PREFIX = "ai_news_"
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_SAMPLES = 5000 # 每個 histogram 保留的觀測值上限 (用來計算百分位數)
+MAX_SPANS = 2000 # 報告中保留的 span 明細上限，超過的只計入 histogram
+
+class Histogram:
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.samples = []
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def percentile(fraction):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": percentile(0.5),
+            "p90": percentile(0.9),
+            "p99": percentile(0.99),
+        }
+
+class MetricsRegistry:
+    """一次執行的所有指標。span 的耗時會同時記入同名的 histogram (單位: 秒)。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, run_id=None):
+        with self._lock:
+            self.run_id = run_id or new_run_id()
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.perf_counter()
+            self.counters = {}
+            self.histograms = {}
+            self.spans = []
+            self.dropped_spans = 0
+            self.stages = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, stage=False):
+        """計時一段程式；stage=True 代表這是管線的一個階段，會出現在報告的 stages 中。"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(name, elapsed)
+            with self._lock:
+                if stage:
+                    self.stages[name] = self.stages.get(name, 0) + elapsed
+                if len(self.spans) < MAX_SPANS:
+                    self.spans.append({
+                        "name": name,
+                        "start": round(started - self._started, 6),
+                        "duration": round(elapsed, 6),
+                        "thread": threading.current_thread().name
+                    })
+                else:
+                    self.dropped_spans += 1
+
+    def report(self, pipeline, status):
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "pipeline": pipeline,
+                "status": status,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "duration_seconds": time.perf_counter() - self._started,
+                "stages": dict(self.stages),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()},
+                "spans": list(self.spans),
+                "dropped_spans": self.dropped_spans,
+            }
+
+_run_sequence = itertools.count(1)
+
+def new_run_id():
+    """時間 + pid；同一個行程 (常駐模式) 的第二次以後加上序號，同一秒內的多次執行也不會互相覆蓋。"""
+    sequence = next(_run_sequence)
+    suffix = f"-{sequence}" if sequence > 1 else ""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{os.getpid()}{suffix}"
+
+_registry = MetricsRegistry()
+
+def registry():
+    return _registry
+
+def incr(name, amount=1):
+    _registry.incr(name, amount)
+
+def observe(name, value):
+    _registry.observe(name, value)
+
+def span(name, stage=False):
+    return _registry.span(name, stage=stage)
+
+def reset(run_id=None):
+    _registry.reset(run_id)
+
+def run_id():
+    return _registry.run_id
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+def format_prometheus(report):
+    """把執行報告轉成 Prometheus 文字格式。"""
+    lines = []
+    success = 1 if report["status"] == "success" else 0
+    lines += [f"# TYPE {PROMETHEUS_PREFIX}last_run_success gauge", f"{PROMETHEUS_PREFIX}last_run_success{{pipeline=\"{report['pipeline']}\"}} {success}"]
+    lines += [f"# TYPE {PROMETHEUS_PREFIX}last_run_duration_seconds gauge",
+              f"{PROMETHEUS_PREFIX}last_run_duration_seconds{{pipeline=\"{report['pipeline']}\"}} {report['duration_seconds']:.6f}"]
+    lines += [f"# TYPE {PROMETHEUS_PREFIX}last_run_timestamp_seconds gauge", f"{PROMETHEUS_PREFIX}last_run_timestamp_seconds {time.time():.0f}"]
+    if report["stages"]:
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}stage_duration_seconds gauge")
+        for stage, seconds in report["stages"].items():
+            lines.append(f"{PROMETHEUS_PREFIX}stage_duration_seconds{{stage=\"{stage}\"}} {seconds:.6f}")
+    for name, value in sorted(report["counters"].items()):
+        metric = _prometheus_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, histogram in sorted(_registry.histograms.items()):
+        metric = _prometheus_name(name)
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+            cumulative += count
+            lines.append(f"{metric}_bucket{{le=\"{bound}\"}} {cumulative}")
+        lines.append(f"{metric}_bucket{{le=\"+Inf\"}} {histogram.count}")
+        lines.append(f"{metric}_sum {histogram.sum:.6f}")
+        lines.append(f"{metric}_count {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def _write_atomically(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+def write_run_report(pipeline, status, metrics_dir=METRICS_DIR, prometheus_textfile=PROMETHEUS_TEXTFILE):
+    """寫出本次執行的 JSON 報告 (與 Prometheus textfile)，回傳報告路徑；寫入失敗只會印出警告。"""
+    report = _registry.report(pipeline, status)
+    path = os.path.join(metrics_dir, f"run_{report['run_id']}.json")
+    try:
+        _write_atomically(path, json.dumps(report, ensure_ascii=False, indent=2))
+        if prometheus_textfile:
+            _write_atomically(prometheus_textfile, format_prometheus(report))
+    except OSError as e:
+        print(f"[警告] 執行報告寫入失敗: {e}")
+        return None
+    print(f"執行報告已寫入 {path} (總耗時 {report['duration_seconds']:.1f} 秒)")
+    return path
+
+def compare_reports(old, new):
+    """列出兩份報告各階段與主要 histogram 的耗時變化。"""
+    print(f"{'項目':<36}{'舊(秒)':>10}{'新(秒)':>10}{'變化':>9}")
+    rows = [(f"stage {name}", old["stages"].get(name), new["stages"].get(name)) for name in {**old["stages"], **new["stages"]}]
+    rows += [(name, (old["histograms"].get(name) or {}).get("sum"), (new["histograms"].get(name) or {}).get("sum"))
+             for name in sorted({**old["histograms"], **new["histograms"]}) if name not in old["stages"] and name not in new["stages"]]
+    rows.append(("total", old["duration_seconds"], new["duration_seconds"]))
+    for name, before, after in rows:
+        change = f"{(after - before) / before * 100:+.0f}%" if before and after is not None else "-"
+        print(f"{name:<36}{before if before is not None else float('nan'):>10.3f}{after if after is not None else float('nan'):>10.3f}{change:>9}")
+
+def main():
+    paths = sys.argv[1:3]
+    if len(paths) < 2:
+        paths = sorted(glob.glob(os.path.join(METRICS_DIR, "run_*.json")), key=os.path.getmtime)[-2:]
+    if len(paths) < 2:
+        print(f"需要兩份執行報告才能比較 ({METRICS_DIR} 中只有 {len(paths)} 份)。")
+        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+    reports = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    print(f"比較 {reports[0]['run_id']} ({reports[0]['status']}) → {reports[1]['run_id']} ({reports[1]['status']})")
+    compare_reports(*reports)
+
+if __name__ == "__main__":
+    main()
@@ -1,238 +1,225 @@
 # 導入我們自己的 database 模組
 import database
 
+import metrics
+import news_sources
+from listing_sources import parse_yahoo_time # noqa: F401 (保留舊的匯入路徑)
+
 # 導入其他必要的函式庫
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 import time
-from bs4 import BeautifulSoup
+import hashlib
 from datetime import datetime, timedelta, timezone
-import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import sys # 導入 sys 模組來終止程式
 
 # --- [全域常數] ---
 HOURS_TO_FETCH = 12
-SCROLLING_MAX_RETRIES = 3 # 滾動失敗時，最多重試幾次
-RETRY_DELAY_SECONDS = 10
+INCREMENTAL_CRAWL = True # True: 保留歷史資料，只抓取資料庫中沒有的新文章；False: 每次清空資料庫重抓
+RETENTION_DAYS = 7 # 增量模式下，文章依 publish_datetime 保留的天數
+REQUEST_TIMEOUT_SECONDS = 15
+MAX_FETCH_WORKERS = 8 # 同時抓取文章內文的執行緒數量
+PER_HOST_MAX_CONNECTIONS = 4 # 對同一個網站最多同時開幾條連線
+PER_HOST_MIN_INTERVAL_SECONDS = 0.2 # 對同一個網站連續發出請求的最小間隔 (禮貌限速)
+REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
 
 # --- [函數定義區] ---
 
-def parse_yahoo_time(time_str, time_now):
+class HostRateLimiter:
+    """
+    以網站 (host) 為單位的禮貌限速器。
+    同一個 host 的兩次請求之間至少間隔 min_interval 秒，不同 host 之間互不影響。
     """
-    解析 Yahoo 的相對時間字串。
-    此函數現在只在「智慧滾動」時用來做快速、概略的時間判斷。
+    def __init__(self, min_interval=PER_HOST_MIN_INTERVAL_SECONDS):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_allowed = {}
+
+    def wait(self, url):
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = scheduled + self.min_interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+def create_http_session(max_connections_per_host=PER_HOST_MAX_CONNECTIONS):
     """
-    if '前' in time_str:
-        match = re.search(r'\d+', time_str)
-        if not match:
-            return time_now
-        num = int(match.group(0))
-        if '天' in time_str:
-            return time_now - timedelta(days=num)
-        if '小時' in time_str:
-            return time_now - timedelta(hours=num)
-        if '分鐘' in time_str:
-            return time_now - timedelta(minutes=num)
-    if '昨天' in time_str:
-        return time_now - timedelta(days=1)
-    return None
-
-def scrape_article_details(url):
+    建立共用的 keep-alive HTTP session。
+    pool_block=True 會讓超過連線上限的執行緒排隊等待，而不是另開新連線。
+    """
+    session = requests.Session()
+    session.headers.update(REQUEST_HEADERS)
+    adapter = HTTPAdapter(pool_connections=max_connections_per_host, pool_maxsize=max_connections_per_host, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def scrape_article_details(url, session=None, source=None):
     """
     抓取精確時間和內文。如果失敗，則直接返回 None, None 來觸發主程式的錯誤處理。
+    傳入 session 時會重用它的連線池，否則每次都開新連線。
+    source 決定如何從頁面擷取時間與內文，未指定時使用 Yahoo 股市的格式。
     """
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        publish_time = None
-        content = ""
-
-        # 抓取精確時間 (通常在 <time> 標籤的 datetime 屬性中)
-        time_tag = soup.select_one('time[datetime]')
-        if time_tag:
-            iso_timestamp = time_tag['datetime']
-            # fromisoformat 會直接把標準 ISO 格式轉成有時區的 datetime 物件
-            # Z 代表 UTC+0，我們把它轉成 +00:00 讓 Python 能解析
-            publish_time = datetime.fromisoformat(iso_timestamp.replace('Z', '+00:00'))
-
-        # 抓取內文
-        article_body = soup.select_one('article')
-        if article_body:
-            paragraphs = [p.text for p in article_body.find_all('p')]
-            content = "\n".join(paragraphs)
+        with metrics.span("fetch.request_seconds"):
+            if session is not None:
+                response = session.get(url, timeout=REQUEST_TIMEOUT_SECONDS)
+            else:
+                response = requests.get(url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        metrics.incr("fetch.bytes", len(response.content))
+        with metrics.span("fetch.extract_seconds"):
+            publish_time, content = (source or _default_source()).extract_article(response.text)
 
         # 只要有一項沒抓到，就視為失敗
         if not publish_time or not content:
             print(f"  [FATAL] 內容或時間抓取不完整: {url}")
+            metrics.incr("fetch.failures")
             return None, None
-            
+
+        metrics.incr("fetch.articles")
         return publish_time, content
 
     except requests.exceptions.RequestException as e:
         print(f"  [錯誤] 抓取頁面失敗: {url}, 原因: {e}")
+        metrics.incr("fetch.failures")
         return None, None
 
-def main():
-    # 確保資料庫結構存在並清空舊資料
+_yahoo_source = None
+
+def _default_source():
+    global _yahoo_source
+    if _yahoo_source is None:
+        _yahoo_source = news_sources.SOURCE_FACTORIES[news_sources.DEFAULT_SOURCES]()
+    return _yahoo_source
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """整個行程共用的 HTTP session，常駐模式下連線池與 keep-alive 連線可以跨次執行沿用。"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        return _http_session
+
+def close_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+def fetch_articles_concurrently(urls, session=None, max_workers=MAX_FETCH_WORKERS, rate_limiter=None, sources=None):
+    """
+    以有上限的執行緒池並行抓取多篇文章的時間與內文。
+    sources 與 urls 一一對應，指定每篇文章要用哪個來源的擷取規則 (未指定時全部使用 Yahoo 股市的格式)。
+    回傳 [(publish_time, content), ...]，順序與傳入的 urls 完全一致。
+    """
+    owns_session = session is None
+    if owns_session:
+        session = create_http_session()
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter()
+
+    urls = list(urls)
+    if sources is None:
+        sources = [None] * len(urls)
+
+    def fetch_one(url, source):
+        rate_limiter.wait(url)
+        return scrape_article_details(url, session=session, source=source)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map 會依照輸入順序回傳結果
+            return list(executor.map(fetch_one, urls, sources))
+    finally:
+        if owns_session:
+            session.close()
+
+def article_set_hash(articles):
+    """以網址集合計算的雜湊，用來在執行紀錄中辨識這次抓到的是哪一批文章。"""
+    return hashlib.sha256("\n".join(sorted(article['url'] for article in articles)).encode('utf-8')).hexdigest()
+
+def crawl(run_id=None):
+    """
+    執行一次抓取，回傳本次新寫入知識庫的文章列表 (沒有新文章時為空列表)，失敗時回傳 None。
+    回傳的文章含有內文，給同一個行程中的分析階段直接使用，不必再從資料庫讀一次。
+    有 run_id 時，成功後把文章集合的雜湊記入執行紀錄 (run_manifest)。
+    """
+    articles = _crawl()
+    if run_id and articles is not None:
+        database.set_stage_status(run_id, "news_hunter", "complete", {"article_set_hash": article_set_hash(articles), "article_count": len(articles)})
+    return articles
+
+def _crawl():
+    # 確保資料庫結構存在；增量模式只清除過期文章，否則清空舊資料
     database.setup_database()
-    database.clear_all_data()
+    if INCREMENTAL_CRAWL:
+        database.prune_articles(RETENTION_DAYS)
+        database.prune_digests(RETENTION_DAYS)
+        database.prune_runs(RETENTION_DAYS)
+    else:
+        database.clear_all_data()
 
     # 在程式一開始，就定義一個統一的、帶有時區的「現在時間」基準點
     now_utc = datetime.now(timezone.utc)
     print(f"目前統一時間基準 (UTC): {now_utc.strftime('%Y-%m-%d %H:%M:%S')}")
 
-    page_source = None
-
     print(f"啟動情報員，目標鎖定過去 {HOURS_TO_FETCH} 小時的新聞...")
+    time_window = now_utc - timedelta(hours=HOURS_TO_FETCH)
 
-    for attempt in range(SCROLLING_MAX_RETRIES):
-        print(f"\n--- 開始第 {attempt + 1}/{SCROLLING_MAX_RETRIES} 次滾動嘗試 ---")
-        driver = None
-        scrolling_successful = False
-        try:
-            # --- [啟動無頭模式] ---
-            chrome_options = Options()
-            # "--headless=new" 是 Selenium 4 之後啟動無頭模式的標準寫法
-            chrome_options.add_argument("--headless=new")
-            # 以下參數是為了在 Docker/Linux 環境中增加穩定性，避免權限問題
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu") # 在無頭環境下，通常建議關閉 GPU 加速
-            
-            # 將設定好的 options 傳給 Chrome
-            driver = webdriver.Chrome(options=chrome_options)
-        except Exception as e:
-            print(f"啟動 Selenium 失敗: {e}")
-            sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-            return
+    # 同時向所有設定的新聞來源讀取列表，合併並以網址去重
+    try:
+        sources = news_sources.create_sources()
+    except ValueError as e:
+        print(f"\n[FATAL ERROR] 新聞來源設定錯誤: {e}")
+        return None
+    print(f"新聞來源: {', '.join(source.name for source in sources)}")
+    with metrics.span("crawl.listing_seconds"):
+        listing_items = news_sources.list_all_sources(sources, now_utc, time_window)
+    if not listing_items:
+        print("\n[FATAL ERROR] 所有列表來源均失敗，無法獲取新聞列表。程式終止。")
+        return None
 
-        try:
-            url = 'https://tw.stock.yahoo.com/tw-market'
-            driver.get(url)
-            time.sleep(3)
-
-            # 智慧滾動邏輯 (現在也使用 UTC 基準)
-            print("開始智慧滾動...")
-            # 滾動用的時間窗口，也從 now_utc 計算
-            time_window = now_utc - timedelta(hours=HOURS_TO_FETCH)
-            last_height = driver.execute_script("return document.body.scrollHeight")
-            while True:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(10)
-                new_height = driver.execute_script("return document.body.scrollHeight")
-                
-                temp_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                news_items = temp_soup.select('#YDC-Stream-Proxy li')
-                last_news_time = None
-                for item in reversed(news_items):
-                    h3_tag = item.select_one('h3 a')
-                    if h3_tag:
-                        time_div = h3_tag.find_parent('h3').find_previous_sibling('div')
-                        if time_div:
-                            for span in time_div.find_all('span'):
-                                text = span.text.strip()
-                                if any(kw in text for kw in ['前', '小時', '分鐘', '昨天']):
-                                    # 將 UTC 基準時間傳給 parse_yahoo_time
-                                    # parse_yahoo_time 回傳的時間也會是 UTC aware
-                                    last_news_time = parse_yahoo_time(text, now_utc)
-                                    break
-                        if last_news_time:
-                            break
-                
-                if last_news_time and last_news_time < time_window:
-                    print(f"偵測到最舊新聞已超出 {HOURS_TO_FETCH} 小時範圍，停止滾動。")
-                    scrolling_successful = True
-                    break
-                
-                if new_height == last_height:
-                    print("已達頁面底部，進行最終條件檢查...")
-
-                    # 取得當前頁面上所有新聞的列表
-                    final_news_items = temp_soup.select('#YDC-Stream-Proxy li')
-                    article_count = len(final_news_items)
-
-                    # 取得最舊與最新的新聞時間
-                    oldest_time = last_news_time # last_news_time 是我們在迴圈中持續更新的最舊時間
-                    newest_time = None
-                    
-                    # 從頭部開始尋找，找到的第一個就是最新的時間
-                    for item in final_news_items:
-                        h3_tag = item.select_one('h3 a')
-                        if h3_tag:
-                            time_div = h3_tag.find_parent('h3').find_previous_sibling('div')
-                            if time_div:
-                                for span in time_div.find_all('span'):
-                                    text = span.text.strip()
-                                    if any(kw in text for kw in ['前', '小時', '分鐘', '昨天']):
-                                        newest_time = parse_yahoo_time(text, now_utc)
-                                        break # 找到第一個就跳出
-                            if newest_time: break
-                    
-                    # 計算時間跨度 (小時)
-                    time_span_hours = 0
-                    if newest_time and oldest_time:
-                        time_span_hours = (newest_time - oldest_time).total_seconds() // 3600
-
-                    # 應用你的新條件來判斷是否真的失敗
-                    # 如果文章數少於20篇 且 時間跨度小於(HOURS_TO_FETCH / 2)小時，才視為滾動失敗
-                    if article_count < 20 and time_span_hours < (HOURS_TO_FETCH // 2):
-                        print(f"滾動失敗：已達頁面底部，但條件不滿足 (文章數: {article_count}/20, 時間跨度: {time_span_hours:.2f}/{HOURS_TO_FETCH // 2} 小時)。")
-                        # scrolling_successful 保持為 False
-                    else:
-                        print(f"滾動成功：雖未達12小時，但文章數({article_count})及時間跨度({time_span_hours:.2f}小時)滿足最低要求，視為正常。")
-                        scrolling_successful = True # 滿足條件，視為成功
-                    
-                    break # 無論判斷結果如何，都結束滾
-                last_height = new_height
-            
-            if scrolling_successful:
-                print("\n滾動完畢，擷取最終 HTML 原始碼！")
-                page_source = driver.page_source
-                break # 成功，跳出重試迴圈
-        except Exception as e:
-            print(f"滾動時發生嚴重錯誤: {e}")
-        finally:
-            if driver:
-                driver.quit()
-        
-        if attempt < SCROLLING_MAX_RETRIES - 1:
-            print(f"將在 {RETRY_DELAY_SECONDS} 秒後重試滾動...")
-            time.sleep(RETRY_DELAY_SECONDS)
+    print("\n開始分析與抓取詳細內容...")
+    news_to_process = [{"headline": item['headline'], "url": item['url'], "source": item['source']} for item in listing_items]
 
-    if not page_source:
-        print("\n[FATAL ERROR] 所有滾動嘗試均失敗，無法獲取頁面內容。程式終止。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+    print(f"\n列表分析完成，共 {len(news_to_process)} 個目標。")
 
-    print("\n開始分析與抓取詳細內容...")
-    # 3. 處理資料：使用統一的 UTC 時間基準進行精準過濾
-    soup = BeautifulSoup(page_source, 'html.parser')
-    news_to_process = []
-    for item in soup.select('#YDC-Stream-Proxy li'):
-        headline_tag = item.select_one('h3 a')
-        if headline_tag and headline_tag.get('href'):
-            url = headline_tag.get('href')
-            if not url.startswith('http'):
-                url = "https://tw.stock.yahoo.com" + url
-            news_to_process.append({
-                "headline": headline_tag.text.strip(),
-                "url": url
-            })
-
-    print(f"\n列表分析完成，共 {len(news_to_process)} 個目標。開始逐一潛入進行精準時間過濾...")
-    
-    # 精準過濾的時間窗口，也從同一個 time_window 計算
-    new_articles_count = 0
-    
-    for news in news_to_process:
-        publish_time, content = scrape_article_details(news['url'])
+    skipped_count = 0
+    if INCREMENTAL_CRAWL:
+        # 一次查詢就找出已經抓過的網址，這些文章不需要再下載
+        existing_urls = database.get_existing_urls(news['url'] for news in news_to_process)
+        news_to_fetch = [news for news in news_to_process if news['url'] not in existing_urls]
+        skipped_count = len(news_to_process) - len(news_to_fetch)
+        print(f"增量模式：{skipped_count} 篇已抓過 (已在知識庫中或不在時間窗口內)，略過下載；剩餘 {len(news_to_fetch)} 篇新目標。")
+    else:
+        news_to_fetch = news_to_process
+
+    print(f"開始並行潛入進行精準時間過濾 (最多 {MAX_FETCH_WORKERS} 條執行緒)...")
+    metrics.incr("crawl.skipped_existing", skipped_count)
+    fetch_started = time.monotonic()
+    with metrics.span("crawl.fetch_seconds"):
+        details = fetch_articles_concurrently([news['url'] for news in news_to_fetch], session=get_http_session(),
+                                              sources=[news['source'] for news in news_to_fetch])
+    print(f"內文抓取完成，耗時 {time.monotonic() - fetch_started:.1f} 秒。")
 
+    # 精準過濾的時間窗口，也從同一個 time_window 計算
+    articles_to_save, out_of_window = [], []
+    for news, (publish_time, content) in zip(news_to_fetch, details):
         if not publish_time or not content:
             print(f"\n[FATAL ERROR] 無法抓取文章 '{news['headline']}' 的完整內容。程式終止。")
-            sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+            return None
         
         # 這裡現在是兩個 aware time 在做比較，非常精準
         if publish_time and content and publish_time >= time_window:
@@ -245,16 +232,37 @@ def main():
             }
             formatted_time = article_data['datetime'].strftime('%Y-%m-%d %H:%M')
             print(f"Time:{formatted_time}\nheadline:{article_data['headline']}")
+            articles_to_save.append(article_data)
+        else:
+            out_of_window.append((news['url'], publish_time))
+
+    # 不在時間窗口內的文章之後只會更舊，記下網址，下次增量抓取時直接略過而不必重新下載
+    if out_of_window:
+        database.add_seen_urls(out_of_window)
+        metrics.incr("crawl.out_of_window", len(out_of_window))
+        print(f"{len(out_of_window)} 篇文章發布時間早於 {HOURS_TO_FETCH} 小時前，已記錄網址，之後不再下載。")
+
+    # 所有文章在同一個交易中一次寫入
+    new_articles_count = database.add_articles(articles_to_save)
 
-            if database.add_article(article_data):
-                new_articles_count += 1
-    
     # ... (最終任務報告邏輯不變) ...
     print("\n--- 任務報告 ---")
+    if new_articles_count == 0 and skipped_count > 0:
+        print(f"本次沒有新文章，{skipped_count} 篇目標皆已在知識庫中。")
+        return []
     if new_articles_count == 0:
         print(f"[FATAL ERROR] 處理了 {len(news_to_process)} 個目標，但沒有任何一篇符合條件或為新文章。可能出現問題，程式終止。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+        return None
     print(f"✔️ 本次新增 {new_articles_count} 篇符合精準時間的新文章到知識庫。")
+    return articles_to_save
+
+def main():
+    # 整次抓取共用同一條資料庫連線
+    with database.run_session(), metrics.span("news_hunter", stage=True):
+        articles = crawl()
+    metrics.write_run_report("news_hunter", "failed" if articles is None else "success")
+    if articles is None:
+        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
 
 # --- [程式總開關] ---
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+# 檔名: news_sources.py
+# 新聞來源外掛：每個來源各自決定「列表怎麼抓」、「相對時間怎麼解析」與「內文和發布時間怎麼擷取」。
+# 爬蟲同時向所有設定的來源取得列表，合併成一份以網址去重的清單，新增來源不會拉長整體耗時。
+# 要使用哪些來源由環境變數 NEWS_SOURCES 決定 (逗號分隔的名稱，預設只有 yahoo-tw-market)。
+# 文章頁預設以 lxml 直接解析並套用預先編譯好的 selector；沒有安裝 lxml 或設定 HTML_PARSER=html.parser 時，
+# 改用 BeautifulSoup 內建的解析器，並以 SoupStrainer 只建出需要的標籤。
+# lxml.html 與 cssselect 在第一次建立 lxml 擷取器時才載入，匯入本模組時不需要付出它們的載入時間。
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+import listing_sources
+import metrics
+
+DEFAULT_SOURCES = "yahoo-tw-market"
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml") # "lxml" 或 "html.parser"
+LEADING_TAG_PATTERN = re.compile(r'^([a-zA-Z][\w-]*)')
+REQUEST_TIMEOUT_SECONDS = 15
+REQUEST_HEADERS = listing_sources.REQUEST_HEADERS
+RELATIVE_TIME_PATTERN = re.compile(r'(\d+)\s*(分鐘|小時|天)前')
+
+_lxml_modules = None # 第一次載入後為 (lxml.html, CSSSelector)，沒有安裝時為 False
+
+def _load_lxml():
+    """載入 lxml.html 與 CSSSelector 並回傳 (lxml.html, CSSSelector)；lxml 或 cssselect 沒有安裝時回傳 None。"""
+    global _lxml_modules
+    if _lxml_modules is None:
+        try:
+            import lxml.html
+            from lxml.cssselect import CSSSelector
+            _lxml_modules = (lxml.html, CSSSelector)
+        except ImportError: # lxml 或 cssselect 沒有安裝時只能使用 html.parser
+            _lxml_modules = False
+    return _lxml_modules or None
+
+def parse_relative_time(time_text, now_utc):
+    """解析常見的中文相對時間 (「5 分鐘前」、「3 小時前」、「2 天前」、「昨天」)，無法解析時回傳 None。"""
+    if not time_text:
+        return None
+    match = RELATIVE_TIME_PATTERN.search(time_text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        if unit == '分鐘':
+            return now_utc - timedelta(minutes=amount)
+        if unit == '小時':
+            return now_utc - timedelta(hours=amount)
+        return now_utc - timedelta(days=amount)
+    if '昨天' in time_text:
+        return now_utc - timedelta(days=1)
+    return None
+
+def parse_iso_time(value):
+    """解析 ISO 8601 時間 (Z 代表 UTC+0)，失敗時回傳 None。"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+class ArticleExtractor:
+    """
+    從文章頁 HTML 取出發布時間屬性與內文段落，只看 published_selector 與 body_selector 指到的部分。
+    parser="lxml" 時直接以 lxml 建樹、以編譯好的 XPath 查詢，不經過 BeautifulSoup；
+    parser="html.parser" 時以 SoupStrainer 只保留兩個 selector 開頭的標籤 (及其子樹)，其餘標籤不會建成物件。
+    extract(html) 回傳 (時間屬性字串, 內文)，找不到時為 None / 空字串。
+    """
+    def __init__(self, published_selector, body_selector, paragraph_selector='p', time_attribute='datetime', parser=HTML_PARSER):
+        self.published_selector = published_selector
+        self.body_selector = body_selector
+        self.paragraph_selector = paragraph_selector
+        self.time_attribute = time_attribute
+        modules = _load_lxml() if parser == "lxml" else None
+        self.parser = "lxml" if modules else "html.parser"
+        if modules:
+            self._lxml_html, CSSSelector = modules
+            self._published = CSSSelector(published_selector)
+            self._body = CSSSelector(body_selector)
+            self._paragraphs = CSSSelector(paragraph_selector)
+        else:
+            self._strainer = _strainer_for(published_selector, body_selector)
+
+    def extract(self, html):
+        if self.parser == "lxml":
+            return self._extract_lxml(html)
+        return self._extract_soup(html)
+
+    def _extract_lxml(self, html):
+        try:
+            # 以 bytes 交給 lxml，避免頁面自帶的 encoding 宣告與 str 衝突；parser 不可跨執行緒共用，每次建立新的
+            lxml_html = self._lxml_html
+            tree = lxml_html.fromstring(html.encode('utf-8'), parser=lxml_html.HTMLParser(encoding='utf-8'))
+        except (lxml_html.etree.ParserError, ValueError):
+            return None, ""
+        published = self._published(tree)
+        published_value = published[0].get(self.time_attribute) if published else None
+        body = self._body(tree)
+        content = "\n".join(p.text_content() for p in self._paragraphs(body[0])) if body else ""
+        return published_value, content
+
+    def _extract_soup(self, html):
+        soup = BeautifulSoup(html, 'html.parser', parse_only=self._strainer)
+        time_tag = soup.select_one(self.published_selector)
+        body = soup.select_one(self.body_selector)
+        content = "\n".join(p.text for p in body.select(self.paragraph_selector)) if body else ""
+        return (time_tag.get(self.time_attribute) if time_tag else None), content
+
+def _strainer_for(*selectors):
+    """取出每個 selector 最外層的標籤名稱做成 SoupStrainer；有任何一個不是以標籤名稱開頭時無法縮減，回傳 None (完整解析)。"""
+    tags = []
+    for selector in selectors:
+        match = LEADING_TAG_PATTERN.match(selector.strip())
+        if not match:
+            return None
+        tags.append(match.group(1).lower())
+    return SoupStrainer(sorted(set(tags)))
+
+class NewsSource:
+    """
+    新聞來源的共同介面。
+    list_articles() 回傳 [{"headline", "url", "time_text"}, ...]，失敗時回傳 None；
+    parse_time() 把列表上的時間文字轉成 datetime；extract_article() 從文章 HTML 取出 (發布時間, 內文)，失敗時為 (None, None)。
+    """
+    name = "base"
+
+    def list_articles(self, now_utc, time_window):
+        raise NotImplementedError
+
+    def parse_time(self, time_text, now_utc):
+        return parse_relative_time(time_text, now_utc)
+
+    def extract_article(self, html):
+        raise NotImplementedError
+
+class HtmlNewsSource(NewsSource):
+    """
+    以 CSS selector 描述的一般網站來源：列表頁用一次 HTTP 請求讀取，文章頁以 <time datetime> 與內文段落擷取。
+    新增其他媒體時通常只需要換掉 selector。
+    """
+    def __init__(self, name, listing_url, base_url, item_selector, headline_selector='a', time_text_selector=None,
+                 published_selector='time[datetime]', body_selector='article', paragraph_selector='p', session=None, parser=HTML_PARSER):
+        self.name = name
+        self.listing_url = listing_url
+        self.base_url = base_url
+        self.item_selector = item_selector
+        self.headline_selector = headline_selector
+        self.time_text_selector = time_text_selector
+        self.published_selector = published_selector
+        self.body_selector = body_selector
+        self.paragraph_selector = paragraph_selector
+        self.session = session
+        self.extractor = ArticleExtractor(published_selector, body_selector, paragraph_selector, parser=parser)
+
+    def list_articles(self, now_utc, time_window):
+        try:
+            if self.session is not None:
+                response = self.session.get(self.listing_url, timeout=REQUEST_TIMEOUT_SECONDS)
+            else:
+                response = requests.get(self.listing_url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"[{self.name}] 列表讀取失敗: {e}")
+            return None
+        metrics.incr("listing.pages")
+        metrics.incr("listing.bytes", len(response.content))
+        items = []
+        for item in BeautifulSoup(response.text, 'html.parser').select(self.item_selector):
+            link = item.select_one(self.headline_selector)
+            if not link or not link.get('href'):
+                continue
+            time_tag = item.select_one(self.time_text_selector) if self.time_text_selector else None
+            items.append({
+                "headline": link.text.strip(),
+                "url": listing_sources._absolute_url(link.get('href'), self.base_url),
+                "time_text": time_tag.text.strip() if time_tag else None
+            })
+        print(f"[{self.name}] 列表讀取完成，共 {len(items)} 篇。")
+        return items
+
+    def extract_article(self, html):
+        published_value, content = self.extractor.extract(html)
+        publish_time = parse_iso_time(published_value)
+        if not publish_time or not content:
+            return None, None
+        return publish_time, content
+
+class YahooNewsSource(HtmlNewsSource):
+    """Yahoo 股市的分類列表：沿用 HTTP 優先、Selenium 備援的列表讀取與 Yahoo 的相對時間格式。"""
+    def __init__(self, name, listing_url, page_url_template="", base_url=listing_sources.YAHOO_BASE_URL):
+        super().__init__(name, listing_url, base_url, item_selector=listing_sources.LISTING_ITEM_SELECTOR, headline_selector='h3 a')
+        self.page_url_template = page_url_template
+
+    def list_articles(self, now_utc, time_window):
+        sources = [
+            listing_sources.HttpListingSource(listing_url=self.listing_url, page_url_template=self.page_url_template, base_url=self.base_url),
+            listing_sources.SeleniumListingSource(listing_url=self.listing_url, base_url=self.base_url)
+        ]
+        return listing_sources.fetch_listing(now_utc, time_window, sources=sources)
+
+    def parse_time(self, time_text, now_utc):
+        return listing_sources.parse_yahoo_time(time_text, now_utc)
+
+SOURCE_FACTORIES = {
+    "yahoo-tw-market": lambda: YahooNewsSource("yahoo-tw-market", listing_sources.YAHOO_LISTING_URL, listing_sources.YAHOO_LISTING_PAGE_URL),
+    "yahoo-intl-markets": lambda: YahooNewsSource("yahoo-intl-markets", "https://tw.stock.yahoo.com/intl-markets"),
+    "yahoo-news": lambda: YahooNewsSource("yahoo-news", "https://tw.stock.yahoo.com/news"),
+}
+
+def register_source(name, factory):
+    """註冊新的來源 (factory 為不需參數、回傳 NewsSource 的函數)，之後即可在 NEWS_SOURCES 中使用。"""
+    SOURCE_FACTORIES[name] = factory
+
+def create_sources(names=None):
+    """依名稱 (預設讀取環境變數 NEWS_SOURCES) 建立來源列表，名稱錯誤時丟出 ValueError。"""
+    names = names or [name.strip() for name in (os.getenv("NEWS_SOURCES") or DEFAULT_SOURCES).split(",") if name.strip()]
+    unknown = [name for name in names if name not in SOURCE_FACTORIES]
+    if unknown:
+        raise ValueError(f"未知的新聞來源: {', '.join(unknown)} (可用: {', '.join(SOURCE_FACTORIES)})")
+    return [SOURCE_FACTORIES[name]() for name in names]
+
+def list_all_sources(sources, now_utc, time_window):
+    """
+    同時向所有來源讀取列表，合併成一份以網址去重的清單 (依來源設定的順序，先出現的保留)。
+    回傳 [{"headline", "url", "time_text", "source"}, ...]；單一來源失敗只會略過它，全部失敗時回傳 None。
+    """
+    def list_one(source):
+        try:
+            with metrics.span(f"sources.{source.name}_seconds"):
+                return source.list_articles(now_utc, time_window)
+        except Exception as e:
+            print(f"[{source.name}] 列表讀取發生錯誤: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as executor:
+        results = list(executor.map(list_one, sources))
+
+    merged, seen_urls, succeeded = [], set(), 0
+    for source, items in zip(sources, results):
+        if not items:
+            print(f"[{source.name}] 沒有取得任何新聞。")
+            continue
+        succeeded += 1
+        for item in items:
+            if item['url'] in seen_urls:
+                continue
+            seen_urls.add(item['url'])
+            merged.append({**item, "source": source})
+    metrics.incr("sources.failed", len(sources) - succeeded)
+    metrics.incr("sources.duplicates_removed", sum(len(items or []) for items in results) - len(merged))
+    if not succeeded:
+        return None
+    return merged
@@ -1,100 +1,329 @@
+import analyzer
 import database
 from datetime import datetime
+import hashlib
 from zoneinfo import ZoneInfo
 import os
 import re
-from dotenv import load_dotenv
-import azure.cognitiveservices.speech as speechsdk
-import boto3
+import metrics
+import storage
+import tts_backends
+from tts_backends import setup_gcp_credentials # noqa: F401 (保留舊的匯入路徑)
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-S3_BUCKET_NAME = 'ai-news-podcast-output-andy-1102'
-BYTE_LIMIT = 15000
-
-def setup_gcp_credentials(): # 雖然改用Azure，但這個函數的設計模式很好，保留下來，萬一以後要用
-    gcp_json_content = os.getenv("GCP_CREDENTIALS_JSON")
-    if gcp_json_content:
-        temp_credentials_path = "gcp_credentials_temp.json"
-        with open(temp_credentials_path, "w") as f:
-            f.write(gcp_json_content)
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_credentials_path
-        print("已從環境變數載入 GCP 憑證。")
-
-def upload_to_s3(file_path, bucket_name, object_name):
-    # (與 analyzer.py 中的函數相同)
-    s3_client = boto3.client('s3')
-    try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
-        print(f"檔案已成功上傳至 S3: s3://{bucket_name}/{object_name}")
-        return True
-    except Exception as e:
-        print(f"S3 上傳失敗: {e}")
-        return False
-
-def create_text_chunks(text):
-    chunks, current_chunk = [], ""
-    sentences = text.replace('\n', '。').replace('！', '。').replace('？', '。').split('。')
-    for sentence in sentences:
-        if not sentence: continue
-        sentence_with_period = sentence + "。"
-        if len((current_chunk + sentence_with_period).encode('utf-8')) > BYTE_LIMIT:
-            if current_chunk: chunks.append(current_chunk)
-            current_chunk = sentence_with_period
+BYTE_LIMIT = 15000 # 預設上限；實際切段時使用後端的 max_input_bytes
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4")) # 同時合成的段落數
+TTS_MAX_RETRIES = 3 # 單一段落合成失敗時最多重試幾次
+TTS_RETRY_DELAY_SECONDS = 2 # 重試前等待的秒數，之後每次加倍
+USE_SSML = os.getenv("TTS_USE_SSML", "1") == "1" # 後端支援時，以 SSML 標出段落與章節停頓
+
+HEADING_PATTERN = analyzer.SECTION_HEADING_PATTERN # 與分析階段切段落時使用同一個標題格式
+INLINE_MARKUP_PATTERN = re.compile(r'\*+|`+|^\s*[-*+]\s+|^\s*>\s*', re.MULTILINE)
+RULE_PATTERN = re.compile(r'^\s*(?:-{3,}|\*{3,}|_{3,})\s*$')
+SENTENCE_PATTERN = re.compile(r'[^。！？!?]+[。！？!?]*|[。！？!?]+')
+SENTENCE_ENDINGS = '。！？!?；;：:，,、」』）)'
+SSML_HEADER = '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="zh-TW">'
+SSML_SECTION_BREAK = '<break time="800ms"/>'
+SSML_HEADING_BREAK = '<break time="400ms"/>'
+
+def escape_ssml(text):
+    """跳脫 SSML 文字中的 &、<、> 與引號 (屬性值也可以使用)。不用 xml.sax.saxutils，它在載入時會連帶匯入 urllib.request 等模組。"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+def markdown_to_segments(markdown):
+    """
+    單次掃描 markdown 報告，轉成 [(kind, text), ...]，kind 為 "heading" 或 "paragraph"。
+    去掉標記符號但保留原本的標點；空行與標題就是段落的分界。
+    """
+    segments, paragraph = [], []
+
+    def flush():
+        if paragraph:
+            segments.append(("paragraph", "".join(paragraph)))
+            paragraph.clear()
+
+    for line in markdown.splitlines():
+        if RULE_PATTERN.match(line):
+            flush()
+            continue
+        is_heading = bool(HEADING_PATTERN.match(line))
+        text = INLINE_MARKUP_PATTERN.sub('', line.lstrip('#')).strip()
+        if not text:
+            flush()
+        elif is_heading:
+            flush()
+            segments.append(("heading", text))
         else:
-            current_chunk += sentence_with_period
-    if current_chunk: chunks.append(current_chunk)
+            # 沒有句尾標點的行 (例如條列項目) 補上句號，避免和下一行黏在一起唸
+            paragraph.append(text if text[-1] in SENTENCE_ENDINGS else text + "。")
+    flush()
+    return segments
+
+def iter_sentences(text):
+    """逐句切出文字，保留原本的「。！？」標點。"""
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group(0).strip()
+        if sentence:
+            yield sentence
+
+def _split_oversized(sentence, byte_limit, encode=str):
+    """
+    單句就超過上限時，依字元切開 (極少發生，例如整段沒有標點)。
+    encode 是每個字元輸出前的轉換 (例如 escape_ssml)，位元組數以轉換後計算，回傳的片段也是轉換後的文字；
+    先切原文再逐字轉換，才不會把 &amp; 之類的實體切成兩半。
+    """
+    piece, piece_bytes = [], 0
+    for ch in sentence:
+        ch = encode(ch)
+        ch_bytes = len(ch.encode('utf-8'))
+        if piece and piece_bytes + ch_bytes > byte_limit:
+            yield "".join(piece)
+            piece, piece_bytes = [], 0
+        piece.append(ch)
+        piece_bytes += ch_bytes
+    if piece:
+        yield "".join(piece)
+
+def create_text_chunks(text, byte_limit=BYTE_LIMIT):
+    """
+    依 UTF-8 位元組上限把文字切段，每句只編碼一次並累加位元組數，整體為線性時間。
+    句子不會被切開，也不會改動原本的標點。
+    """
+    chunks, current, current_bytes = [], [], 0
+    for line in text.splitlines():
+        for sentence in iter_sentences(line):
+            sentence_bytes = len(sentence.encode('utf-8'))
+            pieces = [(sentence, sentence_bytes)] if sentence_bytes <= byte_limit else \
+                [(p, len(p.encode('utf-8'))) for p in _split_oversized(sentence, byte_limit)]
+            for piece, piece_bytes in pieces:
+                if current and current_bytes + piece_bytes > byte_limit:
+                    chunks.append("".join(current))
+                    current, current_bytes = [], 0
+                current.append(piece)
+                current_bytes += piece_bytes
+    if current:
+        chunks.append("".join(current))
     return chunks
 
-def main():
+def segments_to_text(segments):
+    """把段落還原成純文字 (給不支援 SSML 的後端使用)，標題自成一行並補上句號。"""
+    lines = []
+    for kind, text in segments:
+        if kind == "heading" and text[-1] not in SENTENCE_ENDINGS:
+            text += "。"
+        lines.append(text)
+    return "\n".join(lines)
+
+def create_ssml_chunks(segments, byte_limit=BYTE_LIMIT, voice_name=None, continuation=False):
+    """
+    把段落轉成 SSML 並依位元組上限 (包含標記本身) 切成多份完整的 <speak> 文件。
+    每個標題前加上較長的停頓、標題後加上短停頓，段落以 <p> 包住，讓語氣和原文的結構一致。
+    continuation=True 代表這是報告中間的一部分 (串流逐段合成)，開頭的標題前同樣要有章節停頓。
+    """
+    header = SSML_HEADER + (f'<voice name="{escape_ssml(voice_name)}">' if voice_name else '')
+    footer = ('</voice>' if voice_name else '') + '</speak>'
+    overhead = len((header + footer + '<p></p>').encode('utf-8'))
+    budget = byte_limit - overhead
+
+    chunks, body, body_bytes = [], [], 0
+
+    def emit(markup):
+        nonlocal body, body_bytes
+        markup_bytes = len(markup.encode('utf-8'))
+        if body and body_bytes + markup_bytes > budget:
+            chunks.append(header + "".join(body) + footer)
+            body, body_bytes = [], 0
+        body.append(markup)
+        body_bytes += markup_bytes
+
+    for index, (kind, text) in enumerate(segments):
+        if kind == "heading":
+            emit((SSML_SECTION_BREAK if index or continuation else '') + f'<p>{escape_ssml(text)}</p>' + SSML_HEADING_BREAK)
+            continue
+        # 段落太長時以句為單位分成多個 <p>，每個 <p> 都不會跨越兩份文件
+        paragraph, paragraph_bytes = [], 0
+        for sentence in iter_sentences(text):
+            for piece in _split_oversized(sentence, budget, encode=escape_ssml):
+                piece_bytes = len(piece.encode('utf-8'))
+                if paragraph and paragraph_bytes + piece_bytes > budget - body_bytes:
+                    emit('<p>' + "".join(paragraph) + '</p>')
+                    paragraph, paragraph_bytes = [], 0
+                paragraph.append(piece)
+                paragraph_bytes += piece_bytes
+        if paragraph:
+            emit('<p>' + "".join(paragraph) + '</p>')
+    if body:
+        chunks.append(header + "".join(body) + footer)
+    return chunks
+
+def build_chunks(segments, backend, continuation=False):
+    """依後端能力與輸入上限 (max_input_bytes) 把段落切成 SSML 或純文字的合成單位，回傳 (chunks, 對應的合成函數)。"""
+    if USE_SSML and backend.supports_ssml:
+        return create_ssml_chunks(segments, byte_limit=backend.max_input_bytes, voice_name=backend.ssml_voice_name,
+                                  continuation=continuation), backend.synthesize_ssml
+    return create_text_chunks(segments_to_text(segments), byte_limit=backend.max_input_bytes), backend.synthesize
+
+def render_with_retries(synthesize, chunk, label, max_retries=TTS_MAX_RETRIES, retry_delay=TTS_RETRY_DELAY_SECONDS):
+    """合成單一段落，失敗時等待後重試 (間隔每次加倍)；重試後仍失敗則回傳 None。"""
+    for attempt in range(max_retries + 1):
+        try:
+            with metrics.span("tts.chunk_seconds"):
+                audio = synthesize(chunk)
+            print(f"  - 第 {label} 段語音合成完成 ({len(audio)} bytes)")
+            metrics.incr("tts.chunks")
+            metrics.incr("tts.input_bytes", len(chunk.encode('utf-8')))
+            metrics.incr("tts.audio_bytes", len(audio))
+            return audio
+        except Exception as e:
+            print(f"  - 第 {label} 段語音合成失敗 (第 {attempt + 1} 次): {e}")
+            metrics.incr("tts.errors")
+            if attempt < max_retries:
+                time.sleep(retry_delay * (2 ** attempt))
+    metrics.incr("tts.failed_chunks")
+    return None
+
+class ChunkCheckpoint:
+    """
+    把合成完成的段落音訊存進資料庫 (podcast_chunks)。同一個 run_id 重跑時，內容相同的段落直接取回，
+    只合成上次沒有完成的部分。段落以內容雜湊比對，報告或切段方式改變時不會誤用舊的音訊。
+    """
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.saved = database.get_podcast_chunks(run_id)
+        if self.saved:
+            print(f"找到 {len(self.saved)} 段上次已合成的音訊，內容相同的段落將直接沿用。")
+
+    def render(self, synthesize, chunk, index, label, max_retries=TTS_MAX_RETRIES, retry_delay=TTS_RETRY_DELAY_SECONDS):
+        chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+        audio = self.saved.get(chunk_hash)
+        if audio is not None:
+            print(f"  - 第 {label} 段沿用上次的合成結果 ({len(audio)} bytes)")
+            metrics.incr("tts.chunks_resumed")
+            return audio
+        audio = render_with_retries(synthesize, chunk, label, max_retries, retry_delay)
+        if audio is not None:
+            database.add_podcast_chunk(self.run_id, index, chunk_hash, audio)
+        return audio
+
+def render_chunk(synthesize, chunk, index, label, max_retries=TTS_MAX_RETRIES, retry_delay=TTS_RETRY_DELAY_SECONDS, checkpoint=None):
+    """合成第 index 段；有 checkpoint 時先查上次的結果，合成完成後也會存進去。"""
+    if checkpoint is None:
+        return render_with_retries(synthesize, chunk, label, max_retries, retry_delay)
+    return checkpoint.render(synthesize, chunk, index, label, max_retries, retry_delay)
+
+def synthesize_chunks(chunks, synthesize, max_workers=TTS_MAX_WORKERS, max_retries=TTS_MAX_RETRIES, retry_delay=TTS_RETRY_DELAY_SECONDS,
+                      checkpoint=None):
+    """
+    以有上限的執行緒池並行合成所有段落，每段各自重試，不會因為單一段落失敗就整集放棄。
+    回傳依段落順序排列的音訊 bytes 列表；若有段落重試後仍失敗則回傳 None。
+    """
+    def render(indexed_chunk):
+        i, chunk = indexed_chunk
+        return render_chunk(synthesize, chunk, i, f"{i+1}/{len(chunks)}", max_retries, retry_delay, checkpoint)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        audio_parts = list(executor.map(render, enumerate(chunks)))
+    if any(part is None for part in audio_parts):
+        return None
+    return audio_parts
+
+def synthesize_sections(sections, backend, max_workers=TTS_MAX_WORKERS, max_retries=TTS_MAX_RETRIES, retry_delay=TTS_RETRY_DELAY_SECONDS,
+                        checkpoint=None):
+    """
+    邊接收邊合成：sections 每產出一個完成的報告段落 (markdown)，就立刻切段並送進執行緒池，
+    不必等整份報告寫完。回傳依報告順序排列的音訊 bytes 列表；若有段落重試後仍失敗則回傳 None。
+    """
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for index, section in enumerate(sections):
+            chunks, synthesize = build_chunks(markdown_to_segments(section), backend, continuation=index > 0)
+            print(f"收到報告第 {index + 1} 部分，切分成 {len(chunks)} 段落送出合成...")
+            for chunk in chunks:
+                chunk_index = len(futures)
+                futures.append(executor.submit(render_chunk, synthesize, chunk, chunk_index, str(chunk_index + 1), max_retries, retry_delay,
+                                               checkpoint))
+        audio_parts = [future.result() for future in futures]
+    if not audio_parts or any(part is None for part in audio_parts):
+        return None
+    return audio_parts
+
+def load_backend():
+    """讀取 .env 並取得預設的語音合成後端，設定失敗時印出原因並回傳 None。"""
+    from dotenv import load_dotenv
     load_dotenv()
-    
-    print("--- AI 播音員 (Azure 版) 啟動 ---")
-    latest_summary = database.get_latest_summary()
-    if not latest_summary:
-        print("錯誤：資料庫中找不到任何分析報告。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-        return
-    summary_text = latest_summary['summary_text']
-    print("成功讀取報告，準備進行語音合成...")
 
-    cleaned_text = re.sub(r'#+\s*', '', summary_text).replace('**', '').replace('*', '').replace('---', '')
+    try:
+        return tts_backends.get_backend()
+    except Exception as e:
+        print(f"錯誤：語音合成後端設定失敗: {e}")
+        return None
+
+def broadcast(summary_text=None, sections=None, run_id=None, backend=None):
+    """
+    把報告轉成 podcast 並上傳，成功時回傳音檔的 S3 物件名稱，失敗時回傳 None。
+    summary_text 是同一個行程中分析階段剛產生的報告；未提供時讀取資料庫中最新的一份。
+    sections (analyzer.SectionStream 或段落列表) 則是逐段提供的報告：每收到一個段落就開始合成，報告不完整時放棄本集。
+    有 run_id 時，每段合成完成就存進資料庫，同一個 run_id 重跑時從最後完成的段落接續；整集上傳後記入執行紀錄。
+    backend 是呼叫端已建立好的語音合成後端；未提供時使用 tts_backends.get_backend()。
+    """
+    if backend is None:
+        backend = load_backend()
+        if backend is None:
+            return None
 
-    speech_key = os.getenv("AZURE_SPEECH_KEY")
-    speech_region = os.getenv("AZURE_SPEECH_REGION")
-    if not all([speech_key, speech_region]):
-        print("錯誤：缺少 AZURE_SPEECH_KEY 或 AZURE_SPEECH_REGION 環境變數。")
-        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
-        return
+    print(f"--- AI 播音員 ({backend.name} 版) 啟動 ---")
+    if sections is None and summary_text is None:
+        latest_summary = database.get_latest_summary()
+        if not latest_summary:
+            print("錯誤：資料庫中找不到任何分析報告。")
+            return None
+        summary_text = latest_summary['summary_text']
 
     try:
+        checkpoint = ChunkCheckpoint(run_id) if run_id else None
         tz_taipei = ZoneInfo("Asia/Taipei")
         file_timestamp = datetime.now(tz_taipei).strftime('%Y%m%d_%H')
-        filename = f"podcast_{file_timestamp}.mp3"
-        
-        speech_config = speechsdk.SpeechConfig(subscription=speech_key, region=speech_region)
-        audio_config = speechsdk.audio.AudioOutputConfig(filename=filename)
-        voice_name = "zh-TW-YunJheNeural"
-        speech_config.speech_synthesis_voice_name = voice_name
-        speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-
-        text_chunks = create_text_chunks(cleaned_text)
-        print(f"報告已切分成 {len(text_chunks)} 段落，準備使用聲音 '{voice_name}' 進行合成...")
-        for i, chunk in enumerate(text_chunks):
-            print(f"  - 正在合成第 {i+1}/{len(text_chunks)} 段語音...")
-            result = speech_synthesizer.speak_text_async(chunk).get()
-            if result.reason == speechsdk.ResultReason.Canceled:
-                cancellation_details = result.cancellation_details
-                print(f"語音合成被取消: {cancellation_details.reason}")
-                if cancellation_details.reason == speechsdk.CancellationReason.Error:
-                    print(f"錯誤詳情: {cancellation_details.error_details}")
-                return
-        
+        filename = f"podcast_{file_timestamp}.{backend.file_extension}"
+
+        if sections is not None:
+            print(f"等待報告串流，每完成一個段落就使用 {backend.name} 後端並行合成 (最多 {TTS_MAX_WORKERS} 條執行緒)...")
+            audio_parts = synthesize_sections(sections, backend, checkpoint=checkpoint)
+            if not getattr(sections, "completed", True):
+                print("錯誤：報告沒有完整產生，放棄本集。")
+                return None
+        else:
+            print("成功讀取報告，準備進行語音合成...")
+            text_chunks, synthesize = build_chunks(markdown_to_segments(summary_text), backend)
+            print(f"報告已切分成 {len(text_chunks)} 段落，準備使用 {backend.name} 後端並行合成 (最多 {TTS_MAX_WORKERS} 條執行緒)...")
+            audio_parts = synthesize_chunks(text_chunks, synthesize, checkpoint=checkpoint)
+        if audio_parts is None:
+            print("錯誤：部分段落在重試後仍無法合成，放棄本集。")
+            return None
+
+        # 依段落順序把音訊接起來 (拼接方式由後端決定)，直接從記憶體上傳，不寫本機暫存檔
+        with metrics.span("tts.stitch_seconds"):
+            audio = backend.stitch(audio_parts)
         print("\n所有段落語音合成完畢！")
         
-        upload_to_s3(filename, S3_BUCKET_NAME, f"podcasts/{filename}")
-        os.remove(filename)
+        object_name = f"podcasts/{filename}"
+        if not storage.upload_bytes(object_name, audio, content_type=backend.content_type):
+            print("錯誤：音檔上傳失敗，放棄本集。")
+            return None
+        if run_id:
+            database.set_stage_status(run_id, "podcaster", "complete", {"object_key": object_name, "chunk_count": len(audio_parts)})
+            database.delete_podcast_chunks(run_id)
+        return object_name
     except Exception as e:
         print(f"AI 轉podcast或存檔過程中發生錯誤: {e}")
+        return None
+
+def main():
+    with metrics.span("podcaster", stage=True):
+        object_name = broadcast()
+    metrics.write_run_report("podcaster", "failed" if object_name is None else "success")
+    if object_name is None:
         sys.exit(1) # 使用非 0 的 exit code 代表錯誤
 
 if __name__ == "__main__":
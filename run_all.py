@@ -1,36 +1,175 @@
-import subprocess
+import argparse
 import sys
+import threading
+import time
 import database
+import metrics
+import news_hunter
+import analyzer
+import podcaster
 
-def run_script(script_name):
-    """執行一個 Python 腳本，並檢查是否成功。"""
-    print(f"\n--- 正在執行 {script_name} ---")
-    # sys.executable 會確保我們用的是同一個環境下的 python.exe
-    result = subprocess.run([sys.executable, script_name])
-    if result.returncode != 0:
-        print(f"!!! 執行 {script_name} 時發生錯誤，中止任務 !!!")
-        return False
-    print(f"--- {script_name} 執行成功 ---\n")
-    return True
+def run_stage(stage_name, stage, timings, *args):
+    """
+    在同一個行程中執行一個階段，記錄耗時並檢查是否成功。
+    各階段失敗時回傳 None；未預期的例外也視為失敗，不讓整個程式直接崩潰。
+    """
+    print(f"\n--- 正在執行 {stage_name} ---")
+    started = time.perf_counter()
+    try:
+        with metrics.span(stage_name, stage=True):
+            result = stage(*args)
+    except Exception as e:
+        print(f"{stage_name} 發生未預期的錯誤: {e}")
+        result = None
+    timings.append((stage_name, time.perf_counter() - started))
+    if result is None:
+        print(f"!!! 執行 {stage_name} 時發生錯誤，中止任務 !!!")
+        return None
+    print(f"--- {stage_name} 執行成功 ---\n")
+    return result
+
+def analyze_and_broadcast(new_articles, run_id=None):
+    """
+    串流模式：分析在背景執行緒中產生報告，podcaster 在主執行緒中每收到一個完成的段落就開始合成，
+    兩個階段重疊執行。兩者都成功時回傳音檔的 S3 物件名稱，否則回傳 None。
+    語音合成後端在開始分析前就先建立，設定有誤時不必白白呼叫 Gemini。
+    """
+    backend = podcaster.load_backend()
+    if backend is None:
+        return None
+    sections = analyzer.SectionStream()
+    outcome = {}
+
+    def produce():
+        summary_text = None
+        try:
+            summary_text = analyzer.analyze(new_articles, sections=sections, run_id=run_id)
+        except Exception as e:
+            print(f"analyzer 發生未預期的錯誤: {e}")
+        finally:
+            outcome['analyzed_at'] = time.perf_counter()
+            metrics.observe("pipeline.report_ready_seconds", outcome['analyzed_at'] - started)
+            sections.close(summary_text is not None)
+
+    started = time.perf_counter()
+    producer = threading.Thread(target=produce, name="analyzer")
+    producer.start()
+    object_name = podcaster.broadcast(sections=sections, run_id=run_id, backend=backend)
+    producer.join()
+    if not sections.completed:
+        return None
+    print(f"報告產生耗時 {outcome['analyzed_at'] - started:.1f} 秒，語音合成在報告完成後再多花 {time.perf_counter() - outcome['analyzed_at']:.1f} 秒。")
+    return object_name
+
+def print_timings(timings):
+    print("\n--- 各階段耗時 ---")
+    for stage_name, seconds in timings:
+        print(f"  {stage_name:<20}{seconds:>8.1f} 秒")
+    print(f"  {'總計':<20}{sum(seconds for _, seconds in timings):>8.1f} 秒")
+
+def resolve_run(resume_run_id=None):
+    """
+    決定這次執行的 run_id 與已完成的階段 {stage: 產出}。
+    resume_run_id 為 None 時開始新的執行；"latest" 代表接續最近一次的執行，其餘則視為指定的 run_id。
+    """
+    if resume_run_id is None:
+        return metrics.run_id(), {}
+    run_id = database.get_latest_run_id() if resume_run_id == "latest" else resume_run_id
+    manifest = database.get_run_manifest(run_id) if run_id else {}
+    if not manifest:
+        print(f"找不到可接續的執行紀錄 ({resume_run_id})，改為從頭執行。")
+        return metrics.run_id(), {}
+    completed = {stage: entry["output"] for stage, entry in manifest.items() if entry["status"] == "complete"}
+    print(f"接續執行 {run_id}，已完成的階段: {', '.join(stage for stage in completed if stage != 'run_all') or '無'}")
+    return run_id, completed
+
+def run_pipeline(resume_run_id=None):
+    """
+    依序執行抓取、分析與 podcast 生成，全部在同一個行程、同一條資料庫連線中完成。
+    新抓到的文章與產生的報告直接以記憶體傳給下一個階段；串流模式下分析與語音合成會重疊執行。成功時回傳 True。
+    各階段的產出記在 run_manifest 中；指定 resume_run_id 時 (見 resolve_run) 會跳過已完成的階段，
+    podcaster 也會沿用已合成的段落，只重做失敗之後的部分。
+    每次執行結束時 (無論成功與否) 都會印出各階段耗時，並寫出一份執行報告 (見 metrics.py)。
+    """
+    timings = []
+    succeeded = False
+    try:
+        succeeded = _run_stages(timings, resume_run_id)
+        return succeeded
+    finally:
+        print_timings(timings)
+        metrics.write_run_report("run_all", "success" if succeeded else "failed")
+
+def _run_stages(timings, resume_run_id=None):
+    with database.run_session():
+        database.setup_database()
+        run_id, completed = resolve_run(resume_run_id)
+        if "podcaster" in completed:
+            print(f"執行 {run_id} 的所有階段都已完成 (音檔: {completed['podcaster']['object_key']})，不需要接續。")
+            return True
+        database.set_stage_status(run_id, "run_all", "running")
+        succeeded = _run_remaining_stages(timings, run_id, completed)
+        database.set_stage_status(run_id, "run_all", "complete" if succeeded else "failed")
+        if not succeeded:
+            print(f"可以執行 python run_all.py --resume {run_id} 從失敗的階段接續。")
+        return succeeded
+
+def _run_remaining_stages(timings, run_id, completed):
+    # 步驟一：執行新聞抓取 (已完成時，分析階段改從資料庫讀取文章)
+    new_articles = None
+    if "news_hunter" in completed:
+        print(f"略過 news_hunter：上次已抓取 {completed['news_hunter']['article_count']} 篇新文章。")
+    else:
+        new_articles = run_stage("news_hunter", news_hunter.crawl, timings, run_id)
+        if new_articles is None:
+            return False # 如果抓取失敗，就直接結束
+
+    summary_text = None
+    if "analyzer" in completed:
+        summary = database.get_summary(completed["analyzer"]["summary_id"])
+        if summary:
+            print(f"略過 analyzer：沿用上次的報告 (id {summary['id']})。")
+            summary_text = summary['summary_text']
+        else:
+            print("上次的報告已不在知識庫中，重新分析。")
+
+    if summary_text is None:
+        if analyzer.REPORT_STREAMING:
+            # 步驟二 + 三：報告邊產生邊合成語音
+            return run_stage("analyzer+podcaster", analyze_and_broadcast, timings, new_articles, run_id) is not None
+
+        # 步驟二：執行 AI 分析與儲存
+        summary_text = run_stage("analyzer", analyzer.analyze, timings, new_articles, None, run_id)
+        if summary_text is None:
+            return False # 如果分析失敗，就直接結束
+        return run_stage("podcaster", podcaster.broadcast, timings, summary_text, None, run_id) is not None
+
+    # 步驟三：以已完成的報告生成 Podcast；串流模式下依相同的段落切分，才能沿用上次已合成的段落
+    if analyzer.REPORT_STREAMING:
+        return run_stage("podcaster", podcaster.broadcast, timings, None, analyzer.split_sections(summary_text), run_id) is not None
+    return run_stage("podcaster", podcaster.broadcast, timings, summary_text, None, run_id) is not None
 
 def main():
+    parser = argparse.ArgumentParser(description="每日財經 Podcast 自動化流程")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="接續先前失敗的執行 (未指定 RUN_ID 時接續最近一次)，跳過已完成的階段")
+    args = parser.parse_args()
+
     print("==============================================")
     print("      每日財經 Podcast 自動化專案啟動      ")
     print("==============================================")
-    
-    # 步驟一：執行新聞抓取
-    if not run_script("news_hunter.py"):
-        return # 如果抓取失敗，就直接結束
-
-    # 步驟二：執行 AI 分析與儲存
-    if not run_script("analyzer.py"):
-        return # 如果分析失敗，就直接結束
-
-    # 步驟三：執行 Podcast 生成
-    if not run_script("podcaster.py"):
-        return # 如果生成語音失敗，就直接結束
-    
+
+    # 與常駐模式 (daemon.py) 及其他 cron 啟動的執行共用同一個鎖檔，避免同時寫入同一個資料庫與段落音訊
+    import daemon # 延後載入：只有從命令列執行時才需要鎖檔，被 daemon 或量測程式匯入時不必付出它的載入時間
+    with daemon.run_lock(daemon.DAEMON_LOCK_FILE) as acquired:
+        if not acquired:
+            print(f"錯誤：另一個流程正在執行 (鎖檔 {daemon.DAEMON_LOCK_FILE} 被占用)，本次不執行。")
+            sys.exit(1)
+        succeeded = run_pipeline(resume_run_id=args.resume)
+    if not succeeded:
+        sys.exit(1) # 使用非 0 的 exit code 代表錯誤
+
     print("--- 所有任務執行完畢，專案成功！ ---")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
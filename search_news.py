@@ -0,0 +1,29 @@
+# 檔名: search_news.py
+# 在知識庫中全文搜尋新聞，例如: python search_news.py 台積電 --days 7
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import database
+
+def main():
+    parser = argparse.ArgumentParser(description="在 news.db 中全文搜尋新聞 (依相關度排序)")
+    parser.add_argument("query", nargs="+", help="關鍵字，多個關鍵字之間為 AND")
+    parser.add_argument("--days", type=float, default=None, help="只搜尋最近幾天內發布的新聞")
+    parser.add_argument("--limit", type=int, default=database.SEARCH_DEFAULT_LIMIT, help="最多顯示幾筆結果")
+    args = parser.parse_args()
+
+    database.setup_database()
+    since = datetime.now(timezone.utc) - timedelta(days=args.days) if args.days else None
+    results = database.search_articles(" ".join(args.query), since=since, limit=args.limit)
+    if not results:
+        print("找不到符合的新聞。")
+        return
+    for i, article in enumerate(results, 1):
+        published = (article['publish_datetime'] or '')[:16].replace('T', ' ')
+        print(f"{i:>2}. [{published}] {article['headline']}")
+        print(f"    {article['snippet']}")
+        print(f"    {article['url']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# 檔名: storage.py
+# 產出物 (報告、podcast 音檔) 的儲存：直接從記憶體上傳，不必先寫成本機暫存檔。
+# 同一個行程共用一個 S3 client；大檔自動改用 multipart 分段並行上傳；
+# 內容沒變的物件 (以 sha256 比對) 直接略過；失敗時以指數退避重試。
+# 環境變數 STORAGE_BACKEND=local 時改寫到本機資料夾，方便離線測試。
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+import metrics
+
+DEFAULT_BACKEND = "s3"
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "ai-news-podcast-output-andy-1102")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage_output")
+MULTIPART_THRESHOLD_BYTES = 8 * 1024 * 1024 # 超過此大小改用 multipart 上傳
+MULTIPART_CHUNK_BYTES = 8 * 1024 * 1024
+MULTIPART_MAX_CONCURRENCY = 4 # multipart 同時上傳的分段數
+UPLOAD_MAX_RETRIES = 3 # 上傳失敗時最多重試幾次
+UPLOAD_RETRY_DELAY_SECONDS = 1 # 重試前等待的秒數，之後每次加倍
+HASH_METADATA_KEY = "sha256" # 物件 metadata 中記錄內容雜湊的欄位
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def content_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def get_s3_client():
+    """整個行程共用同一個 S3 client (boto3 的 client 可跨執行緒使用)，第一次用到時才建立。"""
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            import boto3 # 載入很慢，延後到第一次上傳時
+            _s3_client = boto3.client('s3')
+        return _s3_client
+
+class ObjectStore:
+    """
+    物件儲存的共同介面。
+    put(key, data, content_type, sha256) 寫入一個物件；stored_sha256(key) 回傳已存物件的內容雜湊，不存在時回傳 None。
+    """
+    name = "base"
+
+    def put(self, key, data, content_type, sha256):
+        raise NotImplementedError
+
+    def stored_sha256(self, key):
+        raise NotImplementedError
+
+    def location(self, key):
+        return key
+
+class S3ObjectStore(ObjectStore):
+    """AWS S3：小檔單次 PUT，大檔由 TransferConfig 自動切成 multipart 並行上傳。"""
+    name = "s3"
+
+    def __init__(self, bucket_name=S3_BUCKET_NAME, client=None):
+        from boto3.s3.transfer import TransferConfig
+        self.bucket_name = bucket_name
+        self.client = client or get_s3_client()
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD_BYTES,
+            multipart_chunksize=MULTIPART_CHUNK_BYTES,
+            max_concurrency=MULTIPART_MAX_CONCURRENCY
+        )
+
+    def put(self, key, data, content_type, sha256):
+        extra_args = {"Metadata": {HASH_METADATA_KEY: sha256}}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self.client.upload_fileobj(io.BytesIO(data), self.bucket_name, key, ExtraArgs=extra_args, Config=self.transfer_config)
+
+    def stored_sha256(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response.get("Metadata", {}).get(HASH_METADATA_KEY)
+
+    def location(self, key):
+        return f"s3://{self.bucket_name}/{key}"
+
+class LocalObjectStore(ObjectStore):
+    """本機資料夾：物件以 key 為相對路徑存放，先寫暫存檔再改名，不會留下寫到一半的檔案。"""
+    name = "local"
+
+    def __init__(self, root=LOCAL_STORAGE_DIR):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key, data, content_type, sha256):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def stored_sha256(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return content_sha256(f.read())
+
+    def location(self, key):
+        return os.path.abspath(self._path(key))
+
+BACKENDS = {
+    S3ObjectStore.name: S3ObjectStore,
+    LocalObjectStore.name: LocalObjectStore,
+}
+
+def create_store(name=None):
+    """依名稱 (預設讀取環境變數 STORAGE_BACKEND) 建立物件儲存，名稱錯誤時丟出 ValueError。"""
+    name = (name or os.getenv("STORAGE_BACKEND") or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 STORAGE_BACKEND: {name} (可用: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+def get_store():
+    """整個行程共用的預設物件儲存。"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = create_store()
+        return _default_store
+
+def upload_bytes(key, data, content_type=None, store=None, skip_unchanged=True,
+                 max_retries=UPLOAD_MAX_RETRIES, retry_delay=UPLOAD_RETRY_DELAY_SECONDS):
+    """
+    把記憶體中的內容 (bytes 或 str) 上傳為 key，成功時回傳物件位置，重試後仍失敗則回傳 None。
+    skip_unchanged=True 時，已存在且內容雜湊相同的物件不會重新上傳。
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    sha256 = content_sha256(data)
+    try:
+        store = store or get_store()
+    except Exception as e:
+        print(f"物件儲存設定失敗: {e}")
+        return None
+    for attempt in range(max_retries + 1):
+        try:
+            if skip_unchanged and store.stored_sha256(key) == sha256:
+                print(f"內容沒有變動，略過上傳: {store.location(key)}")
+                metrics.incr("storage.skipped_unchanged")
+                return store.location(key)
+            with metrics.span("storage.upload_seconds"):
+                store.put(key, data, content_type, sha256)
+            print(f"檔案已成功上傳: {store.location(key)} ({len(data)} bytes)")
+            metrics.incr("storage.uploads")
+            metrics.incr("storage.bytes_uploaded", len(data))
+            return store.location(key)
+        except Exception as e:
+            print(f"上傳 {key} 失敗 (第 {attempt + 1} 次): {e}")
+            metrics.incr("storage.errors")
+            if attempt < max_retries:
+                time.sleep(retry_delay * (2 ** attempt))
+    return None
@@ -0,0 +1,196 @@
+# 檔名: tts_backends.py
+# 語音合成後端：podcaster 的切段、並行合成與拼接流程只依賴 TTSBackend 介面，
+# 可以在 Azure、Google Cloud TTS 與不需網路的本機後端之間切換 (環境變數 TTS_BACKEND)。
+
+import html
+import io
+import math
+import os
+import re
+import threading
+import time
+import wave
+from array import array
+
+DEFAULT_BACKEND = "azure"
+AZURE_VOICE_NAME = "zh-TW-YunJheNeural"
+GOOGLE_VOICE_NAME = "cmn-TW-Wavenet-A"
+GOOGLE_LANGUAGE_CODE = "cmn-TW"
+LOCAL_SAMPLE_RATE = 16000
+LOCAL_SECONDS_PER_CHAR = 0.08 # 本機後端每個字產生的音訊長度，約等於正常語速
+LOCAL_TONE_COUNT = 24 # 本機後端使用的音高種類，事先產生好重複使用
+SSML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def setup_gcp_credentials():
+    """把環境變數中的 GCP 憑證 JSON 寫成暫存檔，讓 Google SDK 可以讀到。"""
+    gcp_json_content = os.getenv("GCP_CREDENTIALS_JSON")
+    if gcp_json_content:
+        temp_credentials_path = "gcp_credentials_temp.json"
+        with open(temp_credentials_path, "w") as f:
+            f.write(gcp_json_content)
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_credentials_path
+        print("已從環境變數載入 GCP 憑證。")
+
+class TTSBackend:
+    """
+    語音合成後端的共同介面。
+    synthesize(text) 必須是執行緒安全的，回傳一段完整可播放的音訊 bytes；
+    stitch(parts) 依序把多段音訊接成一個檔案。
+    """
+    name = "base"
+    file_extension = "bin"
+    content_type = "application/octet-stream"
+    supports_ssml = False
+    ssml_voice_name = None # SSML 需要以 <voice> 指定聲音時填入
+    max_input_bytes = 15000 # 單次合成請求的 UTF-8 位元組上限 (SSML 包含標記本身)
+
+    def synthesize(self, text):
+        raise NotImplementedError
+
+    def synthesize_ssml(self, ssml):
+        raise NotImplementedError
+
+    def stitch(self, audio_parts):
+        return b"".join(audio_parts)
+
+class AzureTTSBackend(TTSBackend):
+    """Azure Speech：MP3 輸出，音框可直接首尾相接。每條執行緒各自重用一個 SpeechSynthesizer。"""
+    name = "azure"
+    file_extension = "mp3"
+    content_type = "audio/mpeg"
+    supports_ssml = True
+
+    def __init__(self, speech_key=None, speech_region=None, voice_name=AZURE_VOICE_NAME):
+        import azure.cognitiveservices.speech as speechsdk
+        self.speechsdk = speechsdk
+        self.speech_key = speech_key or os.getenv("AZURE_SPEECH_KEY")
+        self.speech_region = speech_region or os.getenv("AZURE_SPEECH_REGION")
+        if not all([self.speech_key, self.speech_region]):
+            raise ValueError("缺少 AZURE_SPEECH_KEY 或 AZURE_SPEECH_REGION 環境變數。")
+        self.voice_name = voice_name
+        self.ssml_voice_name = voice_name
+        self._local = threading.local()
+
+    def _synthesizer(self):
+        if not hasattr(self._local, "synthesizer"):
+            speechsdk = self.speechsdk
+            speech_config = speechsdk.SpeechConfig(subscription=self.speech_key, region=self.speech_region)
+            speech_config.speech_synthesis_voice_name = self.voice_name
+            speech_config.set_speech_synthesis_output_format(speechsdk.SpeechSynthesisOutputFormat.Audio24Khz48KBitRateMonoMp3)
+            # audio_config=None 代表不輸出到喇叭或檔案，音訊只放在 result.audio_data
+            self._local.synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        return self._local.synthesizer
+
+    def synthesize(self, text):
+        return self._audio_from_result(self._synthesizer().speak_text_async(text).get())
+
+    def synthesize_ssml(self, ssml):
+        return self._audio_from_result(self._synthesizer().speak_ssml_async(ssml).get())
+
+    def _audio_from_result(self, result):
+        speechsdk = self.speechsdk
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return result.audio_data
+        if result.reason == speechsdk.ResultReason.Canceled:
+            cancellation_details = result.cancellation_details
+            raise RuntimeError(f"語音合成被取消: {cancellation_details.reason}, {cancellation_details.error_details}")
+        raise RuntimeError(f"語音合成失敗: {result.reason}")
+
+class GoogleTTSBackend(TTSBackend):
+    """Google Cloud Text-to-Speech：MP3 輸出，client 本身可跨執行緒共用。"""
+    name = "google"
+    file_extension = "mp3"
+    content_type = "audio/mpeg"
+    supports_ssml = True
+    max_input_bytes = 5000 # synthesize_speech 拒絕超過 5000 bytes 的輸入 (含 SSML 標記)
+
+    def __init__(self, voice_name=GOOGLE_VOICE_NAME, language_code=GOOGLE_LANGUAGE_CODE):
+        from google.cloud import texttospeech
+        setup_gcp_credentials()
+        self.texttospeech = texttospeech
+        self.client = texttospeech.TextToSpeechClient()
+        self.voice = texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_name)
+        self.audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+
+    def _synthesize_input(self, synthesis_input):
+        response = self.client.synthesize_speech(input=synthesis_input, voice=self.voice, audio_config=self.audio_config)
+        return response.audio_content
+
+    def synthesize(self, text):
+        return self._synthesize_input(self.texttospeech.SynthesisInput(text=text))
+
+    def synthesize_ssml(self, ssml):
+        return self._synthesize_input(self.texttospeech.SynthesisInput(ssml=ssml))
+
+class LocalTTSBackend(TTSBackend):
+    """
+    不需網路的本機替身：每個字依字碼對應到一個固定音高，產生長度與文字成正比的 WAV。
+    輸出完全由文字決定 (同樣的輸入永遠得到同樣的 bytes)，可用來壓測與量測整個 podcast 流程。
+    latency_seconds 可模擬雲端服務的回應時間。
+    """
+    name = "local"
+    file_extension = "wav"
+    content_type = "audio/wav"
+    supports_ssml = True
+
+    def __init__(self, sample_rate=LOCAL_SAMPLE_RATE, seconds_per_char=LOCAL_SECONDS_PER_CHAR, latency_seconds=0):
+        self.sample_rate = sample_rate
+        self.latency_seconds = latency_seconds
+        samples_per_char = int(sample_rate * seconds_per_char)
+        self._tones = []
+        for i in range(LOCAL_TONE_COUNT):
+            frequency = 180 + 15 * i
+            tone = array('h', (int(8000 * math.sin(2 * math.pi * frequency * n / sample_rate)) for n in range(samples_per_char)))
+            self._tones.append(tone.tobytes())
+        self._silence = bytes(2 * samples_per_char)
+
+    def _to_wav(self, frames):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(frames)
+        return buffer.getvalue()
+
+    def synthesize(self, text):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        frames = b"".join(self._silence if ch.isspace() else self._tones[ord(ch) % LOCAL_TONE_COUNT] for ch in text)
+        return self._to_wav(frames)
+
+    def synthesize_ssml(self, ssml):
+        # 只唸文字內容，標記一律略過
+        return self.synthesize(html.unescape(SSML_TAG_PATTERN.sub('', ssml)))
+
+    def stitch(self, audio_parts):
+        # WAV 有檔頭，不能直接相接：取出每段的音訊資料後重新包成一個檔案
+        frames = []
+        for part in audio_parts:
+            with wave.open(io.BytesIO(part), "rb") as wav:
+                frames.append(wav.readframes(wav.getnframes()))
+        return self._to_wav(b"".join(frames))
+
+BACKENDS = {
+    AzureTTSBackend.name: AzureTTSBackend,
+    GoogleTTSBackend.name: GoogleTTSBackend,
+    LocalTTSBackend.name: LocalTTSBackend,
+}
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+def create_backend(name=None):
+    """依名稱 (預設讀取環境變數 TTS_BACKEND) 建立語音合成後端，設定不完整時丟出 ValueError。"""
+    name = (name or os.getenv("TTS_BACKEND") or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 TTS_BACKEND: {name} (可用: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+def get_backend():
+    """整個行程共用的預設語音合成後端，第一次用到時才建立 (常駐模式下不必每次重建雲端 client)。"""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_backend()
+        return _default_backend